@@ -0,0 +1,54 @@
+"""add_entries_archive_and_summaries
+
+Revision ID: a8b3d6e1f4c7
+Revises: f2a7c5d9e3b4
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8b3d6e1f4c7'
+down_revision = 'f2a7c5d9e3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows are moved here by: python scripts/purge-data.py --archive-days <days>
+    op.create_table('entries_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('journal', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], name='fk_entries_archive_habit_id_habits', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_entries_archive_habit_id_date', 'entries_archive', ['habit_id', 'date'], unique=True)
+    op.create_index('ix_entries_archive_date', 'entries_archive', ['date'], unique=False)
+    op.create_table('entry_year_summaries',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('journal_count', sa.Integer(), nullable=False),
+    sa.Column('first_date', sa.Date(), nullable=False),
+    sa.Column('last_date', sa.Date(), nullable=False),
+    sa.Column('best_run', sa.Integer(), nullable=False),
+    sa.Column('leading_run', sa.Integer(), nullable=False),
+    sa.Column('trailing_run', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], name='fk_entry_year_summaries_habit_id_habits', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('habit_id', 'year')
+    )
+    op.add_column('habit_streaks', sa.Column('archived_through', sa.Date(), nullable=True))
+
+
+def downgrade():
+    # Archived entries must be moved back into entries before downgrading
+    with op.batch_alter_table('habit_streaks') as batch_op:
+        batch_op.drop_column('archived_through')
+    op.drop_table('entry_year_summaries')
+    op.drop_index('ix_entries_archive_date', table_name='entries_archive')
+    op.drop_index('uq_entries_archive_habit_id_date', table_name='entries_archive')
+    op.drop_table('entries_archive')
@@ -0,0 +1,35 @@
+"""add_habit_streaks_table
+
+Revision ID: b7c1e2d4f9a3
+Revises: 014ac8efbd8c, f7g8h9i0j1k2
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c1e2d4f9a3'
+down_revision = ('014ac8efbd8c', 'f7g8h9i0j1k2')
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing habits get their state from: python scripts/rebuild-streaks.py
+    # Until then the API falls back to computing streaks from entries.
+    op.create_table('habit_streaks',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('current_run_start', sa.Date(), nullable=True),
+    sa.Column('current_run_length', sa.Integer(), nullable=False),
+    sa.Column('best_run_length', sa.Integer(), nullable=False),
+    sa.Column('last_entry_date', sa.Date(), nullable=True),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ),
+    sa.PrimaryKeyConstraint('habit_id')
+    )
+
+
+def downgrade():
+    op.drop_table('habit_streaks')
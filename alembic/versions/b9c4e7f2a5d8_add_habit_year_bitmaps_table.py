@@ -0,0 +1,37 @@
+"""add_habit_year_bitmaps_table
+
+Revision ID: b9c4e7f2a5d8
+Revises: a8b3d6e1f4c7
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9c4e7f2a5d8'
+down_revision = 'a8b3d6e1f4c7'
+branch_labels = None
+depends_on = None
+
+YEAR_BYTES = 46
+
+
+def upgrade():
+    # Existing entries get their bitmaps from: python scripts/rebuild-streaks.py
+    # It commits a batch of habits at a time, where filling them here would hold
+    # the startup migration (and its 60 s timeout) for a pass over every entry.
+    # Until it has run, reads of a year without a bitmap fall back to entry rows
+    # and the first write to such a year draws its bitmap from them.
+    op.create_table('habit_year_bitmaps',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('days', sa.LargeBinary(length=YEAR_BYTES), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], name='fk_habit_year_bitmaps_habit_id_habits', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('habit_id', 'year')
+    )
+
+
+def downgrade():
+    op.drop_table('habit_year_bitmaps')
@@ -0,0 +1,28 @@
+"""add_version_counters
+
+Revision ID: c1d5f8a3b6e9
+Revises: b9c4e7f2a5d8
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1d5f8a3b6e9'
+down_revision = 'b9c4e7f2a5d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('habits', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('users', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('version')
+    with op.batch_alter_table('habits') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,31 @@
+"""add_unique_index_entries_habit_date
+
+Revision ID: c4d8e1f2a6b9
+Revises: b7c1e2d4f9a3
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e1f2a6b9'
+down_revision = 'b7c1e2d4f9a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Remove duplicate (habit_id, date) rows left by concurrent logging,
+    # keeping the oldest entry for each day
+    op.execute(sa.text(
+        "DELETE FROM entries WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM entries GROUP BY habit_id, date) AS keep"
+        ")"
+    ))
+    op.create_index('uq_entries_habit_id_date', 'entries', ['habit_id', 'date'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_entries_habit_id_date', table_name='entries')
@@ -0,0 +1,34 @@
+"""autoincrement_user_ids
+
+Revision ID: d3f7b2e8c4a1
+Revises: c1d5f8a3b6e9
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7b2e8c4a1'
+down_revision = 'c1d5f8a3b6e9'
+branch_labels = None
+depends_on = None
+
+
+# SQLite reissues the highest rowid once its row is deleted unless the table
+# is AUTOINCREMENT, which only a rebuild can add. PostgreSQL sequences and SQL
+# Server identities never reuse ids, so other databases are left alone.
+def _rebuild(autoincrement):
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('users', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+
+
+def upgrade():
+    _rebuild(True)
+
+
+def downgrade():
+    _rebuild(False)
@@ -0,0 +1,59 @@
+"""add_on_delete_cascade_foreign_keys
+
+Revision ID: d5e9f3a7b1c2
+Revises: c4d8e1f2a6b9
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e9f3a7b1c2'
+down_revision = 'c4d8e1f2a6b9'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table) for every foreign key that should cascade
+FKS = {
+    'entries': [('habit_id', 'habits')],
+    'habit_streaks': [('habit_id', 'habits')],
+    'habit_categories': [('habit_id', 'habits'), ('category_id', 'categories')],
+}
+
+# The initial migrations created these constraints unnamed; on SQLite batch
+# mode needs a convention to address them
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _name(table, column, referred):
+    return f'fk_{table}_{column}_{referred}'
+
+
+def _existing_names(table):
+    inspector = sa.inspect(op.get_bind())
+    return {
+        (fk['constrained_columns'][0], fk['referred_table']): fk['name']
+        for fk in inspector.get_foreign_keys(table)
+    }
+
+
+def _replace(ondelete):
+    for table, fks in FKS.items():
+        existing = _existing_names(table)
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred in fks:
+                name = existing.get((column, referred)) or _name(table, column, referred)
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(
+                    _name(table, column, referred), referred, [column], ['id'], ondelete=ondelete
+                )
+
+
+def upgrade():
+    _replace('CASCADE')
+
+
+def downgrade():
+    _replace(None)
@@ -0,0 +1,41 @@
+"""backfill_habit_created_at
+
+Revision ID: e4a8c3f9d2b5
+Revises: d3f7b2e8c4a1
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c3f9d2b5'
+down_revision = 'd3f7b2e8c4a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Habits created before f2a7c5d9e3b4 have no created_at; date them by
+    # their first entry, or by the upgrade if they have none. Archived entries
+    # are all older than hot ones, so they go first. Re-run
+    # python scripts/rollup-metrics.py --since <first day> afterwards so the
+    # daily rollups count them.
+    habits = sa.table('habits', sa.column('id'), sa.column('created_at'))
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for name in ('entries_archive', 'entries'):
+        entries = sa.table(name, sa.column('habit_id'), sa.column('date'))
+        first = sa.select(sa.func.min(entries.c.date)).where(entries.c.habit_id == habits.c.id).scalar_subquery()
+        op.execute(
+            habits.update()
+            .where(habits.c.created_at.is_(None))
+            # SQLite keeps datetimes as text, so a date needs its time part
+            .values(created_at=sa.func.datetime(first) if sqlite else first)
+        )
+    op.execute(habits.update().where(habits.c.created_at.is_(None)).values(created_at=sa.func.current_timestamp()))
+
+
+def downgrade():
+    # The dates cannot be told apart from real ones; leave them
+    pass
@@ -0,0 +1,37 @@
+"""add_purge_jobs_table
+
+Revision ID: e6f1a4b8c2d3
+Revises: d5e9f3a7b1c2
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1a4b8c2d3'
+down_revision = 'd5e9f3a7b1c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('purge_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('cutoff', sa.Date(), nullable=True),
+    sa.Column('stage', sa.String(length=20), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_rows', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_purge_jobs_user_id'), 'purge_jobs', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_purge_jobs_user_id'), table_name='purge_jobs')
+    op.drop_table('purge_jobs')
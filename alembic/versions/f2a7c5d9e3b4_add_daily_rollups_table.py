@@ -0,0 +1,40 @@
+"""add_daily_rollups_table
+
+Revision ID: f2a7c5d9e3b4
+Revises: e6f1a4b8c2d3
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c5d9e3b4'
+down_revision = 'e6f1a4b8c2d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fill in history afterwards with: python scripts/rollup-metrics.py --since <first day>
+    op.create_table('daily_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('entries_logged', sa.Integer(), nullable=False),
+    sa.Column('journals_written', sa.Integer(), nullable=False),
+    sa.Column('active_users', sa.Integer(), nullable=False),
+    sa.Column('habits_created', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.add_column('habits', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_habits_created_at'), 'habits', ['created_at'], unique=False)
+    op.create_index('ix_entries_date', 'entries', ['date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_entries_date', table_name='entries')
+    op.drop_index(op.f('ix_habits_created_at'), table_name='habits')
+    with op.batch_alter_table('habits') as batch_op:
+        batch_op.drop_column('created_at')
+    op.drop_table('daily_rollups')
@@ -0,0 +1,51 @@
+"""
+Caches shared by the app, on the backend chosen in Settings.
+
+CACHE_BACKEND=memory keeps a TTL-LRU per process; with CACHE_REDIS_URL set,
+invalidations also reach the other workers and instances over Redis pub/sub.
+CACHE_BACKEND=redis keeps every entry in the Redis at CACHE_REDIS_URL.
+
+Decoded tokens always stay in process (see TokenCache); revoking a deleted
+user's tokens reaches the other processes over the same pub/sub. Without
+CACHE_REDIS_URL it cannot: the other workers accept their cached tokens until
+those expire.
+"""
+
+from app.config import settings
+
+from .backends import CacheBackend, MemoryBackend, RedisBackend
+from .months import CalendarCache
+from .tokens import TokenCache
+from .users import UserCache
+from .versioned import VersionedCache
+
+
+def build_backend(bus: RedisBackend | None) -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        if bus is None:
+            raise ValueError("CACHE_BACKEND=redis needs CACHE_REDIS_URL")
+        return bus
+    return MemoryBackend(settings.CACHE_MAX_ENTRIES, bus)
+
+
+bus = RedisBackend.from_url(settings.CACHE_REDIS_URL) if settings.CACHE_REDIS_URL else None
+backend = build_backend(bus)
+habit_list_cache = UserCache("habit_list", backend, settings.HABIT_LIST_CACHE_SECONDS)
+calendar_cache = CalendarCache("calendar", backend, settings.CALENDAR_CACHE_SECONDS)
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, bus)
+
+__all__ = [
+    "CacheBackend",
+    "CalendarCache",
+    "MemoryBackend",
+    "RedisBackend",
+    "TokenCache",
+    "UserCache",
+    "VersionedCache",
+    "backend",
+    "build_backend",
+    "bus",
+    "calendar_cache",
+    "habit_list_cache",
+    "token_cache",
+]
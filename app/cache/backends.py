@@ -0,0 +1,219 @@
+"""
+Cache backends: an in-process TTL-LRU and a shared Redis.
+
+Both store values under string keys with a TTL, keep version counters for
+versioned keys (see UserCache), and carry invalidation messages between
+processes. Redis is optional: import it only when the backend is configured.
+"""
+import itertools
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], None]
+
+# Expired versions are pruned once a MemoryBackend holds more than this many
+VERSION_PRUNE_THRESHOLD = 10000
+
+
+class CacheBackend(Protocol):
+    # Whether every process sees the same entries and versions
+    shared: bool
+
+    def get(self, key: str) -> Any | None: ...
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None: ...
+    def delete(self, key: str) -> None: ...
+    def version(self, key: str) -> int: ...
+    def bump(self, key: str, ttl_seconds: float) -> int: ...
+    def publish(self, channel: str, message: str) -> None: ...
+    def subscribe(self, channel: str, handler: Handler) -> None: ...
+
+
+class MemoryBackend:
+    """
+    A bounded LRU of values that expire after their TTL, per process.
+
+    Versions are kept apart from the LRU, so eviction never resets one, and
+    each is kept for the TTL its own bump asked for, whichever cache bumps
+    the others. With
+    a bus (a RedisBackend), messages reach the subscribers of every process
+    that shares it; without one they stay in this process.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries: int, bus: Optional["RedisBackend"] = None):
+        self.max_entries = max_entries
+        self.bus = bus
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        # key -> (version, when it may be forgotten)
+        self._versions: dict[str, tuple[int, float]] = {}
+        self._prune_at = VERSION_PRUNE_THRESHOLD
+        self._counter = itertools.count(1)
+        self._handlers: dict[str, list[Handler]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None:
+                return None
+            if found[0] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return found[1]
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def version(self, key: str) -> int:
+        found = self._versions.get(key)
+        return found[0] if found is not None else 0
+
+    def bump(self, key: str, ttl_seconds: float) -> int:
+        """Give key a version never used before; it is kept for at least ttl_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            version = next(self._counter)
+            self._versions[key] = (version, now + ttl_seconds)
+            if len(self._versions) > self._prune_at:
+                self._versions = {k: v for k, v in self._versions.items() if v[1] > now}
+                # Live versions are never dropped; prune again once the map has doubled
+                self._prune_at = max(VERSION_PRUNE_THRESHOLD, 2 * len(self._versions))
+        return version
+
+    def publish(self, channel: str, message: str) -> None:
+        if self.bus is not None:
+            # Comes back to this process's subscribers through Redis too
+            self.bus.publish(channel, message)
+            return
+        for handler in self._handlers.get(channel, []):
+            handler(message)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        if self.bus is not None:
+            self.bus.subscribe(channel, handler)
+            return
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+def _keep_listening(error: Exception, pubsub: Any, thread: Any) -> None:
+    # Invalidations are lost while Redis is away; expiry still bounds staleness
+    logger.error("Cache invalidation listener failed: %s", error)
+    time.sleep(1)
+
+
+class RedisBackend:
+    """
+    Entries and versions in Redis (or anything speaking its protocol), shared
+    by every worker and instance.
+
+    Values are pickled, so the Redis must be private to the app. A Redis
+    error counts as a miss, and a lost write or bump is logged: the cache
+    then serves results until they expire instead of failing requests.
+    Versions expire, so Redis should evict only keys with a TTL
+    (volatile-lru or noeviction) to keep them from going early.
+    """
+
+    shared = True
+
+    def __init__(self, client: Any, prefix: str = "streaky:"):
+        self.client = client
+        self.prefix = prefix
+        self._pubsub: Any = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "streaky:") -> "RedisBackend":
+        import redis
+
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5), prefix)
+
+    def get(self, key: str) -> Any | None:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            logger.warning("Cache get failed for %s", key, exc_info=True)
+            return None
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        try:
+            ttl_ms = max(int(ttl_seconds * 1000), 1)
+            self.client.set(self.prefix + key, pickle.dumps(value), px=ttl_ms)
+        except Exception:
+            logger.warning("Cache set failed for %s", key, exc_info=True)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception:
+            logger.warning("Cache delete failed for %s", key, exc_info=True)
+
+    def version(self, key: str) -> int:
+        try:
+            raw = self.client.get(self.prefix + "version:" + key)
+        except Exception:
+            logger.warning("Cache version read failed for %s", key, exc_info=True)
+            return 0
+        return int(raw) if raw is not None else 0
+
+    def bump(self, key: str, ttl_seconds: float) -> int:
+        """Give key a version never used before, from one global counter.
+
+        The version is kept for at least ttl_seconds.
+        """
+        try:
+            version = int(self.client.incr(self.prefix + "version-counter"))
+            self.client.set(
+                self.prefix + "version:" + key, version, px=max(int(ttl_seconds * 1000), 1)
+            )
+            return version
+        except Exception:
+            logger.error("Cache version bump failed for %s", key, exc_info=True)
+            return 0
+
+    def publish(self, channel: str, message: str) -> None:
+        try:
+            self.client.publish(self.prefix + channel, message)
+        except Exception:
+            logger.error("Cache invalidation publish failed on %s", channel, exc_info=True)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        """Call handler with every message on channel, from a background thread."""
+        def on_message(message: dict[str, Any]) -> None:
+            data = message["data"]
+            handler(data.decode() if isinstance(data, bytes) else str(data))
+
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(**{self.prefix + channel: on_message})
+                self._pubsub.run_in_thread(
+                    sleep_time=0.05, daemon=True, exception_handler=_keep_listening
+                )
+            else:
+                self._pubsub.subscribe(**{self.prefix + channel: on_message})
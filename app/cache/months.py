@@ -0,0 +1,36 @@
+"""
+Computed calendar months on a cache backend.
+"""
+from collections.abc import Callable, Iterable
+from datetime import date
+from typing import TypeVar
+
+from .versioned import VersionedCache
+
+T = TypeVar("T")
+
+
+class CalendarCache(VersionedCache):
+    """
+    Calendar months per (habit, year, month), kept until an entry in the month is written.
+
+    A month is stored under two versions: the habit's month, which only
+    writes of entries dated in that month replace (invalidate_days), and the
+    user's, which habit changes replace (invalidate_user). Logging today
+    leaves every past month cached; see VersionedCache.
+    """
+
+    def get_or_compute(
+        self, user_id: int, habit_id: int, year: int, month: int, compute: Callable[[], T]
+    ) -> T:
+        """The cached month, or compute() stored as the month."""
+        return self.lookup((f"user:{user_id}", f"month:{habit_id}:{year}-{month}"), (), compute)
+
+    def invalidate_days(self, habit_id: int, days: Iterable[date]) -> None:
+        """Forget the habit's months containing days; call after the entries have committed."""
+        for year, month in {(d.year, d.month) for d in days}:
+            self.invalidate_scope(f"month:{habit_id}:{year}-{month}")
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Forget every month of the user's habits, for changes to the habits themselves."""
+        self.invalidate_scope(f"user:{user_id}")
@@ -0,0 +1,70 @@
+"""
+Decoded access tokens, per process.
+"""
+import hashlib
+import time
+
+from .backends import MemoryBackend, RedisBackend
+
+REVOKE_CHANNEL = "tokens:revoke"
+
+
+class TokenCache:
+    """
+    The user of each decoded token, under the token's hash, until its exp.
+
+    A token decodes to the same user every time, so the only invalidation is
+    a deleted account: every entry records its user's generation, which
+    revoke replaces, here and in every process sharing the bus. Entries stay
+    in process whatever the app's cache backend, since a Redis round trip
+    costs more than the decode.
+    """
+
+    def __init__(
+        self, max_entries: int, generation_seconds: float, bus: RedisBackend | None = None
+    ):
+        # Generations must outlive every token issued before the revoke
+        self.generation_seconds = generation_seconds
+        self.backend = MemoryBackend(max_entries, bus)
+        self.backend.subscribe(REVOKE_CHANNEL, self._on_revoked)
+
+    @property
+    def max_entries(self) -> int:
+        return self.backend.max_entries
+
+    def generation(self, user_id: int) -> int:
+        """The user's generation; read it before checking that the user exists.
+
+        Pass it on to set.
+        """
+        return self.backend.version(f"user:{user_id}")
+
+    def get(self, token: str) -> int | None:
+        """The user of a token decoded before, unless it expired or its user was revoked."""
+        found = self.backend.get(_key(token))
+        if found is None:
+            return None
+        user_id, exp, generation = found
+        if exp <= time.time() or generation != self.generation(user_id):
+            return None
+        return int(user_id)
+
+    def set(self, token: str, user_id: int, exp: float, generation: int) -> None:
+        remaining = exp - time.time()
+        if remaining > 0:
+            self.backend.set(_key(token), (user_id, exp, generation), remaining)
+
+    def revoke(self, user_id: int) -> None:
+        """Forget the user's tokens in every process; call once the user is deleted."""
+        self._on_revoked(str(user_id))
+        self.backend.publish(REVOKE_CHANNEL, str(user_id))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def _on_revoked(self, message: str) -> None:
+        self.backend.bump(f"user:{message}", self.generation_seconds)
+
+
+def _key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
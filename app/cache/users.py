@@ -0,0 +1,28 @@
+"""
+Per-user read results on a cache backend.
+"""
+from collections.abc import Callable, Hashable
+from typing import TypeVar
+
+from .versioned import VersionedCache
+
+T = TypeVar("T")
+
+
+class UserCache(VersionedCache):
+    """
+    Per-user results that expire after ttl_seconds, under versioned keys.
+
+    Every key carries the user's version, which each of their writes replaces
+    (invalidate); see VersionedCache.
+    """
+
+    def get_or_compute(
+        self, user_id: int, key: tuple[Hashable, ...], compute: Callable[[], T]
+    ) -> T:
+        """The cached result for (user_id, key), or compute() stored as the result."""
+        return self.lookup((f"user:{user_id}",), key, compute)
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget the user's results; call after their write has committed."""
+        self.invalidate_scope(f"user:{user_id}")
@@ -0,0 +1,82 @@
+"""
+Read results on a cache backend under versioned keys.
+"""
+import time
+from collections.abc import Callable, Hashable, Sequence
+from typing import TypeVar, cast
+
+from app.monitoring import cache_requests_total
+
+from .backends import CacheBackend
+
+T = TypeVar("T")
+
+
+class VersionedCache:
+    """
+    Results that expire after ttl_seconds, under keys carrying scope versions.
+
+    A result is stored under the versions of the scopes it was computed from
+    (a user, a habit's month, ...), and a write replaces the versions of the
+    scopes it touches (invalidate). A result computed from data read before
+    the write is then stored under a version that no later lookup asks for,
+    and old results simply age out. On a shared backend the versions are seen
+    by every process. On a per-process backend the invalidated scope is also
+    published, and every process subscribed through the backend's bus takes
+    a new version as well. Results of None are not cached.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl_seconds: float):
+        self.name = name
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = self.misses = 0
+        self._channel = f"{name}:invalidate"
+        if not backend.shared:
+            backend.subscribe(self._channel, self._on_invalidated)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def lookup(
+        self, scopes: Sequence[str], key: tuple[Hashable, ...], compute: Callable[[], T]
+    ) -> T:
+        """The cached result for key under the current versions of scopes.
+
+        On a miss, compute() is called and stored as the result.
+        """
+        if not self.enabled:
+            return compute()
+        start = time.monotonic()
+        versions = [str(self.backend.version(self._version_key(scope))) for scope in scopes]
+        full_key = ":".join([self.name, *scopes, *versions, *map(str, key)])
+        # Only compute() results are stored under the key
+        found = cast(T | None, self.backend.get(full_key))
+        if found is not None:
+            self.hits += 1
+            cache_requests_total.labels(self.name, "hit").inc()
+            return found
+        self.misses += 1
+        cache_requests_total.labels(self.name, "miss").inc()
+
+        value = compute()
+        # Expiry counts from the lookup, before any data was read
+        remaining = self.ttl_seconds - (time.monotonic() - start)
+        if value is not None and remaining > 0:
+            self.backend.set(full_key, value, remaining)
+        return value
+
+    def invalidate_scope(self, scope: str) -> None:
+        """Forget the results computed from scope; call after the write has committed."""
+        if not self.enabled:
+            return
+        self.backend.bump(self._version_key(scope), self.ttl_seconds)
+        if not self.backend.shared:
+            self.backend.publish(self._channel, scope)
+
+    def _on_invalidated(self, message: str) -> None:
+        self.backend.bump(self._version_key(message), self.ttl_seconds)
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.name}:{scope}"
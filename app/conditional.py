@@ -0,0 +1,45 @@
+"""
+Conditional GETs: strong ETags built from version counters, answered with
+304 Not Modified when the client's copy is current.
+"""
+import hashlib
+from collections.abc import Hashable
+
+from fastapi import Request, Response
+
+
+def make_etag(scope: str, version: int, *variant: Hashable) -> str:
+    """A strong ETag for one representation of a versioned resource.
+
+    scope names the counter ("h12" for habit 12, "u3" for user 3's lists);
+    variant is everything else the body depends on: the endpoint, its query
+    parameters and, for streaks, today.
+    """
+    digest = hashlib.sha1(repr(variant).encode()).hexdigest()[:16]
+    return f'"{scope}.{version}.{digest}"'
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names etag (weak comparison, as RFC 9110 asks for GET)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cache_control(max_age: int) -> str:
+    """Cache-Control of a per-user response.
+
+    It is reused for max_age seconds, or revalidated every time if max_age is 0.
+    """
+    return f"private, max-age={max_age}" if max_age > 0 else "private, no-cache"
+
+
+def not_modified(etag: str, cache_control: str | None = None) -> Response:
+    headers = {"ETag": etag}
+    if cache_control is not None:
+        # A 304 refreshes the stored copy, so it repeats the copy's caching policy
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Literal, Optional
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -11,21 +11,83 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./streaky.db"
     
     # Azure SQL (optional - if provided, overrides DATABASE_URL)
-    AZURE_SQL_SERVER: Optional[str] = None
+    AZURE_SQL_SERVER: str | None = None
     AZURE_SQL_DATABASE: str = "streaky-db"
-    AZURE_SQL_USERNAME: Optional[str] = None
-    AZURE_SQL_PASSWORD: Optional[str] = None
+    AZURE_SQL_USERNAME: str | None = None
+    AZURE_SQL_PASSWORD: str | None = None
+    
+    # Optional read replica for GET endpoints. Requests from a user who wrote within
+    # the last READ_YOUR_WRITES_SECONDS still read from the primary (0 disables).
+    DATABASE_READ_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    
+    # Connection pool (non-SQLite) and the worker threads that run sync endpoints.
+    # Every sync endpoint holds a thread while it waits on the database, so
+    # THREADPOOL_SIZE defaults to one thread per connection plus anyio's own 40
+    # for requests that are not waiting on one (see threadpool_size).
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    THREADPOOL_SIZE: int | None = None
+    # The habit and category endpoints await the database on the event loop
+    # through an asyncio driver (aiosqlite, asyncpg) instead of holding a thread.
+    # SQL Server through pymssql has none and keeps them in the threadpool, as
+    # does DATABASE_ASYNC = False on every backend.
+    DATABASE_ASYNC: bool = True
+    
+    # SQLite performance profile, applied to every connection (see app/db.py).
+    # WAL lets readers and the writer work concurrently; NORMAL sync is safe with WAL.
+    SQLITE_TUNED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE: int = -65536  # Negative means KiB: 64 MiB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    # Purges (account deletion, retention, archival) touch at most PURGE_BATCH_SIZE
+    # rows per transaction. scripts/purge-data.py removes entries older than
+    # ENTRY_RETENTION_DAYS and moves those older than ENTRY_ARCHIVE_DAYS to
+    # entries_archive; None disables either.
+    PURGE_BATCH_SIZE: int = 1000
+    ENTRY_RETENTION_DAYS: int | None = None
+    ENTRY_ARCHIVE_DAYS: int | None = None
+
+    # Each worker refreshes the daily rollups behind /business-metrics every
+    # ROLLUP_REFRESH_SECONDS; 0 disables it, e.g. when cron runs
+    # scripts/rollup-metrics.py instead.
+    ROLLUP_REFRESH_SECONDS: float = 300.0
+    
+    # Cache backend for the app's caches (see app/cache). "memory" keeps at most
+    # CACHE_MAX_ENTRIES per process, and with CACHE_REDIS_URL set broadcasts
+    # invalidations to the other processes over Redis pub/sub; "redis" keeps
+    # everything in the Redis at CACHE_REDIS_URL, shared by all of them.
+    CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    CACHE_REDIS_URL: str | None = None
+    CACHE_MAX_ENTRIES: int = 10000
+    # GET /habits results are cached per user for HABIT_LIST_CACHE_SECONDS (0 disables)
+    # and dropped by the user's writes.
+    HABIT_LIST_CACHE_SECONDS: float = 30.0
+    # Calendar months are cached per habit for CALENDAR_CACHE_SECONDS (0 disables)
+    # and dropped by writes of entries in the month. Browsers may reuse a past
+    # month for CALENDAR_MAX_AGE_SECONDS; the current month always revalidates.
+    CALENDAR_CACHE_SECONDS: float = 3600.0
+    CALENDAR_MAX_AGE_SECONDS: int = 300
     
     # Authentication
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Decoded tokens are kept per process until they expire, at most
+    # TOKEN_CACHE_SIZE of them (0 disables). Deleting an account revokes its
+    # tokens in every process only over CACHE_REDIS_URL; without it, other
+    # workers accept the tokens they cached until ACCESS_TOKEN_EXPIRE_MINUTES.
+    TOKEN_CACHE_SIZE: int = 10000
     
     # Prometheus (monitoring)
     PROMETHEUS_ENABLED: bool = True
     
     # Azure Key Vault (optional)
-    AZURE_KEY_VAULT_URL: Optional[str] = None
+    AZURE_KEY_VAULT_URL: str | None = None
     
     # CORS
     ALLOWED_ORIGINS: str = "*"
@@ -41,6 +103,13 @@ class Settings(BaseSettings):
             )
         return self.DATABASE_URL
     
+    @property
+    def threadpool_size(self) -> int:
+        """THREADPOOL_SIZE, or enough threads to wait on every pooled connection and then some"""
+        if self.THREADPOOL_SIZE is not None:
+            return self.THREADPOOL_SIZE
+        return self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW + 40
+    
     @property
     def cors_origins(self) -> list:
         """Parse CORS origins from comma-separated string"""
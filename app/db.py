@@ -1,29 +1,236 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import threading
+import time
+from collections.abc import Callable
+from typing import TypeVar
+
+from anyio import to_thread
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 from app.config import settings
 
 # Use computed database URL (Azure SQL if configured, else SQLite)
 SQLALCHEMY_DATABASE_URL = settings.database_url_computed
 
+
+def sqlite_pragmas(read_only: bool = False) -> list[str]:
+    """PRAGMA statements for the SQLite performance profile configured in Settings."""
+    # SQLite ignores foreign keys, and so ON DELETE CASCADE, unless enabled per connection
+    if not settings.SQLITE_TUNED:
+        return [
+            "PRAGMA foreign_keys = ON",
+            f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        ]
+    pragmas = [
+        "PRAGMA foreign_keys = ON",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA temp_store = {settings.SQLITE_TEMP_STORE}",
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        # journal_mode is a property of the database file; only the writer sets it
+        return pragmas + ["PRAGMA query_only = ON"]
+    return [f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}"] + pragmas
+
+
+def use_sqlite_profile(sqlite_engine: Engine, read_only: bool = False) -> None:
+    """Apply the SQLite profile to every new connection of an engine."""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _sqlite_read_only_url(url: str) -> str:
+    """Open the same SQLite file through a read-only URI, or return '' for in-memory databases."""
+    database = make_url(url).database
+    if not database or database == ":memory:" or database.startswith("file:"):
+        return ""
+    return f"sqlite:///file:{database}?mode=ro&uri=true"
+
+
+def _server_engine(url: str) -> Engine:
+    # Azure SQL / PostgreSQL configuration
+    return create_engine(
+        url,
+        pool_pre_ping=True,  # Verify connections before using
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=3600,  # Recycle connections after 1 hour
+        echo=settings.is_development  # Log SQL in development
+    )
+
+
 # Create engine with appropriate settings based on database type
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     # SQLite-specific configuration
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, 
+        SQLALCHEMY_DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
+    use_sqlite_profile(engine)
+
+    # With WAL, readers never block the writer, so GET endpoints get their own
+    # pool of read-only connections
+    read_only_url = _sqlite_read_only_url(SQLALCHEMY_DATABASE_URL)
+    if read_only_url:
+        read_engine = create_engine(
+            read_only_url,
+            connect_args={"check_same_thread": False},
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        use_sqlite_profile(read_engine, read_only=True)
+    else:
+        read_engine = engine
 else:
-    # Azure SQL / PostgreSQL configuration
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_size=10,
-        max_overflow=20,
-        pool_recycle=3600,  # Recycle connections after 1 hour
-        echo=settings.is_development  # Log SQL in development
+    engine = _server_engine(SQLALCHEMY_DATABASE_URL)
+    read_engine = engine
+
+# A configured read replica takes over the read pool
+if settings.DATABASE_READ_URL:
+    read_engine = _server_engine(settings.DATABASE_READ_URL)
+
+# Objects stay loaded after commit: new primary keys come back through
+# INSERT .. RETURNING (OUTPUT INSERTED on SQL Server) during the flush, so a
+# write never needs a SELECT afterwards to build its response
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine
+)
+
+
+# asyncio drivers of the backends that have one; SQL Server through pymssql has none
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_twin(sync_engine: Engine, read_only: bool = False) -> AsyncEngine | None:
+    """The sync engine's database and profile through its asyncio driver, or None without one."""
+    url = sync_engine.url
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        return None
+    async_url = url.set(drivername=f"{backend}+{driver}")
+    if backend != "sqlite":
+        return create_async_engine(
+            async_url,
+            pool_pre_ping=True,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=3600,
+            echo=settings.is_development,
+        )
+    # A second in-memory database would be a different, empty one
+    if not url.database or url.database == ":memory:":
+        return None
+    pool = (
+        {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+        if read_only
+        else {}
     )
+    sqlite_engine = create_async_engine(async_url, **pool)
+    use_sqlite_profile(sqlite_engine.sync_engine, read_only)
+    return sqlite_engine
+
+
+# The same primary and read pool for async endpoints, or None where they stay
+# in the threadpool (no asyncio driver, or DATABASE_ASYNC off)
+async_engine: AsyncEngine | None = None
+async_read_engine: AsyncEngine | None = None
+if settings.DATABASE_ASYNC:
+    async_engine = _async_twin(engine)
+    async_read_engine = (
+        async_engine
+        if read_engine is engine
+        else _async_twin(read_engine, read_only=read_engine.url.get_backend_name() == "sqlite")
+    )
+    if async_read_engine is None:
+        # A replica without an asyncio driver keeps both pools sync
+        async_engine = None
+
+AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+AsyncReadSessionLocal: async_sessionmaker[AsyncSession] | None = None
+if async_engine is not None and async_read_engine is not None:
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_read_engine, autoflush=False, expire_on_commit=False
+    )
+
+T = TypeVar("T")
+
+
+async def run_on(session: Session | AsyncSession, work: Callable[[Session], T]) -> T:
+    """
+    Run sync ORM work, such as a repository or service call, without blocking
+    the event loop. On an AsyncSession it runs in SQLAlchemy's greenlet bridge,
+    so each statement is awaited on the loop; a sync Session runs it in the
+    threadpool instead.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(work)
+    return await to_thread.run_sync(work, session)
+
+
+class ReadYourWrites:
+    """
+    Remembers when each user last wrote, so their reads can stay on the primary
+    until a replica has caught up. State is per process, which is enough for a
+    client that keeps talking to the same worker.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._last_write: dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def record_write(self, user_id: int) -> None:
+        if self.window_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_id] = now
+            if len(self._last_write) > 10000:
+                cutoff = now - self.window_seconds
+                self._last_write = {u: t for u, t in self._last_write.items() if t >= cutoff}
+
+    def wrote_recently(self, user_id: int) -> bool:
+        last = self._last_write.get(user_id)
+        return last is not None and time.monotonic() - last < self.window_seconds
+
+
+read_your_writes = ReadYourWrites(settings.READ_YOUR_WRITES_SECONDS)
+
+
+def read_session_for(user_id: int):
+    """Route a user's read to the read pool, or to the primary right after they wrote."""
+    if read_engine is not engine and read_your_writes.wrote_recently(user_id):
+        return SessionLocal()
+    return ReadSessionLocal()
+
+
+def async_read_session_for(user_id: int) -> AsyncSession | None:
+    """read_session_for on the async pools, or None where there are none."""
+    if AsyncSessionLocal is None or AsyncReadSessionLocal is None:
+        return None
+    if async_read_engine is not async_engine and read_your_writes.wrote_recently(user_id):
+        return AsyncSessionLocal()
+    return AsyncReadSessionLocal()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
@@ -1,16 +1,29 @@
-from typing import Optional
+from collections.abc import AsyncIterator, Callable, Iterator
+from anyio import to_thread
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import exists
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.cache import token_cache
 from app.config import settings
-from app.db import SessionLocal
+from app.db import (
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+    async_read_session_for,
+    read_session_for,
+    read_your_writes,
+    run_on,
+)
+from app.models import PurgeJob, User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def get_db() -> Session:
+def get_db() -> Iterator[Session]:
     """Dependency to get database session."""
     db = SessionLocal()
     try:
@@ -19,18 +32,158 @@ def get_db() -> Session:
         db.close()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> int:
-    """Dependency to get current authenticated user ID."""
-    credentials_exception = HTTPException(
+def get_session_factory() -> Callable[[], Session]:
+    """A primary session factory, for work that outlives the request such as background tasks."""
+    return SessionLocal
+
+
+def decode_token(token: str) -> tuple[int | None, float | None]:
+    """(user_id, exp) of a valid token; raises JWTError otherwise, expired tokens included."""
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return payload.get("user_id"), payload.get("exp")
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode(token: str) -> tuple[int, float | None, int]:
+    """(user_id, exp, cache generation) of a valid token; raises the 401 otherwise."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: Optional[int] = payload.get("user_id")
-        if user_id is None:
-            raise credentials_exception
+        user_id, exp = decode_token(token)
     except JWTError as e:
-        raise credentials_exception from e
+        raise _credentials_exception() from e
+    if user_id is None:
+        raise _credentials_exception()
+    # Read before the lookup, so a revoke after it outdates what is stored below
+    return user_id, exp, token_cache.generation(user_id)
+
+
+def _is_active(db: Session, user_id: int) -> bool:
+    """Whether the user exists and is not being deleted."""
+    being_deleted = exists().where(
+        PurgeJob.kind == "account", PurgeJob.user_id == User.id, PurgeJob.finished_at.is_(None)
+    )
+    return db.query(User.id).filter(User.id == user_id, ~being_deleted).first() is not None
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> int:
+    """
+    Dependency to get current authenticated user ID.
+
+    A token decodes to the same user every time until it expires, so the
+    result is kept under the token's hash until its exp and a polling client
+    pays for the decode once. Only valid tokens that expire are kept, and only
+    while their user exists and is not being deleted: the decode also looks
+    the user up, and queueing an account's deletion revokes its cached tokens.
+    Without CACHE_REDIS_URL the revoke reaches only this process; the other
+    workers accept their cached tokens until those expire.
+    """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    user_id, exp, generation = _decode(token)
+    if not _is_active(db, user_id):
+        raise _credentials_exception()
+    if exp is not None:
+        token_cache.set(token, user_id, exp, generation)
     return user_id
+
+
+def get_current_writer(user_id: int = Depends(get_current_user)) -> Iterator[int]:
+    """Dependency for write endpoints: the current user ID, recorded as having just written."""
+    read_your_writes.record_write(user_id)
+    try:
+        yield user_id
+    finally:
+        # Restart the window once the write has committed
+        read_your_writes.record_write(user_id)
+
+
+def get_read_db(user_id: int = Depends(get_current_user)) -> Iterator[Session]:
+    """Dependency to get a database session for a user's read-only endpoints."""
+    db = read_session_for(user_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_session_factory(user_id: int = Depends(get_current_user)) -> Callable[[], Session]:
+    """
+    Dependency for streaming responses: a factory for the user's read session.
+    The body is produced after the endpoint returns, so the stream opens and
+    closes its own session instead of borrowing the request's.
+    """
+    return lambda: read_session_for(user_id)
+
+
+def get_replica_db() -> Iterator[Session]:
+    """Dependency to get a read pool session for unauthenticated, staleness-tolerant reads."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncIterator[Session | AsyncSession]:
+    """
+    Dependency for async endpoints: an AsyncSession on the primary, or a sync
+    Session where there is no async pool (see app.db.run_on for both).
+    """
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await to_thread.run_sync(db.close)
+        return
+    async with AsyncSessionLocal() as async_db:
+        yield async_db
+
+
+async def get_async_current_user(
+    token: str = Depends(oauth2_scheme), db: Session | AsyncSession = Depends(get_async_db)
+) -> int:
+    """get_current_user for async endpoints; the user lookup of an uncached token is awaited."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    user_id, exp, generation = _decode(token)
+    if not await run_on(db, lambda session: _is_active(session, user_id)):
+        raise _credentials_exception()
+    if exp is not None:
+        token_cache.set(token, user_id, exp, generation)
+    return user_id
+
+
+async def get_async_current_writer(
+    user_id: int = Depends(get_async_current_user),
+) -> AsyncIterator[int]:
+    """get_current_writer for async endpoints."""
+    read_your_writes.record_write(user_id)
+    try:
+        yield user_id
+    finally:
+        read_your_writes.record_write(user_id)
+
+
+async def get_async_read_db(
+    user_id: int = Depends(get_async_current_user),
+) -> AsyncIterator[Session | AsyncSession]:
+    """get_read_db for async endpoints, as an AsyncSession where there is an async pool."""
+    async_db = async_read_session_for(user_id)
+    if async_db is None:
+        db = read_session_for(user_id)
+        try:
+            yield db
+        finally:
+            await to_thread.run_sync(db.close)
+        return
+    async with async_db:
+        yield async_db
@@ -1,14 +1,21 @@
+import threading
+import time
+from datetime import date
+
+from anyio import to_thread
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
 
 from app.config import settings
-from app.db import create_tables
+from app.db import SessionLocal, create_tables
 from app.logging import setup_logging_middleware
 from app.monitoring import MonitoringMiddleware
-from app.routers import auth, categories, habits
+from app.routers import auth, categories, export, habits, imports
 from app.routers import monitoring
+from app.repositories.rollups import SqlAlchemyRollupRepository
+from app.services.rollups import RollupService
 
 # Create FastAPI app
 app = FastAPI(
@@ -24,9 +31,26 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def refresh_rollups_forever(interval: float) -> None:
+    """Keep the daily rollups current, every `interval` seconds, in a background thread."""
+    while True:
+        db = SessionLocal()
+        try:
+            RollupService(SqlAlchemyRollupRepository(db)).catch_up(date.today())
+        except Exception:
+            # Another worker may have inserted the same day first; the next round retries
+            logger.warning("Rollup refresh failed", exc_info=True)
+        finally:
+            db.close()
+        time.sleep(interval)
+
+
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
+    # Sync endpoints and dependencies run in anyio's worker threads (default 40)
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
     try:
         create_tables()
         # Run database migrations on startup (ensures schema is up to date)
@@ -53,6 +77,13 @@ async def startup_event():
     except Exception as e:
         # Log error but don't crash - health endpoint will show DB status
         logger.error(f"Database initialization failed: {e}")
+    if settings.ROLLUP_REFRESH_SECONDS > 0:
+        threading.Thread(
+            target=refresh_rollups_forever,
+            args=(settings.ROLLUP_REFRESH_SECONDS,),
+            name="rollup-refresh",
+            daemon=True,
+        ).start()
 
 # Configure CORS for frontend (Azure + local) - MUST be first middleware
 # Log CORS origins for debugging
@@ -67,29 +98,85 @@ class CORSHeaderMiddleware(BaseHTTPMiddleware):
         import json
         import time
         try:
-            with open("/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log", "a") as f:
-                f.write(json.dumps({"id": f"log_{int(time.time() * 1000)}_cors_entry", "timestamp": int(time.time() * 1000), "location": "main.py:46", "message": "CORS middleware entry", "data": {"path": request.url.path, "method": request.method}, "sessionId": "debug-session", "runId": "run1", "hypothesisId": "B"}) + "\n")
-        except: pass
+            with open(
+                "/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log",
+                "a",
+            ) as f:
+                f.write(
+                    json.dumps(
+                        {
+                            "id": f"log_{int(time.time() * 1000)}_cors_entry",
+                            "timestamp": int(time.time() * 1000),
+                            "location": "main.py:46",
+                            "message": "CORS middleware entry",
+                            "data": {"path": request.url.path, "method": request.method},
+                            "sessionId": "debug-session",
+                            "runId": "run1",
+                            "hypothesisId": "B",
+                        }
+                    )
+                    + "\n"
+                )
+        except:
+            pass
         # #endregion
         origin = request.headers.get("origin")
-        logger.info(f"Request from origin: {origin}, Path: {request.url.path}, Method: {request.method}")
-        
+        logger.info(
+            f"Request from origin: {origin}, Path: {request.url.path}, Method: {request.method}"
+        )
+
         response = None
         try:
             response = await call_next(request)
             # #region agent log
             try:
-                with open("/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log", "a") as f:
-                    f.write(json.dumps({"id": f"log_{int(time.time() * 1000)}_cors_success", "timestamp": int(time.time() * 1000), "location": "main.py:55", "message": "CORS middleware - request processed", "data": {"status_code": response.status_code if response else None}, "sessionId": "debug-session", "runId": "run1", "hypothesisId": "B"}) + "\n")
-            except: pass
+                with open(
+                    "/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log",
+                    "a",
+                ) as f:
+                    f.write(
+                        json.dumps(
+                            {
+                                "id": f"log_{int(time.time() * 1000)}_cors_success",
+                                "timestamp": int(time.time() * 1000),
+                                "location": "main.py:55",
+                                "message": "CORS middleware - request processed",
+                                "data": {"status_code": response.status_code if response else None},
+                                "sessionId": "debug-session",
+                                "runId": "run1",
+                                "hypothesisId": "B",
+                            }
+                        )
+                        + "\n"
+                    )
+            except:
+                pass
             # #endregion
         except Exception as e:
             logger.error(f"Error in request: {str(e)}", exc_info=True)
             # #region agent log
             try:
-                with open("/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log", "a") as f:
-                    f.write(json.dumps({"id": f"log_{int(time.time() * 1000)}_cors_exception", "timestamp": int(time.time() * 1000), "location": "main.py:62", "message": "CORS middleware - exception caught", "data": {"error": str(e)}, "sessionId": "debug-session", "runId": "run1", "hypothesisId": "B"}) + "\n")
-            except: pass
+                with open(
+                    "/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log",
+                    "a",
+                ) as f:
+                    f.write(
+                        json.dumps(
+                            {
+                                "id": f"log_{int(time.time() * 1000)}_cors_exception",
+                                "timestamp": int(time.time() * 1000),
+                                "location": "main.py:62",
+                                "message": "CORS middleware - exception caught",
+                                "data": {"error": str(e)},
+                                "sessionId": "debug-session",
+                                "runId": "run1",
+                                "hypothesisId": "B",
+                            }
+                        )
+                        + "\n"
+                    )
+            except:
+                pass
             # #endregion
             # Create error response with CORS headers
             from fastapi.responses import JSONResponse
@@ -107,9 +194,27 @@ class CORSHeaderMiddleware(BaseHTTPMiddleware):
                 logger.info(f"Added CORS headers for origin: {origin}")
                 # #region agent log
                 try:
-                    with open("/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log", "a") as f:
-                        f.write(json.dumps({"id": f"log_{int(time.time() * 1000)}_cors_headers_added", "timestamp": int(time.time() * 1000), "location": "main.py:72", "message": "CORS headers added to response", "data": {"origin": origin}, "sessionId": "debug-session", "runId": "run1", "hypothesisId": "B"}) + "\n")
-                except: pass
+                    with open(
+                        "/Users/ryanmuenker/Desktop/School/DEVOPS/streaky group project/streaky/.cursor/debug.log",
+                        "a",
+                    ) as f:
+                        f.write(
+                            json.dumps(
+                                {
+                                    "id": f"log_{int(time.time() * 1000)}_cors_headers_added",
+                                    "timestamp": int(time.time() * 1000),
+                                    "location": "main.py:72",
+                                    "message": "CORS headers added to response",
+                                    "data": {"origin": origin},
+                                    "sessionId": "debug-session",
+                                    "runId": "run1",
+                                    "hypothesisId": "B",
+                                }
+                            )
+                            + "\n"
+                        )
+                except:
+                    pass
                 # #endregion
             else:
                 logger.warning(f"Origin not allowed: {origin}, Allowed: {settings.cors_origins}")
@@ -126,7 +231,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor", "ETag"],  # "*" is not honored with credentials
     max_age=600,
 )
 
@@ -159,6 +264,8 @@ app.include_router(monitoring.router)  # Health checks and metrics
 app.include_router(auth.router)
 app.include_router(habits.router)
 app.include_router(categories.router)
+app.include_router(export.router)
+app.include_router(imports.router)
 
 @app.get("/")
 async def root():
@@ -186,14 +293,20 @@ async def root():
                 "add_habit": "POST /categories/{id}/habits/{habit_id}",
                 "remove_habit": "DELETE /categories/{id}/habits/{habit_id}"
             },
+            "data": {
+                "export": "GET /export?format=ndjson|csv",
+                "import": "POST /import (multipart file, NDJSON or CSV)"
+            },
             "auth": {
-                "login": "POST /token"
+                "login": "POST /token",
+                "delete_account": "DELETE /auth/me"
             },
             "monitoring": {
                 "health": "GET /health",
                 "version": "GET /version",
                 "metrics": "GET /metrics (Prometheus)",
                 "business_metrics": "GET /business-metrics (JSON)",
+                "business_metrics_daily": "GET /business-metrics/daily?days=30 (JSON)",
                 "system": "GET /system"
             }
         }
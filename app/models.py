@@ -1,25 +1,48 @@
-from datetime import date as date_type, time as time_type
-from typing import Optional
+from datetime import date as date_type, datetime, time as time_type
 
-from sqlalchemy import Column, Date, ForeignKey, Integer, String, Table, Text, Time
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Table,
+    Text,
+    Time,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
 
-# Association table for many-to-many relationship between habits and categories
+# Association table for many-to-many relationship between habits and categories.
+# Rows of a habit or a category, like entries and streak state, are removed by
+# the database's ON DELETE CASCADE, so deletes never load children first.
 habit_categories = Table(
     "habit_categories",
     Base.metadata,
-    Column("habit_id", Integer, ForeignKey("habits.id"), primary_key=True),
-    Column("category_id", Integer, ForeignKey("categories.id"), primary_key=True),
+    Column("habit_id", Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True),
+    Column(
+        "category_id", Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    ),
 )
 
 
 class User(Base):
     __tablename__ = "users"
+    # Ids are never reissued (SQLite would otherwise reuse a deleted user's),
+    # so a deleted account's tokens can never pass as a new user
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
-    username = Column(String(255), unique=True, index=True, nullable=False)  # Length required for SQL Server index
+    username = Column(
+        String(255), unique=True, index=True, nullable=False
+    )  # Length required for SQL Server index
     hashed_password = Column(String(255), nullable=False)
+    # Bumped with every change to the user's habits, entries or categories (ETags of their lists)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
 class Category(Base):
     __tablename__ = "categories"
@@ -28,25 +51,166 @@ class Category(Base):
     name: Mapped[str] = mapped_column(String(100), index=True)
     color: Mapped[str] = mapped_column(String(7), default="#6366f1")  # Hex color code
 
-    habits = relationship("Habit", secondary=habit_categories, back_populates="categories")
+    habits = relationship(
+        "Habit", secondary=habit_categories, back_populates="categories", passive_deletes=True
+    )
 
 
 class Habit(Base):
     __tablename__ = "habits"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
-    name: Mapped[str] = mapped_column(String(255), index=True, nullable=False)  # Length required for SQL Server index
+    name: Mapped[str] = mapped_column(
+        String(255), index=True, nullable=False
+    )  # Length required for SQL Server index
     goal_type: Mapped[str] = mapped_column(String(50), nullable=False)  # 'daily' or 'weekly'
-    reminder_time: Mapped[Optional[time_type]] = mapped_column(Time, nullable=True)  # Optional reminder time
+    reminder_time: Mapped[time_type | None] = mapped_column(
+        Time, nullable=True
+    )  # Optional reminder time
+    # Set on insert for the daily rollups; habits created before the column existed have none
+    created_at: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True, default=func.now(), index=True
+    )
+    # Bumped with every change to the habit, its entries or its categories (ETags of its endpoints)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+    entries = relationship(
+        "Entry", back_populates="habit", cascade="all, delete-orphan", passive_deletes=True
+    )
+    categories = relationship(
+        "Category", secondary=habit_categories, back_populates="habits", passive_deletes=True
+    )
+    streak = relationship(
+        "HabitStreak", uselist=False, cascade="all, delete-orphan", passive_deletes=True
+    )
 
-    entries = relationship("Entry", back_populates="habit", cascade="all, delete-orphan")
-    categories = relationship("Category", secondary=habit_categories, back_populates="habits")
 
 class Entry(Base):
     __tablename__ = "entries"
+    __table_args__ = (
+        # One entry per habit per day; also serves every per-habit date range lookup
+        Index("uq_entries_habit_id_date", "habit_id", "date", unique=True),
+        # Lets the daily rollup refresh read one day's entries without a scan
+        Index("ix_entries_date", "date"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    habit_id: Mapped[int] = mapped_column(Integer, ForeignKey("habits.id"), nullable=False)
+    habit_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False
+    )
     date: Mapped[date_type] = mapped_column(Date, nullable=False)
-    journal: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    journal: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     habit = relationship("Habit", back_populates="entries")
+
+
+class EntryArchive(Base):
+    """Cold storage for entries older than the archive horizon (see HabitStreak.archived_through).
+
+    Same columns as entries, so an archived row can stand in for an Entry
+    wherever one is read or its journal edited.
+    """
+    __tablename__ = "entries_archive"
+    __table_args__ = (
+        Index("uq_entries_archive_habit_id_date", "habit_id", "date", unique=True),
+        Index("ix_entries_archive_date", "date"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)  # The id it had in entries
+    habit_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False
+    )
+    date: Mapped[date_type] = mapped_column(Date, nullable=False)
+    journal: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+class EntryYearSummary(Base):
+    """Runs and totals of one habit's archived entries in one year.
+
+    Folded in order with the hot entries they give full-history streak state
+    without reading archived rows (see app.utils.streak.fold_segments).
+    """
+    __tablename__ = "entry_year_summaries"
+    habit_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True
+    )
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entry_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    journal_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_date: Mapped[date_type] = mapped_column(Date, nullable=False)
+    last_date: Mapped[date_type] = mapped_column(Date, nullable=False)
+    best_run: Mapped[int] = mapped_column(Integer, nullable=False)
+    leading_run: Mapped[int] = mapped_column(Integer, nullable=False)
+    trailing_run: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class HabitYearBitmap(Base):
+    """The days a habit was logged in one year, one bit per day (see app.utils.daybits).
+
+    Kept in step with entries, hot and archived, by every write path; it
+    answers calendars, stats windows and full-history streaks without
+    reading entry rows. A year without a row (not drawn yet, or empty) is
+    read from entries instead. Journals stay in entries.
+    """
+    __tablename__ = "habit_year_bitmaps"
+    habit_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True
+    )
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    days: Mapped[bytes] = mapped_column(LargeBinary(46), nullable=False)
+
+
+class HabitStreak(Base):
+    """Materialized streak state for a habit, maintained as entries are logged.
+
+    The "current run" is the run of consecutive days ending at last_entry_date.
+    """
+    __tablename__ = "habit_streaks"
+    habit_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True
+    )
+    current_run_start: Mapped[date_type | None] = mapped_column(Date, nullable=True)
+    current_run_length: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    best_run_length: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_entry_date: Mapped[date_type | None] = mapped_column(Date, nullable=True)
+    total_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Every entry dated on or before this day lives in entries_archive, later ones in entries
+    archived_through: Mapped[date_type | None] = mapped_column(Date, nullable=True)
+
+
+class PurgeJob(Base):
+    """A bounded-batch delete in progress: an account deletion or a retention purge.
+
+    Each batch commits together with the job's progress, so an interrupted job
+    resumes at the batch it stopped on. last_id is the highest id removed in
+    the current stage.
+    """
+    __tablename__ = "purge_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)  # 'account' or 'retention'
+    user_id: Mapped[int | None] = mapped_column(
+        Integer, nullable=True, index=True
+    )  # No FK: the user goes last
+    cutoff: Mapped[date_type | None] = mapped_column(
+        Date, nullable=True
+    )  # Retention: entries before this date
+    stage: Mapped[str] = mapped_column(String(20), nullable=False, default="entries")
+    last_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    deleted_rows: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, server_default=func.now()
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class DailyRollup(Base):
+    """Per-day activity totals for metrics and dashboards, refreshed by RollupService.
+
+    Entries are counted on the date they were logged for, habits on the day
+    they were created.
+    """
+    __tablename__ = "daily_rollups"
+    day: Mapped[date_type] = mapped_column(Date, primary_key=True)
+    entries_logged: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    journals_written: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    active_users: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    habits_created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
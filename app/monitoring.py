@@ -3,7 +3,6 @@ Prometheus metrics integration for monitoring and telemetry
 """
 import time
 import logging
-from typing import Optional
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
@@ -66,6 +65,13 @@ active_habits = Gauge(
     'Number of active habits'
 )
 
+# Cache lookups, by cache and result ("hit" or "miss")
+cache_requests_total = Counter(
+    'cache_requests_total',
+    'Total cache lookups',
+    ['cache', 'result']
+)
+
 
 class MonitoringMiddleware(BaseHTTPMiddleware):
     """
@@ -184,12 +190,12 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
         return path
 
 
-def track_event(name: str, properties: Optional[dict] = None):
+def track_event(name: str, properties: dict | None = None):
     """Track custom event (logged for Prometheus)"""
     logger.info(f"Event: {name}", extra={"custom_dimensions": properties or {}})
 
 
-def track_metric(name: str, value: float, properties: Optional[dict] = None):
+def track_metric(name: str, value: float, properties: dict | None = None):
     """Track custom metric (logged for Prometheus)"""
     logger.info(f"Metric: {name}={value}", extra={"custom_dimensions": properties or {}})
 
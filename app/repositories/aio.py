@@ -0,0 +1,29 @@
+"""
+Async repositories.
+
+Each one drives its SQLAlchemy repository through app.db.run_on: on an
+AsyncSession the same queries are awaited on the event loop, on a sync
+Session (SQL Server through pymssql) they run in the threadpool. Streams
+are left out; a stream opens its own sync session (see app.services.export).
+"""
+
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import run_on
+
+R = TypeVar("R", covariant=True)
+T = TypeVar("T")
+
+
+class AsyncSqlAlchemyRepository(Generic[R]):
+    def __init__(self, session: Session | AsyncSession, sync: Callable[[Session], R]):
+        self.session = session
+        # Builds the sync repository on the Session the work runs on
+        self.sync = sync
+
+    async def _run(self, call: Callable[[R], T]) -> T:
+        return await run_on(self.session, lambda session: call(self.sync(session)))
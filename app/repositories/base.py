@@ -1,38 +1,125 @@
 from collections.abc import Iterable
 from datetime import date, time
-from typing import Protocol, Optional, List, Union
+from typing import Protocol
+from collections.abc import Iterator, Sequence
 
-from app.models import Category, Entry, Habit
+from app.models import Category, DailyRollup, Entry, EntryArchive, Habit, HabitStreak, PurgeJob
 
 # Sentinel to indicate reminder_time was not provided in update
 _REMINDER_TIME_NOT_PROVIDED = object()
 
 
 class HabitRepository(Protocol):
-    def create(self, user_id: int, name: str, goal_type: str, reminder_time: Optional[time] = None) -> Habit: ...
-    def get(self, habit_id: int) -> Optional[Habit]: ...
-    def list_by_user(self, user_id: int) -> List[Habit]: ...
-    def list_by_user_and_category(self, user_id: int, category_id: int) -> List[Habit]: ...
+    def create(
+        self,
+        user_id: int,
+        name: str,
+        goal_type: str,
+        reminder_time: time | None = None,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit: ...
+    def get(self, habit_id: int) -> Habit | None: ...
+    def get_for_user(self, habit_id: int, user_id: int) -> Habit | None: ...
+    def list_by_user(
+        self, user_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]: ...
+    def list_by_user_and_category(
+        self, user_id: int, category_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]: ...
+    def owned_ids(self, user_id: int, habit_ids: Sequence[int]) -> set[int]: ...
+    def categories_for_user(self, user_id: int, category_ids: Sequence[int]) -> list[Category]: ...
     def exists_name(self, user_id: int, name: str) -> bool: ...
-    def update(self, habit_id: int, name: Optional[str], goal_type: Optional[str], reminder_time: Union[Optional[time], object] = _REMINDER_TIME_NOT_PROVIDED) -> Optional[Habit]: ...
+    def update(
+        self,
+        habit_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_NOT_PROVIDED,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit | None: ...
     def delete(self, habit_id: int) -> bool: ...
-    def add_category(self, habit_id: int, category: Category) -> Optional[Habit]: ...
-    def remove_category(self, habit_id: int, category: Category) -> Optional[Habit]: ...
+    def delete_for_user(self, habit_id: int, user_id: int) -> bool: ...
+    def add_category(self, habit_id: int, category: Category) -> Habit | None: ...
+    def remove_category(self, habit_id: int, category: Category) -> Habit | None: ...
+    def version_for_user(self, habit_id: int, user_id: int) -> int | None: ...
+    def user_version(self, user_id: int) -> int | None: ...
 
 
 class EntryRepository(Protocol):
     def exists_on(self, habit_id: int, d: date) -> bool: ...
-    def create(self, habit_id: int, d: date, journal: Optional[str] = None) -> Entry: ...
+    def create(self, habit_id: int, d: date, journal: str | None = None) -> Entry: ...
+    def upsert(self, habit_id: int, d: date, journal: str | None = None) -> None: ...
+    def upsert_many(self, items: Sequence[tuple[int, date, str | None]]) -> None: ...
+    def insert_many(self, rows: Sequence[tuple[int, date, str | None]]) -> int: ...
     def dates_between(self, habit_id: int, start: date, end: date) -> Iterable[date]: ...
-    def get_by_date(self, habit_id: int, d: date) -> Optional[Entry]: ...
-    def update_journal(self, habit_id: int, d: date, journal: Optional[str]) -> Optional[Entry]: ...
-    def list_by_habit(self, habit_id: int) -> List[Entry]: ...
+    def dates_between_many(
+        self, habit_ids: Sequence[int], start: date, end: date
+    ) -> dict[int, set[date]]: ...
+    def get_by_date(self, habit_id: int, d: date) -> Entry | EntryArchive | None: ...
+    def get_by_date_for_user(
+        self, habit_id: int, user_id: int, d: date
+    ) -> tuple[Habit, Entry | EntryArchive | None] | None: ...
+    def update_journal(
+        self, habit_id: int, d: date, journal: str | None
+    ) -> Entry | EntryArchive | None: ...
+    def set_journal(
+        self, entry: Entry | EntryArchive, journal: str | None
+    ) -> Entry | EntryArchive: ...
+    def dates_between_for_user(
+        self, habit_id: int, user_id: int, start: date, end: date
+    ) -> tuple[Habit, set[date]] | None: ...
+    def list_by_habit(
+        self, habit_id: int, limit: int | None = None, before: date | None = None
+    ) -> list[Entry | EntryArchive]: ...
+    def list_by_habit_for_user(
+        self, habit_id: int, user_id: int, limit: int | None = None, before: date | None = None
+    ) -> list[Entry | EntryArchive] | None: ...
+    def stream_by_user(
+        self, user_id: int, batch_size: int = 1000
+    ) -> Iterator[tuple[int, date, str | None]]: ...
+    def computed_streaks(
+        self, habit_ids: Sequence[int], today: date
+    ) -> dict[int, tuple[int, int]]: ...
+    def streaks(self, habit_ids: Sequence[int]) -> dict[int, HabitStreak]: ...
+    def rebuild_streaks(
+        self, habit_ids: Sequence[int], years: Iterable[tuple[int, int]] = ()
+    ) -> None: ...
+    def forget_days(self, days: Iterable[tuple[int, date]]) -> None: ...
+    def rebuild_bitmaps(self, habit_ids: Sequence[int]) -> None: ...
 
 
 class CategoryRepository(Protocol):
     def create(self, user_id: int, name: str, color: str = "#6366f1") -> Category: ...
-    def get(self, category_id: int) -> Optional[Category]: ...
-    def list_by_user(self, user_id: int) -> List[Category]: ...
+    def get(self, category_id: int) -> Category | None: ...
+    def get_for_user(self, category_id: int, user_id: int) -> Category | None: ...
+    def list_by_user(self, user_id: int) -> list[Category]: ...
     def exists_name(self, user_id: int, name: str) -> bool: ...
-    def update(self, category_id: int, name: Optional[str], color: Optional[str]) -> Optional[Category]: ...
+    def update(self, category_id: int, name: str | None, color: str | None) -> Category | None: ...
     def delete(self, category_id: int) -> bool: ...
+    def delete_for_user(self, category_id: int, user_id: int) -> bool: ...
+
+
+class PurgeRepository(Protocol):
+    def create_job(
+        self, kind: str, stage: str, user_id: int | None = None, cutoff: date | None = None
+    ) -> PurgeJob: ...
+    def get_job(self, job_id: int) -> PurgeJob | None: ...
+    def pending_job(self, kind: str, user_id: int | None = None) -> PurgeJob | None: ...
+    def pending_jobs(self) -> list[PurgeJob]: ...
+    def user_exists(self, user_id: int) -> bool: ...
+    def purge_entries(self, job: PurgeJob, limit: int) -> list[tuple[int, int, date]]: ...
+    def purge_archive(self, job: PurgeJob, limit: int) -> list[tuple[int, int, date]]: ...
+    def archive_entries(self, job: PurgeJob, limit: int) -> int: ...
+    def purge_habits(self, job: PurgeJob, limit: int) -> int: ...
+    def purge_categories(self, job: PurgeJob, limit: int) -> int: ...
+    def purge_user(self, job: PurgeJob) -> bool: ...
+    def set_stage(self, job: PurgeJob, stage: str) -> None: ...
+    def finish(self, job: PurgeJob) -> None: ...
+
+
+class RollupRepository(Protocol):
+    def refresh(self, start: date, end: date) -> int: ...
+    def between(self, start: date, end: date) -> list[DailyRollup]: ...
+    def latest_day(self) -> date | None: ...
+    def first_activity_day(self) -> date | None: ...
+    def totals(self) -> tuple[int, int]: ...
@@ -1,9 +1,14 @@
-from typing import Optional, List
+from typing import cast
+from sqlalchemy import delete
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models import Category
 
+from .aio import AsyncSqlAlchemyRepository
 from .base import CategoryRepository
+from .versions import bump_user
 
 
 class SqlAlchemyCategoryRepository(CategoryRepository):
@@ -13,14 +18,23 @@ class SqlAlchemyCategoryRepository(CategoryRepository):
     def create(self, user_id: int, name: str, color: str = "#6366f1") -> Category:
         category = Category(user_id=user_id, name=name, color=color)
         self.session.add(category)
+        bump_user(self.session, user_id)
         self.session.commit()
-        self.session.refresh(category)
         return category
 
-    def get(self, category_id: int) -> Optional[Category]:
-        return self.session.query(Category).filter(Category.id == category_id).first()
+    def get(self, category_id: int) -> Category | None:
+        # Identity map first: a category already loaded by get_for_user costs no query
+        return self.session.get(Category, category_id)
 
-    def list_by_user(self, user_id: int) -> List[Category]:
+    def get_for_user(self, category_id: int, user_id: int) -> Category | None:
+        """The category if the user owns it, in one query."""
+        return (
+            self.session.query(Category)
+            .filter(Category.id == category_id, Category.user_id == user_id)
+            .first()
+        )
+
+    def list_by_user(self, user_id: int) -> list[Category]:
         return self.session.query(Category).filter(Category.user_id == user_id).all()
 
     def exists_name(self, user_id: int, name: str) -> bool:
@@ -31,7 +45,7 @@ class SqlAlchemyCategoryRepository(CategoryRepository):
             is not None
         )
 
-    def update(self, category_id: int, name: Optional[str], color: Optional[str]) -> Optional[Category]:
+    def update(self, category_id: int, name: str | None, color: str | None) -> Category | None:
         category = self.get(category_id)
         if not category:
             return None
@@ -39,14 +53,59 @@ class SqlAlchemyCategoryRepository(CategoryRepository):
             category.name = name
         if color is not None:
             category.color = color
+        bump_user(self.session, category.user_id)
         self.session.commit()
-        self.session.refresh(category)
         return category
 
     def delete(self, category_id: int) -> bool:
         category = self.get(category_id)
-        if not category:
-            return False
-        self.session.delete(category)
+        return category is not None and self._delete(
+            delete(Category).where(Category.id == category_id), category.user_id
+        )
+
+    def delete_for_user(self, category_id: int, user_id: int) -> bool:
+        """Delete the category if the user owns it; the database cascades the rest."""
+        return self._delete(
+            delete(Category).where(Category.id == category_id, Category.user_id == user_id), user_id
+        )
+
+    def _delete(self, stmt, user_id: int) -> bool:
+        result = cast(
+            CursorResult, self.session.execute(stmt.execution_options(synchronize_session=False))
+        )
+        deleted: int = result.rowcount
+        if deleted:
+            bump_user(self.session, user_id)
         self.session.commit()
-        return True
+        return deleted > 0
+
+
+class AsyncSqlAlchemyCategoryRepository(AsyncSqlAlchemyRepository[SqlAlchemyCategoryRepository]):
+    def __init__(self, session: Session | AsyncSession):
+        super().__init__(session, SqlAlchemyCategoryRepository)
+
+    async def create(self, user_id: int, name: str, color: str = "#6366f1") -> Category:
+        return await self._run(lambda repo: repo.create(user_id, name, color))
+
+    async def get(self, category_id: int) -> Category | None:
+        return await self._run(lambda repo: repo.get(category_id))
+
+    async def get_for_user(self, category_id: int, user_id: int) -> Category | None:
+        return await self._run(lambda repo: repo.get_for_user(category_id, user_id))
+
+    async def list_by_user(self, user_id: int) -> list[Category]:
+        return await self._run(lambda repo: repo.list_by_user(user_id))
+
+    async def exists_name(self, user_id: int, name: str) -> bool:
+        return await self._run(lambda repo: repo.exists_name(user_id, name))
+
+    async def update(
+        self, category_id: int, name: str | None, color: str | None
+    ) -> Category | None:
+        return await self._run(lambda repo: repo.update(category_id, name, color))
+
+    async def delete(self, category_id: int) -> bool:
+        return await self._run(lambda repo: repo.delete(category_id))
+
+    async def delete_for_user(self, category_id: int, user_id: int) -> bool:
+        return await self._run(lambda repo: repo.delete_for_user(category_id, user_id))
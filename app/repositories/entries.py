@@ -1,12 +1,68 @@
-from collections.abc import Iterable
-from datetime import date
-from typing import Optional, List
+import sqlite3
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import date, timedelta
+from typing import Any, cast
 
+from sqlalchemy import Date, and_, bindparam, func, insert, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models import Entry
+from app.models import Entry, EntryArchive, EntryYearSummary, Habit, HabitStreak, HabitYearBitmap
+from app.utils.daybits import days_of, streaks_of, with_days
+from app.utils.streak import (
+    Segment,
+    batch_streaks_by_habit,
+    fold_segments,
+    run_containing,
+    segment_of,
+)
 
+from .aio import AsyncSqlAlchemyRepository
 from .base import EntryRepository
+from .versions import bump_habits
+
+# SQL Server has no INSERT ... ON CONFLICT; HOLDLOCK makes the MERGE race-free
+_MSSQL_UPSERT_SQL = """
+MERGE {table} WITH (HOLDLOCK) AS target
+USING (SELECT :habit_id AS habit_id, :date AS date, :journal AS journal) AS source
+ON target.habit_id = source.habit_id AND target.date = source.date
+WHEN MATCHED AND source.journal IS NOT NULL THEN UPDATE SET journal = source.journal
+WHEN NOT MATCHED THEN INSERT (habit_id, date, journal)
+    VALUES (source.habit_id, source.date, source.journal);
+"""
+
+# Gaps-and-islands: consecutive dates minus their row number share one value,
+# so each (habit_id, grp) group is a run. Per dialect: (grp, days from run_start to :today)
+_ISLAND_EXPRESSIONS = {
+    "sqlite": ("julianday(date) - rn", "CAST(julianday(:today) - julianday(run_start) AS INTEGER)"),
+    "mssql": ("DATEADD(day, -CAST(rn AS INT), date)", "DATEDIFF(day, run_start, :today)"),
+    "postgresql": ("date - CAST(rn AS INTEGER)", "(:today - run_start)"),
+}
+# A day is never both hot and archived, so the union has no duplicate dates
+_ISLANDS_SQL = """
+WITH history AS (
+    SELECT habit_id, date FROM entries WHERE habit_id IN :habit_ids
+    UNION ALL
+    SELECT habit_id, date FROM entries_archive WHERE habit_id IN :habit_ids
+),
+numbered AS (
+    SELECT habit_id, date, ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY date) AS rn
+    FROM history
+),
+runs AS (
+    SELECT habit_id, MIN(date) AS run_start, MAX(date) AS run_end, COUNT(*) AS run_length
+    FROM (SELECT habit_id, date, {grp} AS grp FROM numbered) AS islands
+    GROUP BY habit_id, grp
+)
+SELECT habit_id,
+       MAX(CASE WHEN run_start <= :today AND run_end >= :today THEN {elapsed} + 1 ELSE 0 END),
+       MAX(run_length)
+FROM runs
+GROUP BY habit_id
+"""
 
 
 class SqlAlchemyEntryRepository(EntryRepository):
@@ -21,41 +77,831 @@ class SqlAlchemyEntryRepository(EntryRepository):
             is not None
         )
 
-    def create(self, habit_id: int, d: date, journal: Optional[str] = None) -> Entry:
+    def create(self, habit_id: int, d: date, journal: str | None = None) -> Entry:
         entry = Entry(habit_id=habit_id, date=d, journal=journal)
+        self._lock_states([habit_id])
+        bitmaps = self._bitmaps([(habit_id, d)])
+        rebuild = not self._record_streak(habit_id, d, bitmaps)
+        self._set_day(bitmaps, habit_id, d)
         self.session.add(entry)
+        if rebuild:
+            self.session.flush()
+            self._rebuild_states([habit_id])
+        bump_habits(self.session, [habit_id])
         self.session.commit()
-        self.session.refresh(entry)
         return entry
 
+    def upsert(self, habit_id: int, d: date, journal: str | None = None) -> None:
+        """Log an entry in a single statement, or set its journal if the day is already logged.
+
+        A None journal never clears an existing one.
+        """
+        self.upsert_many([(habit_id, d, journal)])
+
+    def upsert_many(self, items: Sequence[tuple[int, date, str | None]]) -> None:
+        """Upsert several (habit_id, date, journal) entries in one transaction.
+
+        Days on or before a habit's archive horizon are written to the archive.
+        """
+        self._lock_states({habit_id for habit_id, _, _ in items})
+        # Reads the touched year bitmaps before the first write
+        bitmaps = self._bitmaps([(habit_id, d) for habit_id, d, _ in items])
+        rebuild, years = set(), set()
+        for habit_id, d, journal in items:
+            if not self._record_streak(habit_id, d, bitmaps):
+                rebuild.add(habit_id)
+            self._set_day(bitmaps, habit_id, d)
+            model = self._table_for(habit_id, d)
+            if model is EntryArchive:
+                years.add((habit_id, d.year))
+            self._upsert_one(model, habit_id, d, journal)
+        if rebuild or years:
+            self.session.flush()
+            self._summarize(years)
+        if rebuild:
+            self._rebuild_states(sorted(rebuild))
+        bump_habits(self.session, {habit_id for habit_id, _, _ in items})
+        self.session.commit()
+
+    def _upsert_one(
+        self, model: type[Entry | EntryArchive], habit_id: int, d: date, journal: str | None
+    ) -> None:
+        dialect = self.session.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            dialect_insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = dialect_insert(model).values(habit_id=habit_id, date=d, journal=journal)
+            if journal is None:
+                stmt = stmt.on_conflict_do_nothing(index_elements=["habit_id", "date"])
+            else:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["habit_id", "date"], set_={"journal": stmt.excluded.journal}
+                )
+            self.session.execute(stmt)
+        elif dialect == "mssql":
+            merge = text(_MSSQL_UPSERT_SQL.format(table=model.__tablename__)).bindparams(
+                bindparam("date", type_=Date)
+            )
+            self.session.execute(merge, {"habit_id": habit_id, "date": d, "journal": journal})
+        else:
+            entry = cast(
+                Entry | EntryArchive | None,
+                self.session.query(model)
+                .filter(model.habit_id == habit_id, model.date == d)
+                .first(),
+            )
+            if entry is None:
+                self.session.add(model(habit_id=habit_id, date=d, journal=journal))
+            elif journal is not None:
+                entry.journal = journal
+            # Later items of a batch must see this one
+            self.session.flush()
+
+    def insert_many(self, rows: Sequence[tuple[int, date, str | None]]) -> int:
+        """Insert (habit_id, date, journal) rows in one transaction, skipping days already logged.
+
+        Existing days are found with one range query and the rest go out as a
+        single executemany. Streak state of the touched habits is recomputed
+        from their year bitmaps in the same transaction, so a long import in
+        many calls never rereads the entries. Returns the number of rows inserted.
+        """
+        new: dict[tuple[int, date], str | None] = {}
+        for habit_id, d, journal in rows:
+            new.setdefault((habit_id, d), journal)
+        if not new:
+            return 0
+        try:
+            return self._insert_new(new)
+        except IntegrityError:
+            # A concurrent write logged one of these days after the duplicate check
+            self.session.rollback()
+            return self._insert_new(new)
+
+    def _insert_new(self, new: dict[tuple[int, date], str | None]) -> int:
+        habit_ids = sorted({habit_id for habit_id, _ in new})
+        self._lock_states(habit_ids)
+        days = [d for _, d in new]
+        existing = self.dates_between_many(habit_ids, min(days), max(days))
+        horizons = {
+            habit_id: state.archived_through for habit_id, state in self.streaks(habit_ids).items()
+        }
+        hot: list[dict[str, Any]] = []
+        cold: list[dict[str, Any]] = []
+        for (habit_id, d), journal in new.items():
+            if d not in existing[habit_id]:
+                archived_through = horizons.get(habit_id)
+                archived = archived_through is not None and d <= archived_through
+                (cold if archived else hot).append(
+                    {"habit_id": habit_id, "date": d, "journal": journal}
+                )
+        bitmaps = self._bitmaps([(row["habit_id"], row["date"]) for row in hot + cold])
+        for row in hot + cold:
+            self._set_day(bitmaps, row["habit_id"], row["date"])
+        if hot:
+            self.session.execute(insert(Entry), hot)
+        if cold:
+            self.session.execute(insert(EntryArchive), cold)
+            self._summarize({(row["habit_id"], row["date"].year) for row in cold})
+        if hot or cold:
+            added: dict[int, int] = {}
+            for row in hot + cold:
+                added[row["habit_id"]] = added.get(row["habit_id"], 0) + 1
+            self._restate(added)
+            bump_habits(self.session, added)
+        self.session.commit()
+        return len(hot) + len(cold)
+
     def dates_between(self, habit_id: int, start: date, end: date) -> Iterable[date]:
-        """Get all entry dates for a habit within a date range."""
-        entries = self.session.query(Entry.date).filter(
-            Entry.habit_id == habit_id,
-            Entry.date >= start,
-            Entry.date <= end
-        ).all()
-        return (entry.date for entry in entries)  # Return generator for better memory efficiency
-
-    def get_by_date(self, habit_id: int, d: date) -> Optional[Entry]:
-        return (
-            self.session.query(Entry)
-            .filter(Entry.habit_id == habit_id, Entry.date == d)
-            .first()
+        """Get all entry dates for a habit within a date range, hot or archived.
+
+        Reads one 46-byte bitmap per year in the range instead of entry rows,
+        and entry rows only for years that have no bitmap yet.
+        """
+        drawn = dict(
+            self.session.query(HabitYearBitmap.year, HabitYearBitmap.days).filter(
+                HabitYearBitmap.habit_id == habit_id,
+                HabitYearBitmap.year >= start.year,
+                HabitYearBitmap.year <= end.year,
+            )
         )
+        dates = {d for year, days in drawn.items() for d in days_of(year, days, start, end)}
+        return sorted(dates | self._undrawn_dates(habit_id, set(drawn), start, end))
+
+    def dates_between_many(
+        self, habit_ids: Sequence[int], start: date, end: date
+    ) -> dict[int, set[date]]:
+        """Get entry dates for several habits in a date range, hot and archived, in two queries."""
+        return self._dates_between_many((Entry, EntryArchive), habit_ids, start, end)
+
+    def _dates_between_many(
+        self,
+        models: Sequence[type[Entry | EntryArchive]],
+        habit_ids: Sequence[int],
+        start: date,
+        end: date,
+    ) -> dict[int, set[date]]:
+        out: dict[int, set[date]] = {habit_id: set() for habit_id in habit_ids}
+        if not out:
+            return out
+        for model in models:
+            rows = self.session.query(model.habit_id, model.date).filter(
+                model.habit_id.in_(out.keys()),
+                model.date >= start,
+                model.date <= end
+            )
+            for habit_id, d in rows:
+                out[habit_id].add(d)
+        return out
+
+    def get_by_date(self, habit_id: int, d: date) -> Entry | EntryArchive | None:
+        model = self._table_for(habit_id, d)
+        return cast(Entry | EntryArchive | None, (
+            self.session.query(model)
+            .filter(model.habit_id == habit_id, model.date == d)
+            .first()
+        ))
 
-    def update_journal(self, habit_id: int, d: date, journal: Optional[str]) -> Optional[Entry]:
+    def update_journal(
+        self, habit_id: int, d: date, journal: str | None
+    ) -> Entry | EntryArchive | None:
         entry = self.get_by_date(habit_id, d)
         if entry:
-            entry.journal = journal
-            self.session.commit()
-            self.session.refresh(entry)
+            return self.set_journal(entry, journal)
         return entry
 
-    def list_by_habit(self, habit_id: int) -> List[Entry]:
-        return (
-            self.session.query(Entry)
-            .filter(Entry.habit_id == habit_id)
-            .order_by(Entry.date.desc())
+    def get_by_date_for_user(self, habit_id: int, user_id: int, d: date
+                             ) -> tuple[Habit, Entry | EntryArchive | None] | None:
+        """(habit, entry on d or None) if the user owns the habit, else None, in one query.
+
+        At most one of the hot and archived rows exists for a day.
+        """
+        row = (
+            self.session.query(Habit, Entry, EntryArchive)
+            .outerjoin(Entry, and_(Entry.habit_id == Habit.id, Entry.date == d))
+            .outerjoin(
+                EntryArchive, and_(EntryArchive.habit_id == Habit.id, EntryArchive.date == d)
+            )
+            .filter(Habit.id == habit_id, Habit.user_id == user_id)
+            .first()
+        )
+        if row is None:
+            return None
+        habit, entry, archived = row
+        return habit, entry if entry is not None else archived
+
+    def set_journal(self, entry: Entry | EntryArchive, journal: str | None) -> Entry | EntryArchive:
+        had_journal = entry.journal is not None
+        entry.journal = journal
+        if isinstance(entry, EntryArchive) and had_journal != (journal is not None):
+            self.session.flush()
+            self._summarize({(entry.habit_id, entry.date.year)})
+        bump_habits(self.session, [entry.habit_id])
+        self.session.commit()
+        return entry
+
+    def dates_between_for_user(
+        self, habit_id: int, user_id: int, start: date, end: date
+    ) -> tuple[Habit, set[date]] | None:
+        """(habit, its entry dates in the range) if the user owns the habit, else None.
+
+        The dates come from the year bitmaps in the same query, so a month is
+        one row whether its entries are hot or archived. A year without a
+        bitmap yet is read from entry rows.
+        """
+        rows = (
+            self.session.query(Habit, HabitYearBitmap.year, HabitYearBitmap.days)
+            .outerjoin(
+                HabitYearBitmap,
+                and_(
+                    HabitYearBitmap.habit_id == Habit.id,
+                    HabitYearBitmap.year >= start.year,
+                    HabitYearBitmap.year <= end.year,
+                ),
+            )
+            .filter(Habit.id == habit_id, Habit.user_id == user_id)
             .all()
         )
+        if not rows:
+            return None
+        drawn = {year: days for _, year, days in rows if year is not None}
+        dates = {d for year, days in drawn.items() for d in days_of(year, days, start, end)}
+        return rows[0][0], dates | self._undrawn_dates(habit_id, set(drawn), start, end)
+
+    def _undrawn_dates(self, habit_id: int, drawn: set[int], start: date, end: date) -> set[date]:
+        """Entry dates in start..end from the years not in drawn, read from entry rows.
+
+        A year of a database upgraded past the bitmaps migration has no bitmap
+        until it is written to or scripts/rebuild-streaks.py has run.
+        """
+        missing = [year for year in range(start.year, end.year + 1) if year not in drawn]
+        if not missing:
+            return set()
+        first = max(start, date(missing[0], 1, 1))
+        last = min(end, date(missing[-1], 12, 31))
+        dates = self.dates_between_many([habit_id], first, last)[habit_id]
+        return {d for d in dates if d.year not in drawn}
+
+    def list_by_habit_for_user(self, habit_id: int, user_id: int, limit: int | None = None,
+                               before: date | None = None) -> list[Entry | EntryArchive] | None:
+        """list_by_habit if the user owns the habit, else None, in one query.
+
+        The outer join from habits keeps one row for an owned habit without
+        entries, which tells it apart from a habit that is not the user's.
+        Only a page that runs out of hot entries before the horizon reads
+        the archive.
+        """
+        on = (
+            and_(Entry.habit_id == Habit.id, Entry.date < before)
+            if before is not None
+            else Entry.habit_id == Habit.id
+        )
+        query = (
+            self.session.query(Habit.id, HabitStreak.archived_through, Entry)
+            .outerjoin(HabitStreak, HabitStreak.habit_id == Habit.id)
+            .outerjoin(Entry, on)
+            .filter(Habit.id == habit_id, Habit.user_id == user_id)
+            .order_by(Entry.date.desc())
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+        if not rows:
+            return None
+        entries = [entry for _, _, entry in rows if entry is not None]
+        return entries + self._archived_page(habit_id, rows[0][1], limit, before, len(entries))
+
+    def list_by_habit(self, habit_id: int, limit: int | None = None,
+                      before: date | None = None) -> list[Entry | EntryArchive]:
+        """Entries newest first; with a cursor, only those dated before it.
+
+        The cursor is a keyset on the unique date.
+        """
+        query = self.session.query(Entry).filter(Entry.habit_id == habit_id)
+        if before is not None:
+            query = query.filter(Entry.date < before)
+        query = query.order_by(Entry.date.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        entries = query.all()
+        return entries + self._archived_page(
+            habit_id, self._archived_through(habit_id), limit, before, len(entries)
+        )
+
+    def _archived_page(self, habit_id: int, archived_through: date | None, limit: int | None,
+                       before: date | None, found: int) -> list[EntryArchive]:
+        """The archived rest of a newest-first page that found `found` hot entries."""
+        if archived_through is None or (limit is not None and found >= limit):
+            return []
+        query = self.session.query(EntryArchive).filter(EntryArchive.habit_id == habit_id)
+        if before is not None:
+            query = query.filter(EntryArchive.date < before)
+        query = query.order_by(EntryArchive.date.desc())
+        if limit is not None:
+            query = query.limit(limit - found)
+        return query.all()
+
+    def stream_by_user(
+        self, user_id: int, batch_size: int = 1000
+    ) -> Iterator[tuple[int, date, str | None]]:
+        """Yield (habit_id, date, journal) for all of a user's entries through a server-side cursor.
+
+        Rows are plain tuples fetched batch_size at a time, so memory stays flat
+        however long the history is.
+        """
+        owned = select(Habit.id).where(Habit.user_id == user_id)
+        history = union_all(*(
+            select(model.habit_id, model.date, model.journal).where(model.habit_id.in_(owned))
+            for model in (EntryArchive, Entry)
+        )).subquery()
+        rows = self.session.execute(
+            select(history)
+            .order_by(history.c.habit_id, history.c.date)
+            .execution_options(yield_per=batch_size)
+        )
+        yield from rows
+
+    def computed_streaks(self, habit_ids: Sequence[int], today: date) -> dict[int, tuple[int, int]]:
+        """Compute (current, best) streaks over the full history of several habits.
+
+        Habits whose year bitmaps hold as many days as their state counts are
+        answered from the bitmaps with bit operations. For the rest (no state
+        yet, or years never drawn) the database finds the runs with window
+        functions over hot and archived entries, so only one row per habit
+        comes back. Dialects without a known islands expression (or SQLite
+        builds older than 3.25) fall back to the batch engine over entry dates.
+        """
+        out = dict.fromkeys(habit_ids, (0, 0))
+        if not out:
+            return out
+        years: dict[int, dict[int, bytes]] = {habit_id: {} for habit_id in out}
+        rows = self.session.query(
+            HabitYearBitmap.habit_id, HabitYearBitmap.year, HabitYearBitmap.days
+        ).filter(HabitYearBitmap.habit_id.in_(out.keys()))
+        for habit_id, year, days in rows:
+            years[habit_id][year] = days
+        states = self.streaks(list(out))
+        unverified = []
+        for habit_id, bitmaps in years.items():
+            current, best, count, _ = streaks_of(bitmaps, today)
+            state = states.get(habit_id)
+            if state is not None and count == state.total_count:
+                out[habit_id] = (current, best)
+            else:
+                unverified.append(habit_id)
+        if not unverified:
+            return out
+        dialect = self.session.get_bind().dialect
+        expressions = _ISLAND_EXPRESSIONS.get(dialect.name)
+        if expressions is None or (
+            dialect.name == "sqlite" and sqlite3.sqlite_version_info < (3, 25)
+        ):
+            dates_by_habit = self.dates_between_many(unverified, date.min, date.max)
+            for habit_id, (current, best, _, _) in batch_streaks_by_habit(
+                dates_by_habit, today
+            ).items():
+                out[habit_id] = (current, best)
+            return out
+        grp, elapsed = expressions
+        query = text(_ISLANDS_SQL.format(grp=grp, elapsed=elapsed)).bindparams(
+            bindparam("habit_ids", expanding=True),
+            bindparam("today", type_=Date),
+        )
+        for habit_id, current, best in self.session.execute(
+            query, {"habit_ids": unverified, "today": today}
+        ):
+            out[habit_id] = (int(current), int(best))
+        return out
+
+    def streaks(self, habit_ids: Sequence[int]) -> dict[int, HabitStreak]:
+        """Get the materialized streak state for several habits in a single query."""
+        if not habit_ids:
+            return {}
+        states = self.session.query(HabitStreak).filter(HabitStreak.habit_id.in_(habit_ids))
+        return {state.habit_id: state for state in states}
+
+    def rebuild_streaks(
+        self, habit_ids: Sequence[int], years: Iterable[tuple[int, int]] = ()
+    ) -> None:
+        """Recompute streak state from the full entry history of the given habits.
+
+        The (habit_id, year) pairs in years, whose rows were deleted or moved,
+        have their archive summaries and bitmaps recomputed first. Used by
+        scripts/rebuild-streaks.py and whenever entries are archived.
+        """
+        years = set(years)
+        self._lock_states(habit_ids)
+        self._summarize(years)
+        self._redraw(years)
+        self._rebuild_states(habit_ids)
+        bump_habits(self.session, habit_ids)
+        self.session.commit()
+
+    def forget_days(self, days: Iterable[tuple[int, date]]) -> None:
+        """Update derived data after the given (habit_id, date) entries were deleted, and commit.
+
+        Only the touched years' summaries and bitmaps are recomputed. Streak
+        state is patched from the bitmaps near the deleted days: the count
+        drops, and the current run is measured again if a day of it went.
+        A habit loses its best run only if a deleted day was in a run that
+        long, and only then is its state rebuilt from the full history.
+        """
+        by_habit: dict[int, set[date]] = {}
+        for habit_id, d in days:
+            by_habit.setdefault(habit_id, set()).add(d)
+        habit_ids = sorted(by_habit)
+        self._lock_states(habit_ids)
+        years = {(habit_id, d.year) for habit_id, ds in by_habit.items() for d in ds}
+        self._summarize(years)
+        self._redraw(years)
+        bitmaps: dict[tuple[int, int], HabitYearBitmap] = {}
+        rebuild = []
+        for habit_id, deleted in by_habit.items():
+            state = self.session.get(HabitStreak, habit_id)
+            if state is None or not self._forget(state, deleted, bitmaps):
+                rebuild.append(habit_id)
+        if rebuild:
+            self._rebuild_states(rebuild)
+        bump_habits(self.session, habit_ids)
+        self.session.commit()
+
+    def _forget(
+        self,
+        state: HabitStreak,
+        deleted: set[date],
+        bitmaps: dict[tuple[int, int], HabitYearBitmap],
+    ) -> bool:
+        """Patch the state for deleted days, or return False if it needs a rebuild."""
+        reach = timedelta(days=state.best_run_length)
+        for d in deleted:
+            before = set(self._days_near(bitmaps, state.habit_id, d - reach, d + reach)) | deleted
+            if run_containing(before, d)[1] >= state.best_run_length:
+                return False
+        state.total_count -= len(deleted)
+        last = state.last_entry_date
+        start = state.current_run_start
+        if last is None or start is None or not any(start <= d <= last for d in deleted):
+            return True
+        lasts = [
+            self.session.query(func.max(model.date))
+            .filter(model.habit_id == state.habit_id)
+            .scalar()
+            for model in (Entry, EntryArchive)
+        ]
+        last = max((d for d in lasts if d is not None), default=None)
+        if last is None:
+            state.current_run_start, state.current_run_length = None, 0
+        else:
+            nearby = set(self._days_near(bitmaps, state.habit_id, last - reach, last))
+            state.current_run_start, state.current_run_length = run_containing(nearby, last)
+        state.last_entry_date = last
+        return True
+
+    def rebuild_bitmaps(self, habit_ids: Sequence[int]) -> None:
+        """Recompute every year bitmap of the given habits from their entries, hot and archived."""
+        years = {
+            (habit_id, year)
+            for habit_id, year in self.session.query(
+                HabitYearBitmap.habit_id, HabitYearBitmap.year
+            ).filter(HabitYearBitmap.habit_id.in_(habit_ids))
+        }
+        for habit_id, dates in self.dates_between_many(habit_ids, date.min, date.max).items():
+            years.update((habit_id, d.year) for d in dates)
+        self._redraw(years)
+        self.session.commit()
+
+    def _record_streak(
+        self, habit_id: int, d: date, bitmaps: dict[tuple[int, int], HabitYearBitmap]
+    ) -> bool:
+        """Fold an entry date into the habit's streak state, before the entry is written.
+
+        Extending or starting the latest run is O(1). A backfill before the
+        latest entry only reads the days that can touch its run, from the year
+        bitmaps: the runs on either side of d are at most best_run_length long
+        each. Days that are already logged leave the state untouched.
+
+        Returns False when the habit has no state yet; the caller rebuilds it
+        once the entry is written.
+        """
+        state = self.session.get(HabitStreak, habit_id)
+        if state is None:
+            return False
+
+        last = state.last_entry_date
+        if last is None or d > last:
+            if last is not None and (d - last).days == 1:
+                state.current_run_length += 1
+            else:
+                state.current_run_start, state.current_run_length = d, 1
+            state.last_entry_date = d
+            state.best_run_length = max(state.best_run_length, state.current_run_length)
+            state.total_count += 1
+            return True
+        if d == last:
+            return True
+
+        reach = timedelta(days=state.best_run_length)
+        nearby = set(self._days_near(bitmaps, habit_id, d - reach, d + reach))
+        if d in nearby:
+            return True
+        start, length = run_containing(nearby, d)
+        state.best_run_length = max(state.best_run_length, length)
+        if start + timedelta(days=length - 1) == last:
+            state.current_run_start, state.current_run_length = start, length
+        state.total_count += 1
+        return True
+
+    def _restate(self, added: dict[int, int]) -> None:
+        """Recompute the state of habits that gained added[habit_id] new days from their bitmaps.
+
+        One query reads every year bitmap of the habits, a few rows each
+        however long their history. A habit whose bitmaps do not account for
+        every entry (no state, or years not drawn yet) is rebuilt instead.
+        """
+        self.session.flush()
+        years: dict[int, dict[int, bytes]] = {habit_id: {} for habit_id in added}
+        rows = self.session.query(
+            HabitYearBitmap.habit_id, HabitYearBitmap.year, HabitYearBitmap.days
+        ).filter(HabitYearBitmap.habit_id.in_(added.keys()))
+        for habit_id, year, days in rows:
+            years[habit_id][year] = days
+        states = self.streaks(list(added))
+        rebuild = []
+        for habit_id, bitmaps in years.items():
+            current, best, count, last = streaks_of(bitmaps)
+            state = states.get(habit_id)
+            if state is None or count != state.total_count + added[habit_id]:
+                rebuild.append(habit_id)
+                continue
+            state.current_run_length, state.best_run_length = current, best
+            state.current_run_start = last - timedelta(days=current - 1) if last else None
+            state.last_entry_date, state.total_count = last, count
+        if rebuild:
+            self._rebuild_states(rebuild)
+
+    def _lock_states(self, habit_ids: Iterable[int]) -> None:
+        """Lock the streak state rows of the habits until commit, reloading them.
+
+        Writes read a state, change it in Python and write it back, so two
+        concurrent writes to one habit would lose an update; FOR UPDATE
+        (UPDLOCK on SQL Server) makes the second wait for the first to commit.
+        Rows are locked in id order so that two batches cannot deadlock.
+        """
+        ids = sorted(set(habit_ids))
+        if ids:
+            (
+                self.session.query(HabitStreak)
+                .filter(HabitStreak.habit_id.in_(ids))
+                .order_by(HabitStreak.habit_id)
+                .with_for_update()
+                # SQLAlchemy renders no FOR UPDATE for SQL Server
+                .with_hint(HabitStreak, "WITH (UPDLOCK, ROWLOCK)", "mssql")
+                .populate_existing()
+                .all()
+            )
+
+    def _rebuild_states(self, habit_ids: Sequence[int]) -> None:
+        """Recompute streak state from hot entries and, for archived history, year summaries."""
+        existing = self.streaks(habit_ids)
+        dates_by_habit = self._dates_between_many((Entry,), habit_ids, date.min, date.max)
+        archived = {h for h, state in existing.items() if state.archived_through is not None}
+        results = batch_streaks_by_habit(
+            {h: ds for h, ds in dates_by_habit.items() if h not in archived}
+        )
+        for habit_id, segments in self._year_segments(sorted(archived)).items():
+            hot = segment_of(dates_by_habit[habit_id])
+            results[habit_id] = fold_segments(segments + ([hot] if hot else []))
+        for habit_id, (current, best, count, last) in results.items():
+            state = existing.get(habit_id)
+            if state is None:
+                state = HabitStreak(habit_id=habit_id)
+                self.session.add(state)
+            state.current_run_length, state.best_run_length = current, best
+            state.current_run_start = last - timedelta(days=current - 1) if last else None
+            state.last_entry_date, state.total_count = last, count
+
+    def _archived_through(self, habit_id: int) -> date | None:
+        # Usually already in the identity map: loaded with the habit or by _record_streak
+        state = self.session.get(HabitStreak, habit_id)
+        return state.archived_through if state is not None else None
+
+    def _table_for(self, habit_id: int, d: date) -> type[Entry | EntryArchive]:
+        """The table that holds (or would hold) the habit's entry on d."""
+        archived_through = self._archived_through(habit_id)
+        return EntryArchive if archived_through is not None and d <= archived_through else Entry
+
+    def _year_segments(self, habit_ids: Sequence[int]) -> dict[int, list[Segment]]:
+        """Archived history of the given habits as chronological per-year segments."""
+        out: dict[int, list[Segment]] = {habit_id: [] for habit_id in habit_ids}
+        if not out:
+            return out
+        summaries = (
+            self.session.query(EntryYearSummary)
+            .filter(EntryYearSummary.habit_id.in_(out.keys()))
+            .order_by(EntryYearSummary.habit_id, EntryYearSummary.year)
+        )
+        for s in summaries:
+            out[s.habit_id].append(Segment(s.first_date, s.last_date, s.entry_count, s.best_run,
+                                           s.leading_run, s.trailing_run))
+        return out
+
+    def _summarize(self, years: set[tuple[int, int]]) -> None:
+        """Recompute the archive summaries of (habit_id, year) pairs from archived rows."""
+        for habit_id, year in sorted(years):
+            rows = self.session.execute(
+                select(EntryArchive.date, EntryArchive.journal).where(
+                    EntryArchive.habit_id == habit_id,
+                    EntryArchive.date >= date(year, 1, 1),
+                    EntryArchive.date <= date(year, 12, 31),
+                )
+            ).all()
+            summary = self.session.get(EntryYearSummary, (habit_id, year))
+            segment = segment_of(d for d, _ in rows)
+            if segment is None:
+                if summary is not None:
+                    self.session.delete(summary)
+                continue
+            if summary is None:
+                summary = EntryYearSummary(habit_id=habit_id, year=year)
+                self.session.add(summary)
+            summary.entry_count, summary.journal_count = (
+                segment.total,
+                sum(j is not None for _, j in rows),
+            )
+            summary.first_date, summary.last_date = segment.first, segment.last
+            summary.best_run, summary.leading_run, summary.trailing_run = (
+                segment.best,
+                segment.leading,
+                segment.trailing,
+            )
+        if years:
+            self.session.flush()
+
+    def _bitmaps(self, days: Sequence[tuple[int, date]]) -> dict[tuple[int, int], HabitYearBitmap]:
+        """The year bitmaps of (habit_id, date) pairs by (habit_id, year), read in one query.
+
+        Missing years are drawn from entry rows; the caller sets its days
+        before its commit. Bits set during a batch are seen by the rest of the
+        batch through this map, since the session does not autoflush.
+        """
+        years = {(habit_id, d.year) for habit_id, d in days}
+        if not years:
+            return {}
+        bitmaps = {
+            (b.habit_id, b.year): b
+            for b in self.session.query(HabitYearBitmap).filter(
+                HabitYearBitmap.habit_id.in_({habit_id for habit_id, _ in years}),
+                HabitYearBitmap.year.in_({year for _, year in years}),
+            )
+        }
+        self._draw(bitmaps, years - bitmaps.keys())
+        return bitmaps
+
+    def _draw(
+        self, bitmaps: dict[tuple[int, int], HabitYearBitmap], years: set[tuple[int, int]]
+    ) -> None:
+        """Add bitmaps for (habit_id, year) pairs that have none, from entry rows, hot and archived.
+
+        A year without entries gets an empty bitmap. Either way a bitmap row
+        always holds every day of its year, never just the ones written since.
+        Years after a habit's last entry need no read: usually its state is
+        already in the identity map.
+        """
+        read = set()
+        for habit_id, year in years:
+            state = self.session.get(HabitStreak, habit_id)
+            last = state.last_entry_date if state is not None else date.max
+            if last is not None and year <= last.year:
+                read.add((habit_id, year))
+        dates: dict[int, set[date]] = {}
+        if read:
+            first = date(min(year for _, year in read), 1, 1)
+            last_day = date(max(year for _, year in read), 12, 31)
+            dates = self.dates_between_many(
+                sorted({habit_id for habit_id, _ in read}), first, last_day
+            )
+        for habit_id, year in years:
+            drawn = [d for d in dates.get(habit_id, ()) if d.year == year]
+            bitmap = HabitYearBitmap(habit_id=habit_id, year=year, days=with_days(None, drawn))
+            self.session.add(bitmap)
+            bitmaps[habit_id, year] = bitmap
+
+    def _days_near(self, bitmaps: dict[tuple[int, int], HabitYearBitmap], habit_id: int,
+                   start: date, end: date) -> Iterator[date]:
+        for year in range(start.year, end.year + 1):
+            bitmap = bitmaps.get((habit_id, year)) or self.session.get(
+                HabitYearBitmap, (habit_id, year)
+            )
+            if bitmap is not None:
+                bitmaps[habit_id, year] = bitmap
+            else:
+                self._draw(bitmaps, {(habit_id, year)})
+            yield from days_of(year, bitmaps[habit_id, year].days, start, end)
+
+    @staticmethod
+    def _set_day(bitmaps: dict[tuple[int, int], HabitYearBitmap], habit_id: int, d: date) -> None:
+        bitmap = bitmaps[habit_id, d.year]
+        days = with_days(bitmap.days, [d])
+        if days != bitmap.days:
+            bitmap.days = days
+
+    def _redraw(self, years: set[tuple[int, int]]) -> None:
+        """Recompute the bitmaps of (habit_id, year) pairs from entry rows, hot and archived."""
+        for habit_id, year in sorted(years):
+            dates = self.dates_between_many([habit_id], date(year, 1, 1), date(year, 12, 31))[
+                habit_id
+            ]
+            bitmap = self.session.get(HabitYearBitmap, (habit_id, year))
+            if not dates:
+                if bitmap is not None:
+                    self.session.delete(bitmap)
+            elif bitmap is None:
+                self.session.add(
+                    HabitYearBitmap(habit_id=habit_id, year=year, days=with_days(None, dates))
+                )
+            else:
+                bitmap.days = with_days(None, dates)
+        if years:
+            self.session.flush()
+
+
+class AsyncSqlAlchemyEntryRepository(AsyncSqlAlchemyRepository[SqlAlchemyEntryRepository]):
+    def __init__(self, session: Session | AsyncSession):
+        super().__init__(session, SqlAlchemyEntryRepository)
+
+    async def exists_on(self, habit_id: int, d: date) -> bool:
+        return await self._run(lambda repo: repo.exists_on(habit_id, d))
+
+    async def create(self, habit_id: int, d: date, journal: str | None = None) -> Entry:
+        return await self._run(lambda repo: repo.create(habit_id, d, journal))
+
+    async def upsert(self, habit_id: int, d: date, journal: str | None = None) -> None:
+        await self._run(lambda repo: repo.upsert(habit_id, d, journal))
+
+    async def upsert_many(self, items: Sequence[tuple[int, date, str | None]]) -> None:
+        await self._run(lambda repo: repo.upsert_many(items))
+
+    async def insert_many(self, rows: Sequence[tuple[int, date, str | None]]) -> int:
+        return await self._run(lambda repo: repo.insert_many(rows))
+
+    async def dates_between(self, habit_id: int, start: date, end: date) -> list[date]:
+        return await self._run(lambda repo: list(repo.dates_between(habit_id, start, end)))
+
+    async def dates_between_many(
+        self, habit_ids: Sequence[int], start: date, end: date
+    ) -> dict[int, set[date]]:
+        return await self._run(lambda repo: repo.dates_between_many(habit_ids, start, end))
+
+    async def get_by_date(self, habit_id: int, d: date) -> Entry | EntryArchive | None:
+        return await self._run(lambda repo: repo.get_by_date(habit_id, d))
+
+    async def get_by_date_for_user(
+        self, habit_id: int, user_id: int, d: date
+    ) -> tuple[Habit, Entry | EntryArchive | None] | None:
+        return await self._run(lambda repo: repo.get_by_date_for_user(habit_id, user_id, d))
+
+    async def update_journal(
+        self, habit_id: int, d: date, journal: str | None
+    ) -> Entry | EntryArchive | None:
+        return await self._run(lambda repo: repo.update_journal(habit_id, d, journal))
+
+    async def set_journal(
+        self, entry: Entry | EntryArchive, journal: str | None
+    ) -> Entry | EntryArchive:
+        return await self._run(lambda repo: repo.set_journal(entry, journal))
+
+    async def dates_between_for_user(
+        self, habit_id: int, user_id: int, start: date, end: date
+    ) -> tuple[Habit, set[date]] | None:
+        return await self._run(
+            lambda repo: repo.dates_between_for_user(habit_id, user_id, start, end)
+        )
+
+    async def list_by_habit(
+        self, habit_id: int, limit: int | None = None, before: date | None = None
+    ) -> list[Entry | EntryArchive]:
+        return await self._run(lambda repo: repo.list_by_habit(habit_id, limit, before))
+
+    async def list_by_habit_for_user(
+        self, habit_id: int, user_id: int, limit: int | None = None, before: date | None = None
+    ) -> list[Entry | EntryArchive] | None:
+        return await self._run(
+            lambda repo: repo.list_by_habit_for_user(habit_id, user_id, limit, before)
+        )
+
+    async def computed_streaks(
+        self, habit_ids: Sequence[int], today: date
+    ) -> dict[int, tuple[int, int]]:
+        return await self._run(lambda repo: repo.computed_streaks(habit_ids, today))
+
+    async def streaks(self, habit_ids: Sequence[int]) -> dict[int, HabitStreak]:
+        return await self._run(lambda repo: repo.streaks(habit_ids))
+
+    async def rebuild_streaks(
+        self, habit_ids: Sequence[int], years: Iterable[tuple[int, int]] = ()
+    ) -> None:
+        await self._run(lambda repo: repo.rebuild_streaks(habit_ids, years))
+
+    async def forget_days(self, days: Iterable[tuple[int, date]]) -> None:
+        await self._run(lambda repo: repo.forget_days(days))
+
+    async def rebuild_bitmaps(self, habit_ids: Sequence[int]) -> None:
+        await self._run(lambda repo: repo.rebuild_bitmaps(habit_ids))
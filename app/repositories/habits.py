@@ -1,34 +1,95 @@
 from datetime import time
-from typing import Optional, List, Union
-from sqlalchemy.orm import Session
+from typing import cast
+from collections.abc import Sequence
+from sqlalchemy import delete, select
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
 
-from app.models import Category, Habit
+from app.models import Category, Habit, HabitStreak, User
 
+from .aio import AsyncSqlAlchemyRepository
 from .base import HabitRepository, _REMINDER_TIME_NOT_PROVIDED
+from .versions import bump_habits, bump_user
 
 
 class SqlAlchemyHabitRepository(HabitRepository):
     def __init__(self, session: Session):
         self.session = session
 
-    def create(self, user_id: int, name: str, goal_type: str, reminder_time: Optional[time] = None) -> Habit:
-        habit = Habit(user_id=user_id, name=name, goal_type=goal_type, reminder_time=reminder_time)
+    def create(self, user_id: int, name: str, goal_type: str, reminder_time: time | None = None,
+               categories: Sequence[Category] | None = None) -> Habit:
+        # The habit_categories rows go out as one executemany in the same flush; a
+        # set categories collection also needs no lazy load when the response is built
+        habit = Habit(user_id=user_id, name=name, goal_type=goal_type, reminder_time=reminder_time,
+                      streak=HabitStreak(), categories=list(categories or []))
         self.session.add(habit)
+        bump_user(self.session, user_id)
         self.session.commit()
-        self.session.refresh(habit)
         return habit
 
-    def get(self, habit_id: int) -> Optional[Habit]:
-        return self.session.query(Habit).filter(Habit.id == habit_id).first()
+    def get(self, habit_id: int) -> Habit | None:
+        # Identity map first: a habit already loaded by get_for_user costs no query
+        return self.session.get(Habit, habit_id)
 
-    def list_by_user(self, user_id: int) -> List[Habit]:
-        return self.session.query(Habit).filter(Habit.user_id == user_id).all()
-
-    def list_by_user_and_category(self, user_id: int, category_id: int) -> List[Habit]:
+    def get_for_user(self, habit_id: int, user_id: int) -> Habit | None:
+        """The habit if the user owns it, with its streak state and categories, in one query."""
         return (
             self.session.query(Habit)
+            .options(joinedload(Habit.streak), joinedload(Habit.categories))
+            .filter(Habit.id == habit_id, Habit.user_id == user_id)
+            .first()
+        )
+
+    def list_by_user(
+        self, user_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]:
+        query = (
+            self.session.query(Habit)
+            .options(selectinload(Habit.categories))
+            .filter(Habit.user_id == user_id)
+        )
+        return self._page(query, limit, after)
+
+    def list_by_user_and_category(
+        self, user_id: int, category_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]:
+        query = (
+            self.session.query(Habit)
+            .options(selectinload(Habit.categories))
             .filter(Habit.user_id == user_id)
             .filter(Habit.categories.any(Category.id == category_id))
+        )
+        return self._page(query, limit, after)
+
+    @staticmethod
+    def _page(query: Query[Habit], limit: int | None, after: int | None) -> list[Habit]:
+        """Keyset page in id order: habits after the cursor id, at most limit of them."""
+        if after is not None:
+            query = query.filter(Habit.id > after)
+        query = query.order_by(Habit.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def owned_ids(self, user_id: int, habit_ids: Sequence[int]) -> set[int]:
+        """The subset of habit_ids that belong to the user, in one query."""
+        if not habit_ids:
+            return set()
+        rows = (
+            self.session.query(Habit.id)
+            .filter(Habit.id.in_(set(habit_ids)), Habit.user_id == user_id)
+            .all()
+        )
+        return {row.id for row in rows}
+
+    def categories_for_user(self, user_id: int, category_ids: Sequence[int]) -> list[Category]:
+        """The categories among category_ids that belong to the user, in one query."""
+        if not category_ids:
+            return []
+        return (
+            self.session.query(Category)
+            .filter(Category.id.in_(set(category_ids)), Category.user_id == user_id)
             .all()
         )
 
@@ -41,7 +102,14 @@ class SqlAlchemyHabitRepository(HabitRepository):
             is not None
         )
 
-    def update(self, habit_id: int, name: Optional[str], goal_type: Optional[str], reminder_time: Union[Optional[time], object] = _REMINDER_TIME_NOT_PROVIDED) -> Optional[Habit]:
+    def update(
+        self,
+        habit_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_NOT_PROVIDED,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit | None:
         habit = self.get(habit_id)
         if not habit:
             return None
@@ -53,34 +121,138 @@ class SqlAlchemyHabitRepository(HabitRepository):
         # None means clear reminder, any time value means set it
         if reminder_time is not _REMINDER_TIME_NOT_PROVIDED:
             habit.reminder_time = reminder_time  # type: ignore
+        # Replace the category set if given: the flush diffs it against the loaded
+        # collection into one multi-row DELETE and one multi-row INSERT
+        if categories is not None:
+            habit.categories = list(categories)
+        bump_habits(self.session, [habit_id])
         self.session.commit()
-        self.session.refresh(habit)
         return habit
 
     def delete(self, habit_id: int) -> bool:
         habit = self.get(habit_id)
-        if not habit:
-            return False
-        self.session.delete(habit)
+        return habit is not None and self._delete(
+            delete(Habit).where(Habit.id == habit_id), habit.user_id
+        )
+
+    def delete_for_user(self, habit_id: int, user_id: int) -> bool:
+        """Delete the habit if the user owns it: one statement, the database cascades the rest."""
+        return self._delete(
+            delete(Habit).where(Habit.id == habit_id, Habit.user_id == user_id), user_id
+        )
+
+    def _delete(self, stmt, user_id: int) -> bool:
+        result = cast(
+            CursorResult, self.session.execute(stmt.execution_options(synchronize_session=False))
+        )
+        deleted: int = result.rowcount
+        if deleted:
+            bump_user(self.session, user_id)
         self.session.commit()
-        return True
+        return deleted > 0
 
-    def add_category(self, habit_id: int, category: Category) -> Optional[Habit]:
+    def version_for_user(self, habit_id: int, user_id: int) -> int | None:
+        """The habit's version if the user owns it, by primary key."""
+        return self.session.execute(
+            select(Habit.version).where(Habit.id == habit_id, Habit.user_id == user_id)
+        ).scalar()
+
+    def user_version(self, user_id: int) -> int | None:
+        """The version of the user's habit and category lists, by primary key."""
+        return self.session.execute(select(User.version).where(User.id == user_id)).scalar()
+
+    def add_category(self, habit_id: int, category: Category) -> Habit | None:
         habit = self.get(habit_id)
         if not habit:
             return None
         if category not in habit.categories:
             habit.categories.append(category)
+            bump_habits(self.session, [habit_id])
             self.session.commit()
-            self.session.refresh(habit)
         return habit
 
-    def remove_category(self, habit_id: int, category: Category) -> Optional[Habit]:
+    def remove_category(self, habit_id: int, category: Category) -> Habit | None:
         habit = self.get(habit_id)
         if not habit:
             return None
         if category in habit.categories:
             habit.categories.remove(category)
+            bump_habits(self.session, [habit_id])
             self.session.commit()
-            self.session.refresh(habit)
         return habit
+
+
+class AsyncSqlAlchemyHabitRepository(AsyncSqlAlchemyRepository[SqlAlchemyHabitRepository]):
+    def __init__(self, session: Session | AsyncSession):
+        super().__init__(session, SqlAlchemyHabitRepository)
+
+    async def create(
+        self,
+        user_id: int,
+        name: str,
+        goal_type: str,
+        reminder_time: time | None = None,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit:
+        return await self._run(
+            lambda repo: repo.create(user_id, name, goal_type, reminder_time, categories)
+        )
+
+    async def get(self, habit_id: int) -> Habit | None:
+        return await self._run(lambda repo: repo.get(habit_id))
+
+    async def get_for_user(self, habit_id: int, user_id: int) -> Habit | None:
+        return await self._run(lambda repo: repo.get_for_user(habit_id, user_id))
+
+    async def list_by_user(
+        self, user_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]:
+        return await self._run(lambda repo: repo.list_by_user(user_id, limit, after))
+
+    async def list_by_user_and_category(
+        self, user_id: int, category_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]:
+        return await self._run(
+            lambda repo: repo.list_by_user_and_category(user_id, category_id, limit, after)
+        )
+
+    async def owned_ids(self, user_id: int, habit_ids: Sequence[int]) -> set[int]:
+        return await self._run(lambda repo: repo.owned_ids(user_id, habit_ids))
+
+    async def categories_for_user(
+        self, user_id: int, category_ids: Sequence[int]
+    ) -> list[Category]:
+        return await self._run(lambda repo: repo.categories_for_user(user_id, category_ids))
+
+    async def exists_name(self, user_id: int, name: str) -> bool:
+        return await self._run(lambda repo: repo.exists_name(user_id, name))
+
+    async def update(
+        self,
+        habit_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_NOT_PROVIDED,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit | None:
+        return await self._run(
+            lambda repo: repo.update(habit_id, name, goal_type, reminder_time, categories)
+        )
+
+    async def delete(self, habit_id: int) -> bool:
+        return await self._run(lambda repo: repo.delete(habit_id))
+
+    async def delete_for_user(self, habit_id: int, user_id: int) -> bool:
+        return await self._run(lambda repo: repo.delete_for_user(habit_id, user_id))
+
+    async def add_category(self, habit_id: int, category: Category) -> Habit | None:
+        return await self._run(lambda repo: repo.add_category(habit_id, category))
+
+    async def remove_category(self, habit_id: int, category: Category) -> Habit | None:
+        return await self._run(lambda repo: repo.remove_category(habit_id, category))
+
+    async def version_for_user(self, habit_id: int, user_id: int) -> int | None:
+        return await self._run(lambda repo: repo.version_for_user(habit_id, user_id))
+
+    async def user_version(self, user_id: int) -> int | None:
+        return await self._run(lambda repo: repo.user_version(user_id))
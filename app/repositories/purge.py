@@ -0,0 +1,215 @@
+from datetime import date
+
+from sqlalchemy import ColumnElement, delete, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models import Category, Entry, EntryArchive, Habit, HabitStreak, PurgeJob, User
+
+from .base import PurgeRepository
+from .entries import SqlAlchemyEntryRepository
+
+
+class SqlAlchemyPurgeRepository(PurgeRepository):
+    """Bounded deletes for purge jobs.
+
+    Every batch deletes at most `limit` rows and commits in the same
+    transaction as the job's progress, so no transaction holds locks for long
+    and an interrupted job never repeats or skips a batch.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create_job(
+        self, kind: str, stage: str, user_id: int | None = None, cutoff: date | None = None
+    ) -> PurgeJob:
+        job = PurgeJob(
+            kind=kind, user_id=user_id, cutoff=cutoff, stage=stage, last_id=0, deleted_rows=0
+        )
+        self.session.add(job)
+        self.session.commit()
+        return job
+
+    def get_job(self, job_id: int) -> PurgeJob | None:
+        return self.session.get(PurgeJob, job_id)
+
+    def pending_job(self, kind: str, user_id: int | None = None) -> PurgeJob | None:
+        return (
+            self.session.query(PurgeJob)
+            .filter(
+                PurgeJob.kind == kind, PurgeJob.user_id == user_id, PurgeJob.finished_at.is_(None)
+            )
+            .first()
+        )
+
+    def pending_jobs(self) -> list[PurgeJob]:
+        return (
+            self.session.query(PurgeJob)
+            .filter(PurgeJob.finished_at.is_(None))
+            .order_by(PurgeJob.id)
+            .all()
+        )
+
+    def user_exists(self, user_id: int) -> bool:
+        return self.session.get(User, user_id) is not None
+
+    def purge_entries(self, job: PurgeJob, limit: int) -> list[tuple[int, int, date]]:
+        """Delete the next id range of up to `limit` entries in the job's scope.
+
+        Returns the (user_id, habit_id, date) of every entry deleted.
+
+        A retention purge updates the streak state and year bitmaps of what
+        it touched in the same transaction.
+        """
+        scope: ColumnElement[bool]
+        if job.kind == "account":
+            scope = Entry.habit_id.in_(select(Habit.id).where(Habit.user_id == job.user_id))
+        else:
+            scope = Entry.date < job.cutoff
+        batch = self.session.execute(
+            select(Entry.id, Habit.user_id, Entry.habit_id, Entry.date)
+            .join(Habit, Habit.id == Entry.habit_id)
+            .where(scope, Entry.id > job.last_id).order_by(Entry.id).limit(limit)
+        ).all()
+        if not batch:
+            return []
+        upper = batch[-1].id
+        self._delete(delete(Entry).where(scope, Entry.id > job.last_id, Entry.id <= upper))
+        self._advance(job, upper, len(batch))
+        if job.kind == "account":
+            self.session.commit()
+        else:
+            # Commits the delete, the progress and the patched state together
+            SqlAlchemyEntryRepository(self.session).forget_days(
+                (row.habit_id, row.date) for row in batch
+            )
+        return [(row.user_id, row.habit_id, row.date) for row in batch]
+
+    def purge_archive(self, job: PurgeJob, limit: int) -> list[tuple[int, int, date]]:
+        """Delete the next id range of up to `limit` archived entries in the job's scope.
+
+        Returns the (user_id, habit_id, date) of every entry deleted.
+
+        A retention purge updates the year summaries, bitmaps and streak
+        state of what it touched in the same transaction.
+        """
+        scope: ColumnElement[bool]
+        if job.kind == "account":
+            scope = EntryArchive.habit_id.in_(select(Habit.id).where(Habit.user_id == job.user_id))
+        else:
+            scope = EntryArchive.date < job.cutoff
+        batch = self.session.execute(
+            select(EntryArchive.id, Habit.user_id, EntryArchive.habit_id, EntryArchive.date)
+            .join(Habit, Habit.id == EntryArchive.habit_id)
+            .where(scope, EntryArchive.id > job.last_id).order_by(EntryArchive.id).limit(limit)
+        ).all()
+        if not batch:
+            return []
+        upper = batch[-1].id
+        self._delete(
+            delete(EntryArchive).where(
+                scope, EntryArchive.id > job.last_id, EntryArchive.id <= upper
+            )
+        )
+        self._advance(job, upper, len(batch))
+        if job.kind == "account":
+            self.session.commit()
+        else:
+            SqlAlchemyEntryRepository(self.session).forget_days(
+                (row.habit_id, row.date) for row in batch
+            )
+        return [(row.user_id, row.habit_id, row.date) for row in batch]
+
+    def archive_entries(self, job: PurgeJob, limit: int) -> int:
+        """Move up to `limit` of the next habit's entries dated before the cutoff to the archive.
+
+        Habits are archived in id order, each oldest day first, so everything
+        up to its archived_through is in the archive after every batch. The
+        move, the habit's summaries and the job's progress commit together.
+        """
+        habit_id = self.session.execute(
+            select(Entry.habit_id).where(Entry.habit_id > job.last_id, Entry.date < job.cutoff)
+            .order_by(Entry.habit_id).limit(1)
+        ).scalar()
+        if habit_id is None:
+            return 0
+        batch = self.session.execute(
+            select(Entry.id, Entry.date, Entry.journal)
+            .where(Entry.habit_id == habit_id, Entry.date < job.cutoff)
+            .order_by(Entry.date)
+            .limit(limit)
+        ).all()
+        self.session.execute(insert(EntryArchive), [
+            {"habit_id": habit_id, "date": row.date, "journal": row.journal} for row in batch
+        ])
+        self._delete(delete(Entry).where(Entry.id.in_([row.id for row in batch])))
+        state = self.session.get(HabitStreak, habit_id)
+        if state is None:
+            state = HabitStreak(habit_id=habit_id)
+            self.session.add(state)
+        state.archived_through = batch[-1].date
+        self.session.flush()
+        # A short batch finished the habit; otherwise the next batch continues it
+        self._advance(job, habit_id if len(batch) < limit else job.last_id, len(batch))
+        SqlAlchemyEntryRepository(self.session).rebuild_streaks(
+            [habit_id], years={(habit_id, row.date.year) for row in batch}
+        )
+        return len(batch)
+
+    def purge_habits(self, job: PurgeJob, limit: int) -> int:
+        """Delete the next batch of the user's habits; the database cascades their leftovers."""
+        return self._purge_owned(job, Habit, limit)
+
+    def purge_categories(self, job: PurgeJob, limit: int) -> int:
+        return self._purge_owned(job, Category, limit)
+
+    def purge_user(self, job: PurgeJob) -> bool:
+        """Delete the user row and finish the job.
+
+        Returns False, deleting nothing, if the user still owns habits or
+        categories (written with a token issued before the deletion began).
+        """
+        owns_rows = self.session.query(
+            exists().where(Habit.user_id == job.user_id)
+            | exists().where(Category.user_id == job.user_id)
+        ).scalar()
+        if owns_rows:
+            return False
+        self._delete(delete(User).where(User.id == job.user_id))
+        self._advance(job, job.last_id, 1)
+        self.finish(job)
+        return True
+
+    def set_stage(self, job: PurgeJob, stage: str) -> None:
+        job.stage, job.last_id = stage, 0
+        self.session.commit()
+
+    def finish(self, job: PurgeJob) -> None:
+        job.stage, job.finished_at = "done", func.now()
+        self.session.commit()
+
+    def _purge_owned(self, job: PurgeJob, model, limit: int) -> int:
+        ids = (
+            self.session.execute(
+                select(model.id)
+                .where(model.user_id == job.user_id, model.id > job.last_id)
+                .order_by(model.id)
+                .limit(limit)
+            )
+            .scalars()
+            .all()
+        )
+        if not ids:
+            return 0
+        self._delete(delete(model).where(model.id.in_(ids)))
+        self._advance(job, ids[-1], len(ids))
+        self.session.commit()
+        return len(ids)
+
+    def _delete(self, stmt) -> None:
+        self.session.execute(stmt.execution_options(synchronize_session=False))
+
+    @staticmethod
+    def _advance(job: PurgeJob, last_id: int, deleted: int) -> None:
+        job.last_id = last_id
+        job.deleted_rows += deleted
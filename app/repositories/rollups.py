@@ -0,0 +1,120 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import distinct, func, select, union_all
+from sqlalchemy.orm import Session
+
+from app.models import DailyRollup, Entry, EntryArchive, Habit, HabitStreak
+
+from .base import RollupRepository
+
+
+class SqlAlchemyRollupRepository(RollupRepository):
+    def __init__(self, session: Session):
+        self.session = session
+
+    def refresh(self, start: date, end: date) -> int:
+        """Recompute the rollups of start..end from the raw tables, in one transaction.
+
+        Reads only the entries (hot and archived) and habits of those days, by
+        index, so a periodic refresh of the last day or two stays cheap however
+        large the history grows. Returns the number of days written.
+        """
+        logged = union_all(
+            *(
+                select(model.habit_id, model.date, model.journal).where(
+                    model.date >= start, model.date <= end
+                )
+                for model in (Entry, EntryArchive)
+            )
+        ).subquery()
+        per_day = self.session.execute(
+            select(
+                logged.c.date,
+                func.count(),
+                func.count(logged.c.journal),
+                func.count(distinct(Habit.user_id)),
+            )
+            .join(Habit, Habit.id == logged.c.habit_id)
+            .group_by(logged.c.date)
+        ).all()
+        entries: dict[date, tuple[int, int, int]] = {
+            d: (n, journals, users) for d, n, journals, users in per_day
+        }
+        created = Counter(
+            created_at.date() for created_at in self.session.execute(
+                select(Habit.created_at).where(
+                    Habit.created_at >= datetime.combine(start, time.min),
+                    Habit.created_at < datetime.combine(end + timedelta(days=1), time.min),
+                )
+            ).scalars()
+            if created_at is not None
+        )
+
+        existing = {
+            r.day: r
+            for r in self.session.query(DailyRollup).filter(DailyRollup.day.between(start, end))
+        }
+        now = datetime.utcnow()
+        days = (end - start).days + 1
+        for offset in range(days):
+            d = start + timedelta(days=offset)
+            rollup = existing.get(d)
+            if rollup is None:
+                rollup = DailyRollup(day=d)
+                self.session.add(rollup)
+            rollup.entries_logged, rollup.journals_written, rollup.active_users = entries.get(
+                d, (0, 0, 0)
+            )
+            rollup.habits_created = created.get(d, 0)
+            rollup.refreshed_at = now
+        self.session.commit()
+        return days
+
+    def between(self, start: date, end: date) -> list[DailyRollup]:
+        return (
+            self.session.query(DailyRollup)
+            .filter(DailyRollup.day >= start, DailyRollup.day <= end)
+            .order_by(DailyRollup.day)
+            .all()
+        )
+
+    def latest_day(self) -> date | None:
+        return self.session.execute(select(func.max(DailyRollup.day))).scalar()
+
+    def first_activity_day(self) -> date | None:
+        """The first day an entry was logged for or a habit created, by index."""
+        days = [
+            self.session.query(func.min(model.date)).scalar() for model in (Entry, EntryArchive)
+        ]
+        created = self.session.query(func.min(Habit.created_at)).scalar()
+        if created is not None:
+            days.append(created.date())
+        return min((d for d in days if d is not None), default=None)
+
+    def totals(self) -> tuple[int, int]:
+        """(entries that exist now, habits that exist now), both exact.
+
+        Entries are summed from the streak state, one row per habit, whose
+        total_count every write, delete and purge keeps in step, where
+        counting would scan the entries table and summing the rollups would
+        miss backfills and deletions. Only habits without state yet (created
+        before it existed, until scripts/rebuild-streaks.py runs) have their
+        rows counted. Habits are counted live over an index of the small
+        habits table, since habits_created never subtracts deletions.
+        """
+        entries = int(
+            self.session.query(func.coalesce(func.sum(HabitStreak.total_count), 0)).scalar() or 0
+        )
+        stateless = (
+            select(Habit.id)
+            .outerjoin(HabitStreak, HabitStreak.habit_id == Habit.id)
+            .where(HabitStreak.habit_id.is_(None))
+        )
+        if self.session.query(stateless.exists()).scalar():
+            for model in (Entry, EntryArchive):
+                entries += self.session.query(func.count(model.id)).filter(
+                    model.habit_id.in_(stateless)
+                ).scalar() or 0
+        habits = self.session.query(func.count(Habit.id)).scalar()
+        return entries, int(habits or 0)
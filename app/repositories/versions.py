@@ -0,0 +1,33 @@
+"""
+Version counters behind conditional GETs.
+
+habits.version changes with anything shown for that habit, users.version with
+anything in the user's habit and category lists. Writers bump them with plain
+UPDATEs in the transaction of the change, so a version is never newer than
+the data it stands for.
+"""
+from collections.abc import Iterable
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import Habit, User
+
+
+def bump_habits(session: Session, habit_ids: Iterable[int]) -> None:
+    """Bump the given habits and their owners."""
+    ids = set(habit_ids)
+    if not ids:
+        return
+    owners = select(Habit.user_id).where(Habit.id.in_(ids))
+    _execute(session, update(User).where(User.id.in_(owners)).values(version=User.version + 1))
+    _execute(session, update(Habit).where(Habit.id.in_(ids)).values(version=Habit.version + 1))
+
+
+def bump_user(session: Session, user_id: int) -> None:
+    _execute(session, update(User).where(User.id == user_id).values(version=User.version + 1))
+
+
+def _execute(session: Session, stmt) -> None:
+    # Loaded objects keep their (unused) stale version; no SELECT after the write
+    session.execute(stmt.execution_options(synchronize_session=False))
@@ -1,16 +1,19 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from collections.abc import Callable
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import jwt
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.auth import get_password_hash, verify_password
+from app.cache import calendar_cache, habit_list_cache, token_cache
 from app.config import settings
-from app.dependencies import get_db
+from app.dependencies import get_current_writer, get_db, get_session_factory
 from app.models import User
+from app.repositories.purge import SqlAlchemyPurgeRepository
+from app.services.purge import PurgeService
 
 router = APIRouter(tags=["authentication"])
 
@@ -22,6 +25,11 @@ class UserResponse(BaseModel):
     id: int
     username: str
 
+class DeletionResponse(BaseModel):
+    job_id: int
+    stage: str
+    deleted_rows: int
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -29,11 +37,13 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+def get_user_by_username(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
+# Auth endpoints are sync on purpose: the Session and bcrypt both block, so they
+# must run in the threadpool rather than on the event loop.
 @router.post("/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user account."""
     # Validate username length
     if len(user_data.username.strip()) < 3:
@@ -53,7 +63,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     if password_bytes > 72:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Password is too long. Maximum length is 72 bytes (approximately 72 characters for ASCII text)"
+            detail="Password is too long. Maximum length is 72 bytes (approximately 72 characters for ASCII text)",
         )
     
     # Check if user already exists
@@ -69,12 +79,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     new_user = User(username=user_data.username.strip(), hashed_password=hashed_password)
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
     
     return new_user
 
 @router.post("/token")
-async def login_for_access_token(
+def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -93,7 +102,9 @@ async def login_for_access_token(
     
     # Upgrade legacy SHA256 password to bcrypt if needed
     # Check if password is legacy SHA256 (64 hex chars, no bcrypt markers)
-    if len(user.hashed_password) == 64 and all(c in '0123456789abcdef' for c in user.hashed_password):
+    if len(user.hashed_password) == 64 and all(
+        c in "0123456789abcdef" for c in user.hashed_password
+    ):
         # Legacy password verified successfully, upgrade to bcrypt
         from app.auth import get_password_hash
         user.hashed_password = get_password_hash(form_data.password)
@@ -101,3 +112,37 @@ async def login_for_access_token(
     
     access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+def run_purge_job(session_factory: Callable[[], Session], job_id: int) -> None:
+    """Run a purge job in its own session; scripts/purge-data.py resumes it if interrupted."""
+    db = session_factory()
+    try:
+        purges = SqlAlchemyPurgeRepository(db)
+        job = purges.get_job(job_id)
+        if job is not None:
+            PurgeService(purges, habit_list_cache, calendar_cache, token_cache).run(
+                job, settings.PURGE_BATCH_SIZE
+            )
+    finally:
+        db.close()
+
+@router.delete("/auth/me", response_model=DeletionResponse, status_code=status.HTTP_202_ACCEPTED)
+def delete_account(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    session_factory: Callable[[], Session] = Depends(get_session_factory),
+    current_user: int = Depends(get_current_writer),
+):
+    """Delete the current user and all of their data.
+
+    The data is removed after the response, in bounded batches, so one large
+    account never holds a long transaction.
+    """
+    try:
+        purges = PurgeService(SqlAlchemyPurgeRepository(db), token_cache=token_cache)
+        job = purges.start_account_deletion(current_user)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found") from e
+    background_tasks.add_task(run_purge_job, session_factory, job.id)
+    return {"job_id": job.id, "stage": job.stage, "deleted_rows": job.deleted_rows}
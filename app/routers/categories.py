@@ -1,40 +1,52 @@
-from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import SessionLocal
-from app.dependencies import get_current_user
-from app.repositories.categories import SqlAlchemyCategoryRepository
-from app.repositories.habits import SqlAlchemyHabitRepository
+from app.cache import habit_list_cache
+from app.conditional import is_fresh, make_etag, not_modified
+from app.dependencies import (
+    get_async_current_user,
+    get_async_current_writer,
+    get_async_db,
+    get_async_read_db,
+)
+from app.repositories.categories import AsyncSqlAlchemyCategoryRepository
+from app.repositories.habits import AsyncSqlAlchemyHabitRepository
 from app.schemas import CategoryCreate, CategoryUpdate, CategoryOut
-from app.services.categories import CategoryService
+from app.services.categories import AsyncCategoryService
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _category_service(db: Session | AsyncSession) -> AsyncCategoryService:
+    categories_repo = AsyncSqlAlchemyCategoryRepository(db)
+    habits_repo = AsyncSqlAlchemyHabitRepository(db)
+    return AsyncCategoryService(categories_repo, habits_repo, habit_list_cache)
+
+
+# Async like the habit endpoints (see app/routers/habits.py)
+async def get_category_service(
+    db: Session | AsyncSession = Depends(get_async_db),
+) -> AsyncCategoryService:
+    return _category_service(db)
 
 
-def get_category_service(db: Session = Depends(get_db)) -> CategoryService:
-    categories_repo = SqlAlchemyCategoryRepository(db)
-    habits_repo = SqlAlchemyHabitRepository(db)
-    return CategoryService(categories_repo, habits_repo)
+async def get_category_read_service(
+    db: Session | AsyncSession = Depends(get_async_read_db),
+) -> AsyncCategoryService:
+    """CategoryService for read-only endpoints, backed by the read connection pool."""
+    return _category_service(db)
 
 
 @router.post("", response_model=CategoryOut, status_code=201)
-def create_category(
+async def create_category(
     category: CategoryCreate,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        created_category = service.create(current_user, category.name, category.color)
+        created_category = await service.create(current_user, category.name, category.color)
         return created_category
     except ValueError as e:
         if str(e) == "name_exists":
@@ -44,35 +56,45 @@ def create_category(
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 
-@router.get("", response_model=List[CategoryOut])
-def list_categories(
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+@router.get("", response_model=list[CategoryOut])
+async def list_categories(
+    request: Request,
+    response: Response,
+    service: AsyncCategoryService = Depends(get_category_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
-    return service.list_by_user(current_user)
+    version = await service.user_version(current_user)
+    if version is not None:
+        etag = make_etag(f"u{current_user}", version, "categories")
+        if is_fresh(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+    return await service.list_by_user(current_user)
 
 
 @router.get("/{category_id}", response_model=CategoryOut)
-def get_category(
+async def get_category(
     category_id: int,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
-    category = service.get(category_id, current_user)
+    category = await service.get(category_id, current_user)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return category
 
 
 @router.put("/{category_id}", response_model=CategoryOut)
-def update_category(
+async def update_category(
     category_id: int,
     category: CategoryUpdate,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        updated_category = service.update(category_id, current_user, category.name, category.color)
+        updated_category = await service.update(
+            category_id, current_user, category.name, category.color
+        )
         if not updated_category:
             raise HTTPException(status_code=404, detail="Category not found")
         return updated_category
@@ -87,27 +109,27 @@ def update_category(
 
 
 @router.delete("/{category_id}")
-def delete_category(
+async def delete_category(
     category_id: int,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        service.delete(category_id, current_user)
+        await service.delete(category_id, current_user)
         return {"ok": True}
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Category not found") from e
 
 
 @router.post("/{category_id}/habits/{habit_id}")
-def add_habit_to_category(
+async def add_habit_to_category(
     category_id: int,
     habit_id: int,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        service.add_habit_to_category(habit_id, category_id, current_user)
+        await service.add_habit_to_category(habit_id, category_id, current_user)
         return {"ok": True}
     except LookupError as e:
         error_msg = str(e)
@@ -119,14 +141,14 @@ def add_habit_to_category(
 
 
 @router.delete("/{category_id}/habits/{habit_id}")
-def remove_habit_from_category(
+async def remove_habit_from_category(
     category_id: int,
     habit_id: int,
-    service: CategoryService = Depends(get_category_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncCategoryService = Depends(get_category_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        service.remove_habit_from_category(habit_id, category_id, current_user)
+        await service.remove_habit_from_category(habit_id, category_id, current_user)
         return {"ok": True}
     except LookupError as e:
         error_msg = str(e)
@@ -0,0 +1,47 @@
+"""
+Data export: a user's full history as a stream
+"""
+from collections.abc import Callable
+from typing import Literal
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.dependencies import get_current_user, get_read_session_factory
+from app.repositories.categories import SqlAlchemyCategoryRepository
+from app.repositories.entries import SqlAlchemyEntryRepository
+from app.repositories.habits import SqlAlchemyHabitRepository
+from app.services.export import ExportService
+
+router = APIRouter(tags=["export"])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@router.get("/export")
+def export_data(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    session_factory: Callable[[], Session] = Depends(get_read_session_factory),
+    current_user: int = Depends(get_current_user),
+):
+    """
+    Stream every category, habit, entry and journal of the current user.
+
+    Args:
+        format: "ndjson" (one JSON record per line) or "csv" (one row per record)
+    """
+    def body():
+        db = session_factory()
+        try:
+            service = ExportService(SqlAlchemyHabitRepository(db), SqlAlchemyEntryRepository(db),
+                                    SqlAlchemyCategoryRepository(db))
+            yield from service.stream(current_user, format)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="streaky-export.{format}"'},
+    )
@@ -1,27 +1,92 @@
-from datetime import date
-from typing import List
+from calendar import monthrange
+from datetime import date, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.dependencies import get_current_user, get_db
-from app.repositories.entries import SqlAlchemyEntryRepository
-from app.repositories.habits import SqlAlchemyHabitRepository
-from app.schemas import HabitCreate, HabitUpdate, HabitLog, HabitOut, HabitWithStreak, StatsOut, CalendarOut, EntryOut, EntryUpdate
-from app.services.habits import HabitService
+from app.cache import calendar_cache, habit_list_cache
+from app.conditional import cache_control, is_fresh, make_etag, not_modified
+from app.config import settings
+from app.dependencies import (
+    get_async_current_user,
+    get_async_current_writer,
+    get_async_db,
+    get_async_read_db,
+)
+from app.repositories.entries import AsyncSqlAlchemyEntryRepository
+from app.repositories.habits import AsyncSqlAlchemyHabitRepository
+from app.schemas import (
+    BatchLog,
+    HabitCreate,
+    HabitUpdate,
+    HabitLog,
+    HabitOut,
+    HabitWithStreak,
+    StatsOut,
+    CalendarOut,
+    EntryOut,
+    EntryUpdate,
+)
+from app.services.habits import AsyncHabitService
 
 router = APIRouter()
 
-def get_habit_service(db: Session = Depends(get_db)) -> HabitService:
-    habits_repo = SqlAlchemyHabitRepository(db)
-    entries_repo = SqlAlchemyEntryRepository(db)
-    return HabitService(habits_repo, entries_repo)
+# Pages are opt-in: without limit the list endpoints still return everything
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _set_next_cursor(response: Response, next_cursor: str | None) -> None:
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+async def _habit_etag(service: AsyncHabitService, habit_id: int, user_id: int, *variant) -> str:
+    """ETag of a per-habit read, from the habit's version; also the ownership check (404)."""
+    try:
+        version = await service.habit_version(habit_id, user_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail="Habit not found") from e
+    return make_etag(f"h{habit_id}", version, *variant)
+
+
+def _calendar_cache_control(year: int, month: int, today: date) -> str:
+    """Browsers may reuse a past month for a while, since only backfills change it.
+
+    Later months always revalidate.
+
+    A month counts as past from the second day after it, so a client whose
+    timezone is behind the server's still revalidates its current month.
+    """
+    last_day = date(year, month, monthrange(year, month)[1])
+    past = last_day < today - timedelta(days=1)
+    return cache_control(settings.CALENDAR_MAX_AGE_SECONDS if past else 0)
+
+def _habit_service(db: Session | AsyncSession) -> AsyncHabitService:
+    habits_repo = AsyncSqlAlchemyHabitRepository(db)
+    entries_repo = AsyncSqlAlchemyEntryRepository(db)
+    return AsyncHabitService(habits_repo, entries_repo, habit_list_cache, calendar_cache)
+
+# The endpoints and their dependencies are async, so none takes a thread of its
+# own: on an async pool they await the database on the event loop, and on SQL
+# Server only the service calls themselves run in the threadpool
+async def get_habit_service(
+    db: Session | AsyncSession = Depends(get_async_db),
+) -> AsyncHabitService:
+    return _habit_service(db)
+
+async def get_habit_read_service(
+    db: Session | AsyncSession = Depends(get_async_read_db),
+) -> AsyncHabitService:
+    """HabitService for read-only endpoints, backed by the read connection pool."""
+    return _habit_service(db)
 
 @router.post("/habits", response_model=HabitOut)
-def create_habit(
+async def create_habit(
     habit: HabitCreate,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
         # Validate goal_type
@@ -30,8 +95,16 @@ def create_habit(
                 status_code=400,
                 detail="Invalid goal_type. Must be 'daily' or 'weekly'",
             )
-        created_habit = service.create(current_user, habit.name, habit.goal_type, habit.reminder_time)  # type: ignore
+        created_habit = await service.create(
+            current_user,
+            habit.name,
+            habit.goal_type,  # type: ignore
+            habit.reminder_time,
+            habit.category_ids,
+        )
         return created_habit
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail="Category not found") from e
     except ValueError as e:
         if str(e) == "name_exists":
             raise HTTPException(
@@ -39,48 +112,96 @@ def create_habit(
             ) from e
         raise HTTPException(status_code=400, detail=str(e)) from e
 
-@router.get("/habits", response_model=List[HabitWithStreak])
-def list_habits(
+@router.get("/habits", response_model=list[HabitWithStreak])
+async def list_habits(
+    request: Request,
+    response: Response,
     category_id: int = None,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: int | None = None,
+    service: AsyncHabitService = Depends(get_habit_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
-    return service.list_with_streaks(current_user, date.today(), category_id)
+    """
+    List habits with streaks in creation order. With limit, returns one page and
+    the cursor for the next (pass it back as after) in the X-Next-Cursor header.
+    If-None-Match with the ETag of the last response gets a 304 until the user writes.
+    """
+    today = date.today()
+    # The version is read before the habits, so it is never newer than the body it tags
+    version = await service.user_version(current_user)
+    etag = None
+    if version is not None:
+        etag = make_etag(f"u{current_user}", version, "habits", today, category_id, limit, after)
+        if is_fresh(request, etag):
+            return not_modified(etag)
+    habits_list, next_cursor = await service.page_with_streaks(
+        current_user, today, category_id, limit, after
+    )
+    _set_next_cursor(response, next_cursor)
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return habits_list
 
 @router.post("/habits/{habit_id}/entries")
-def log_entry(
+async def log_entry(
     habit_id: int,
     entry: HabitLog,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        service.log_today(habit_id, current_user, entry.date, entry.journal)
+        await service.log_today(habit_id, current_user, entry.date, entry.journal)
         return {"ok": True}
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
+@router.post("/entries/batch")
+async def log_entries_batch(
+    batch: BatchLog,
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
+):
+    """
+    Log entries for several habits in one request and one transaction.
+    Nothing is logged unless every habit belongs to the current user.
+    """
+    try:
+        logged = await service.log_many(
+            current_user, [(item.habit_id, item.date, item.journal) for item in batch.items]
+        )
+        return {"ok": True, "logged": logged}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail="Habit not found") from e
+
 @router.get("/habits/{habit_id}/stats", response_model=StatsOut)
-def get_stats(
+async def get_stats(
     habit_id: int,
     range: str,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    service: AsyncHabitService = Depends(get_habit_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
     if range not in ["7d", "30d"]:
         raise HTTPException(status_code=400, detail="Range must be '7d' or '30d'")
     days = 7 if range == "7d" else 30
+    today = date.today()
+    etag = await _habit_etag(service, habit_id, current_user, "stats", days, today)
+    if is_fresh(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     try:
-        return service.stats(habit_id, current_user, days, date.today())
+        return await service.stats(habit_id, current_user, days, today)
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
 @router.put("/habits/{habit_id}", response_model=HabitOut)
-def update_habit(
+async def update_habit(
     habit_id: int,
     habit: HabitUpdate,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
         # Validate goal_type if provided
@@ -98,32 +219,42 @@ def update_habit(
             # Use a sentinel to indicate reminder_time was not provided
             from app.services.habits import _REMINDER_TIME_SENTINEL
             reminder_time = _REMINDER_TIME_SENTINEL
-        updated_habit = service.update(habit_id, current_user, habit_dict.get('name'), habit_dict.get('goal_type'), reminder_time)
+        updated_habit = await service.update(
+            habit_id,
+            current_user,
+            habit_dict.get("name"),
+            habit_dict.get("goal_type"),
+            reminder_time,
+            habit_dict.get("category_ids"),
+        )
         if not updated_habit:
             raise HTTPException(status_code=404, detail="Habit not found")
         return updated_habit
     except LookupError as e:
-        raise HTTPException(status_code=404, detail="Habit not found") from e
+        detail = "Category not found" if str(e) == "category_not_found" else "Habit not found"
+        raise HTTPException(status_code=404, detail=detail) from e
 
 @router.delete("/habits/{habit_id}")
-def delete_habit(
+async def delete_habit(
     habit_id: int,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     try:
-        service.delete(habit_id, current_user)
+        await service.delete(habit_id, current_user)
         return {"ok": True}
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
 @router.get("/habits/{habit_id}/calendar", response_model=CalendarOut)
-def get_calendar(
+async def get_calendar(
     habit_id: int,
     year: int,
     month: int,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    service: AsyncHabitService = Depends(get_habit_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
     """
     Get calendar view for a habit showing completion status for each day in a month.
@@ -136,17 +267,23 @@ def get_calendar(
     if not 1 <= month <= 12:
         raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
     
+    etag = await _habit_etag(service, habit_id, current_user, "calendar", year, month)
+    caching = _calendar_cache_control(year, month, date.today())
+    if is_fresh(request, etag):
+        return not_modified(etag, caching)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = caching
     try:
-        return service.calendar(habit_id, current_user, year, month)
+        return await service.calendar(habit_id, current_user, year, month)
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
 @router.get("/habits/{habit_id}/entries/{entry_date}", response_model=EntryOut)
-def get_entry(
+async def get_entry(
     habit_id: int,
     entry_date: date,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
     """
     Get an entry for a specific habit and date, including journal.
@@ -156,7 +293,7 @@ def get_entry(
         entry_date: The date of the entry (YYYY-MM-DD)
     """
     try:
-        entry = service.get_entry(habit_id, current_user, entry_date)
+        entry = await service.get_entry(habit_id, current_user, entry_date)
         if not entry:
             raise HTTPException(status_code=404, detail="Entry not found")
         return entry
@@ -164,12 +301,12 @@ def get_entry(
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
 @router.put("/habits/{habit_id}/entries/{entry_date}/journal", response_model=EntryOut)
-def update_entry_journal(
+async def update_entry_journal(
     habit_id: int,
     entry_date: date,
     entry_update: EntryUpdate,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    service: AsyncHabitService = Depends(get_habit_service),
+    current_user: int = Depends(get_async_current_writer),
 ):
     """
     Update the journal for a specific entry.
@@ -180,27 +317,40 @@ def update_entry_journal(
         entry_update: The journal update data
     """
     try:
-        entry = service.update_entry_journal(habit_id, current_user, entry_date, entry_update.journal)
+        entry = await service.update_entry_journal(
+            habit_id, current_user, entry_date, entry_update.journal
+        )
         if not entry:
             raise HTTPException(status_code=404, detail="Entry not found")
         return entry
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
 
-@router.get("/habits/{habit_id}/entries", response_model=List[EntryOut])
-def list_entries(
+@router.get("/habits/{habit_id}/entries", response_model=list[EntryOut])
+async def list_entries(
     habit_id: int,
-    service: HabitService = Depends(get_habit_service),
-    current_user: int = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before: date | None = None,
+    service: AsyncHabitService = Depends(get_habit_read_service),
+    current_user: int = Depends(get_async_current_user),
 ):
     """
-    Get all entries for a habit, including journals, ordered by date (newest first).
+    Get entries for a habit, including journals, ordered by date (newest first).
     
     Args:
         habit_id: The ID of the habit
+        limit: Page size; omit to get every entry
+        before: Cursor from X-Next-Cursor; only entries dated before it are returned
     """
+    etag = await _habit_etag(service, habit_id, current_user, "entries", limit, before)
+    if is_fresh(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     try:
-        entries = service.list_entries(habit_id, current_user)
+        entries, next_cursor = await service.list_entries(habit_id, current_user, limit, before)
+        _set_next_cursor(response, next_cursor)
         return entries
     except LookupError as e:
         raise HTTPException(status_code=404, detail="Habit not found") from e
@@ -0,0 +1,45 @@
+"""
+Data import: bulk-load entries from other trackers or a previous export
+"""
+from typing import Literal
+
+from fastapi import APIRouter, Depends, File, UploadFile
+from sqlalchemy.orm import Session
+
+from app.cache import calendar_cache, habit_list_cache
+from app.dependencies import get_current_writer, get_db
+from app.repositories.entries import SqlAlchemyEntryRepository
+from app.repositories.habits import SqlAlchemyHabitRepository
+from app.schemas import ImportReport
+from app.services.imports import ImportService
+
+router = APIRouter(tags=["import"])
+
+
+def get_import_service(db: Session = Depends(get_db)) -> ImportService:
+    return ImportService(
+        SqlAlchemyHabitRepository(db),
+        SqlAlchemyEntryRepository(db),
+        habit_list_cache,
+        calendar_cache,
+    )
+
+
+@router.post("/import", response_model=ImportReport)
+def import_entries(
+    file: UploadFile = File(...),
+    format: Literal["ndjson", "csv"] | None = None,
+    service: ImportService = Depends(get_import_service),
+    current_user: int = Depends(get_current_writer),
+):
+    """
+    Import entries from an NDJSON or CSV upload with habit_id or habit_name,
+    date and journal fields. Days already logged are counted as duplicates.
+
+    Args:
+        file: The upload (multipart form field "file")
+        format: "ndjson" or "csv"; defaults from the file name, then NDJSON
+    """
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    return service.import_entries(current_user, file.file, format)
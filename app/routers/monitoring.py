@@ -1,16 +1,16 @@
 """
 Health check and monitoring endpoints
 """
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Response
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import psutil
 import os
 
 from app.config import settings
-from app.dependencies import get_db
-from app.models import Habit, Entry
+from app.dependencies import get_db, get_replica_db
+from app.repositories.rollups import SqlAlchemyRollupRepository
 from app.monitoring import get_metrics, CONTENT_TYPE_LATEST
 
 router = APIRouter(tags=["Monitoring"])
@@ -84,27 +84,33 @@ def prometheus_metrics():
 
 
 @router.get("/business-metrics")
-def get_business_metrics(db: Session = Depends(get_db)):
+def get_business_metrics(db: Session = Depends(get_replica_db)):
     """
     Get business metrics for monitoring dashboards (JSON format)
+
+    Served from the daily rollups (RollupService), so a scrape never scans
+    the entries table. Total entries are summed from the streak state and
+    total habits counted live, so both are exact.
     """
     try:
-        # Get database metrics
-        total_habits = db.query(Habit).count()
-        total_entries = db.query(Entry).count()
-        
-        # Get today's activity (this would need more sophisticated queries in production)
-        from datetime import date
+        rollups = SqlAlchemyRollupRepository(db)
+        total_entries, total_habits = rollups.totals()
         today = date.today()
-        entries_today = db.query(Entry).filter(Entry.date == today).count()
+        rollup = next(iter(rollups.between(today, today)), None)
         
         return {
             "database": {
                 "total_habits": total_habits,
                 "total_entries": total_entries,
-                "entries_today": entries_today
+                "entries_today": rollup.entries_logged if rollup else 0,
+                "journals_today": rollup.journals_written if rollup else 0,
+                "active_users_today": rollup.active_users if rollup else 0,
+                "habits_created_today": rollup.habits_created if rollup else 0,
             },
-            "timestamp": datetime.utcnow().isoformat()
+            "rollup_refreshed_at": rollup.refreshed_at.isoformat()
+            if rollup and rollup.refreshed_at
+            else None,
+            "timestamp": datetime.utcnow().isoformat(),
         }
     except Exception as e:
         raise HTTPException(
@@ -113,6 +119,38 @@ def get_business_metrics(db: Session = Depends(get_db)):
         )
 
 
+@router.get("/business-metrics/daily")
+def get_daily_business_metrics(
+    days: int = Query(30, ge=1, le=366), db: Session = Depends(get_replica_db)
+):
+    """
+    Get per-day business metrics for the last `days` days, oldest first (JSON format)
+
+    Days without a rollup row are reported as zeros.
+    """
+    try:
+        end = date.today()
+        start = end - timedelta(days=days - 1)
+        by_day = {r.day: r for r in SqlAlchemyRollupRepository(db).between(start, end)}
+        series = []
+        for offset in range(days):
+            d = start + timedelta(days=offset)
+            r = by_day.get(d)
+            series.append({
+                "date": d.isoformat(),
+                "entries_logged": r.entries_logged if r else 0,
+                "journals_written": r.journals_written if r else 0,
+                "active_users": r.active_users if r else 0,
+                "habits_created": r.habits_created if r else 0,
+            })
+        return {"days": series, "timestamp": datetime.utcnow().isoformat()}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve metrics: {str(e)}"
+        ) from e
+
+
 @router.get("/system")
 def get_system_metrics():
     """
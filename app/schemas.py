@@ -1,7 +1,7 @@
 from datetime import date, time
-from typing import Optional, List, Dict, Any
+from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 # Category schemas
@@ -11,8 +11,8 @@ class CategoryCreate(BaseModel):
 
 
 class CategoryUpdate(BaseModel):
-    name: Optional[str] = None
-    color: Optional[str] = None
+    name: str | None = None
+    color: str | None = None
 
 
 class CategoryOut(BaseModel):
@@ -33,20 +33,28 @@ class CategoryBrief(BaseModel):
 class HabitCreate(BaseModel):
     name: str
     goal_type: str
-    reminder_time: Optional[time] = None
-    category_ids: Optional[List[int]] = None
+    reminder_time: time | None = None
+    category_ids: list[int] | None = None
 
 
 class HabitUpdate(BaseModel):
-    name: Optional[str] = None
-    goal_type: Optional[str] = None
-    reminder_time: Optional[time] = None
-    category_ids: Optional[List[int]] = None
+    name: str | None = None
+    goal_type: str | None = None
+    reminder_time: time | None = None
+    category_ids: list[int] | None = None
 
 
 class HabitLog(BaseModel):
     date: date
-    journal: Optional[str] = None
+    journal: str | None = None
+
+
+class BatchLogItem(HabitLog):
+    habit_id: int
+
+
+class BatchLog(BaseModel):
+    items: list[BatchLogItem] = Field(..., min_length=1, max_length=500)
 
 
 class HabitOut(BaseModel):
@@ -55,8 +63,8 @@ class HabitOut(BaseModel):
     id: int
     name: str
     goal_type: str
-    reminder_time: Optional[time] = None
-    categories: List[CategoryBrief] = []
+    reminder_time: time | None = None
+    categories: list[CategoryBrief] = []
 
 class HabitWithStreak(BaseModel):
     id: int
@@ -64,14 +72,14 @@ class HabitWithStreak(BaseModel):
     goal_type: str
     streak: int
     best_streak: int
-    reminder_time: Optional[time] = None
-    categories: List[CategoryBrief] = []
+    reminder_time: time | None = None
+    categories: list[CategoryBrief] = []
 
 class StatsOut(BaseModel):
     habit_id: int
     current_streak: int
     best_streak: int
-    days: List[Dict[str, Any]]
+    days: list[dict[str, Any]]
 
 class CalendarDay(BaseModel):
     date: str
@@ -81,7 +89,7 @@ class CalendarOut(BaseModel):
     habit_id: int
     year: int
     month: int
-    days: List[CalendarDay]
+    days: list[CalendarDay]
 
 class EntryOut(BaseModel):
     model_config = {"from_attributes": True}
@@ -89,7 +97,17 @@ class EntryOut(BaseModel):
     id: int
     habit_id: int
     date: date
-    journal: Optional[str] = None
+    journal: str | None = None
 
 class EntryUpdate(BaseModel):
-    journal: Optional[str] = None
+    journal: str | None = None
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    duplicates: int
+    error_count: int
+    errors: list[ImportRowError]
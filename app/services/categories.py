@@ -1,61 +1,144 @@
-from typing import Optional, List
 
+from collections.abc import Callable
+from typing import TypeVar
+
+from sqlalchemy.orm import Session
+
+from app.cache import UserCache
+from app.db import run_on
 from app.models import Category
+from app.repositories.aio import AsyncSqlAlchemyRepository
 from app.repositories.base import CategoryRepository, HabitRepository
 
+T = TypeVar("T")
+
 
 class CategoryService:
-    def __init__(self, categories: CategoryRepository, habits: HabitRepository):
+    def __init__(
+        self,
+        categories: CategoryRepository,
+        habits: HabitRepository,
+        cache: UserCache | None = None,
+    ):
         self.categories = categories
         self.habits = habits
+        # The habit list cache: habits are listed with their categories
+        self.cache = cache
+
+    def _invalidate(self, user_id: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
 
     def create(self, user_id: int, name: str, color: str = "#6366f1") -> Category:
         if self.categories.exists_name(user_id, name):
             raise ValueError("name_exists")
-        return self.categories.create(user_id, name, color)
-
-    def get(self, category_id: int, user_id: int) -> Optional[Category]:
-        category = self.categories.get(category_id)
-        if category and category.user_id != user_id:
-            return None
+        category = self.categories.create(user_id, name, color)
+        self._invalidate(user_id)
         return category
 
-    def list_by_user(self, user_id: int) -> List[Category]:
+    def get(self, category_id: int, user_id: int) -> Category | None:
+        return self.categories.get_for_user(category_id, user_id)
+
+    def user_version(self, user_id: int) -> int | None:
+        """Version of the user's category list; one primary key lookup."""
+        return self.habits.user_version(user_id)
+
+    def list_by_user(self, user_id: int) -> list[Category]:
         return self.categories.list_by_user(user_id)
 
-    def update(self, category_id: int, user_id: int, name: Optional[str], color: Optional[str]) -> Optional[Category]:
-        category = self.categories.get(category_id)
+    def update(
+        self, category_id: int, user_id: int, name: str | None, color: str | None
+    ) -> Category | None:
+        category = self.categories.get_for_user(category_id, user_id)
         if not category:
             raise LookupError("not_found")
-        if category.user_id != user_id:
-            raise LookupError("not_found")
         # Check for duplicate name if name is being changed
         if name and name != category.name and self.categories.exists_name(user_id, name):
             raise ValueError("name_exists")
-        return self.categories.update(category_id, name, color)
+        updated = self.categories.update(category_id, name, color)
+        self._invalidate(user_id)
+        return updated
 
     def delete(self, category_id: int, user_id: int) -> bool:
-        category = self.categories.get(category_id)
-        if not category:
+        # Ownership check and delete are one statement; habit links cascade in the database
+        if not self.categories.delete_for_user(category_id, user_id):
             raise LookupError("not_found")
-        if category.user_id != user_id:
-            raise LookupError("not_found")
-        return self.categories.delete(category_id)
+        self._invalidate(user_id)
+        return True
 
     def add_habit_to_category(self, habit_id: int, category_id: int, user_id: int):
-        category = self.categories.get(category_id)
-        if not category or category.user_id != user_id:
+        category = self.categories.get_for_user(category_id, user_id)
+        if not category:
             raise LookupError("category_not_found")
-        habit = self.habits.get(habit_id)
-        if not habit or habit.user_id != user_id:
+        habit = self.habits.get_for_user(habit_id, user_id)
+        if not habit:
             raise LookupError("habit_not_found")
-        return self.habits.add_category(habit_id, category)
+        habit = self.habits.add_category(habit_id, category)
+        self._invalidate(user_id)
+        return habit
 
     def remove_habit_from_category(self, habit_id: int, category_id: int, user_id: int):
-        category = self.categories.get(category_id)
-        if not category or category.user_id != user_id:
+        category = self.categories.get_for_user(category_id, user_id)
+        if not category:
             raise LookupError("category_not_found")
-        habit = self.habits.get(habit_id)
-        if not habit or habit.user_id != user_id:
+        habit = self.habits.get_for_user(habit_id, user_id)
+        if not habit:
             raise LookupError("habit_not_found")
-        return self.habits.remove_category(habit_id, category)
+        habit = self.habits.remove_category(habit_id, category)
+        self._invalidate(user_id)
+        return habit
+
+
+class AsyncCategoryService:
+    """CategoryService for async endpoints; one hop per call, as in AsyncHabitService."""
+
+    def __init__(
+        self,
+        categories: AsyncSqlAlchemyRepository[CategoryRepository],
+        habits: AsyncSqlAlchemyRepository[HabitRepository],
+        cache: UserCache | None = None,
+    ):
+        self.categories = categories
+        self.habits = habits
+        self.cache = cache
+
+    async def _run(self, call: Callable[[CategoryService], T]) -> T:
+        def work(session: Session) -> T:
+            service = CategoryService(
+                self.categories.sync(session), self.habits.sync(session), self.cache
+            )
+            return call(service)
+
+        return await run_on(self.categories.session, work)
+
+    async def create(self, user_id: int, name: str, color: str = "#6366f1") -> Category:
+        return await self._run(lambda service: service.create(user_id, name, color))
+
+    async def get(self, category_id: int, user_id: int) -> Category | None:
+        return await self._run(lambda service: service.get(category_id, user_id))
+
+    async def user_version(self, user_id: int) -> int | None:
+        return await self._run(lambda service: service.user_version(user_id))
+
+    async def list_by_user(self, user_id: int) -> list[Category]:
+        return await self._run(lambda service: service.list_by_user(user_id))
+
+    async def update(
+        self, category_id: int, user_id: int, name: str | None, color: str | None
+    ) -> Category | None:
+        return await self._run(
+            lambda service: service.update(category_id, user_id, name, color)
+        )
+
+    async def delete(self, category_id: int, user_id: int) -> bool:
+        return await self._run(lambda service: service.delete(category_id, user_id))
+
+    async def add_habit_to_category(self, habit_id: int, category_id: int, user_id: int):
+        return await self._run(
+            lambda service: service.add_habit_to_category(habit_id, category_id, user_id)
+        )
+
+    async def remove_habit_from_category(self, habit_id: int, category_id: int, user_id: int):
+        return await self._run(
+            lambda service: service.remove_habit_from_category(habit_id, category_id, user_id)
+        )
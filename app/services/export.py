@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from collections.abc import Iterator
+from typing import Any, Literal
+
+from app.repositories.base import CategoryRepository, EntryRepository, HabitRepository
+
+ExportFormat = Literal["ndjson", "csv"]
+
+# One CSV for every record type; columns a type does not use are left empty
+CSV_COLUMNS = ["type", "id", "name", "color", "goal_type", "reminder_time", "category_ids",
+               "habit_id", "date", "journal"]
+
+# Rows per chunk handed to the response, so the stream is not one write per row
+_CHUNK_ROWS = 500
+
+
+class ExportService:
+    """Streams a user's full history: categories, then habits, then entries."""
+
+    def __init__(
+        self, habits: HabitRepository, entries: EntryRepository, categories: CategoryRepository
+    ):
+        self.habits, self.entries, self.categories = habits, entries, categories
+
+    def records(self, user_id: int) -> Iterator[dict[str, Any]]:
+        for c in self.categories.list_by_user(user_id):
+            yield {"type": "category", "id": c.id, "name": c.name, "color": c.color}
+        for h in self.habits.list_by_user(user_id):
+            yield {"type": "habit", "id": h.id, "name": h.name, "goal_type": h.goal_type,
+                   "reminder_time": h.reminder_time.isoformat() if h.reminder_time else None,
+                   "category_ids": [c.id for c in h.categories]}
+        for habit_id, d, journal in self.entries.stream_by_user(user_id):
+            yield {"type": "entry", "habit_id": habit_id, "date": d.isoformat(), "journal": journal}
+
+    def ndjson(self, user_id: int) -> Iterator[str]:
+        lines = []
+        for record in self.records(user_id):
+            lines.append(json.dumps(record) + "\n")
+            if len(lines) >= _CHUNK_ROWS:
+                yield "".join(lines)
+                lines = []
+        if lines:
+            yield "".join(lines)
+
+    def csv(self, user_id: int) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for n, record in enumerate(self.records(user_id), start=1):
+            if "category_ids" in record:
+                record = {
+                    **record,
+                    "category_ids": " ".join(str(i) for i in record["category_ids"]),
+                }
+            writer.writerow(record)
+            if n % _CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def stream(self, user_id: int, fmt: ExportFormat) -> Iterator[str]:
+        return self.ndjson(user_id) if fmt == "ndjson" else self.csv(user_id)
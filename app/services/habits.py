@@ -1,121 +1,272 @@
 from datetime import date, timedelta, time
-from typing import Literal, Optional, Union
+from typing import Literal, TypeVar
+from collections.abc import Callable
 from calendar import monthrange
 
+from sqlalchemy.orm import Session
+
+from app.cache import CalendarCache, UserCache
+from app.db import run_on
+from app.models import HabitStreak
 from app.policies.goal import DailyPolicy, GoalPolicy, WeeklyPolicy
+from app.repositories.aio import AsyncSqlAlchemyRepository
 from app.repositories.base import EntryRepository, HabitRepository
-from app.utils.streak import best_streak, current_streak
 
 Goal = Literal["daily", "weekly"]
 
 # Sentinel value to detect if reminder_time was explicitly provided
 _REMINDER_TIME_SENTINEL = object()
 
+T = TypeVar("T")
+
 
 def _policy(goal: Goal) -> GoalPolicy:
     """Get the appropriate policy for a goal type."""
     return DailyPolicy() if goal == "daily" else WeeklyPolicy()
 
 
+def _streaks_from_state(state: HabitStreak | None, today: date) -> tuple[int, int] | None:
+    """Read (current, best) streaks from materialized state.
+
+    Returns None when the state is missing or cannot answer for today
+    (entries logged after today), so the caller computes from entries instead.
+    """
+    if state is None:
+        return None
+    if state.last_entry_date is not None and state.last_entry_date > today:
+        return None
+    current = state.current_run_length if state.last_entry_date == today else 0
+    return current, state.best_run_length
+
+
+def _split_page(
+    rows: list[T], limit: int | None, cursor_of: Callable[[T], str]
+) -> tuple[list[T], str | None]:
+    """Trim rows fetched with limit + 1 to a page; also return the next page's cursor or None."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, cursor_of(rows[-1])
+
+
 class HabitService:
-    def __init__(self, habits: HabitRepository, entries: EntryRepository):
-        self.habits, self.entries = habits, entries
+    def __init__(
+        self,
+        habits: HabitRepository,
+        entries: EntryRepository,
+        cache: UserCache | None = None,
+        calendar_cache: CalendarCache | None = None,
+    ):
+        # cache holds list_with_streaks results; every write below invalidates the user's.
+        # calendar_cache holds calendar months, which only entries dated in them change
+        self.habits, self.entries, self.cache = habits, entries, cache
+        self.calendar_cache = calendar_cache
+
+    def _invalidate(self, user_id: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
 
-    def create(self, user_id: int, name: str, goal: Goal = "daily", reminder_time: Optional[time] = None):
+    def _invalidate_days(self, items: list[tuple[int, date]]) -> None:
+        """Drop the calendar months of the (habit_id, date) pairs just written."""
+        if self.calendar_cache is None:
+            return
+        days_by_habit: dict[int, list[date]] = {}
+        for habit_id, d in items:
+            days_by_habit.setdefault(habit_id, []).append(d)
+        for habit_id, days in days_by_habit.items():
+            self.calendar_cache.invalidate_days(habit_id, days)
+
+    def create(
+        self,
+        user_id: int,
+        name: str,
+        goal: Goal = "daily",
+        reminder_time: time | None = None,
+        category_ids: list[int] | None = None,
+    ):
         if self.habits.exists_name(user_id, name):
             raise ValueError("name_exists")
-        return self.habits.create(user_id, name, goal, reminder_time)
+        categories = self._owned_categories(user_id, category_ids)
+        habit = self.habits.create(user_id, name, goal, reminder_time, categories)
+        self._invalidate(user_id)
+        return habit
 
-    def log_today(self, habit_id: int, user_id: int, today: date, journal: Optional[str] = None):
-        h = self.habits.get(habit_id)
-        if not h:
+    def _owned_categories(self, user_id: int, category_ids: list[int] | None):
+        """The user's categories for category_ids (None passes through).
+
+        Any other id is not found.
+        """
+        if category_ids is None:
+            return None
+        categories = self.habits.categories_for_user(user_id, category_ids)
+        if len(categories) != len(set(category_ids)):
+            raise LookupError("category_not_found")
+        return categories
+
+    def log_today(self, habit_id: int, user_id: int, today: date, journal: str | None = None):
+        # Also loads the streak state that the upsert folds the new day into; holding
+        # the reference keeps both in the session's (weak) identity map meanwhile
+        habit = self.habits.get_for_user(habit_id, user_id)
+        if not habit:
             raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
+        # Inserts the entry, or updates its journal if the day is already logged
+        self.entries.upsert(habit_id, today, journal)
+        self._invalidate(user_id)
+        self._invalidate_days([(habit_id, today)])
+
+    def log_many(self, user_id: int, items: list[tuple[int, date, str | None]]) -> int:
+        """Log several (habit_id, date, journal) items in one transaction.
+
+        All habits must be the user's.
+        """
+        habit_ids = {habit_id for habit_id, _, _ in items}
+        if self.habits.owned_ids(user_id, list(habit_ids)) != habit_ids:
             raise LookupError("not_found")
-        if not self.entries.exists_on(habit_id, today):
-            self.entries.create(habit_id, today, journal)
-        elif journal is not None:
-            # Update journal if entry already exists
-            self.entries.update_journal(habit_id, today, journal)
+        self.entries.upsert_many(items)
+        self._invalidate(user_id)
+        self._invalidate_days([(habit_id, d) for habit_id, d, _ in items])
+        return len(items)
+
+    def user_version(self, user_id: int) -> int | None:
+        """Version of everything list_with_streaks shows the user; one primary key lookup."""
+        return self.habits.user_version(user_id)
 
-    def list_with_streaks(self, user_id: int, today: date, category_id: Optional[int] = None):
+    def habit_version(self, habit_id: int, user_id: int) -> int:
+        """Version of everything shown for one habit if the user owns it; one key lookup."""
+        version = self.habits.version_for_user(habit_id, user_id)
+        if version is None:
+            raise LookupError("not_found")
+        return version
+
+    def list_with_streaks(self, user_id: int, today: date, category_id: int | None = None,
+                          limit: int | None = None, after: int | None = None):
+        if self.cache is None:
+            return self._list_with_streaks(user_id, today, category_id, limit, after)
+        return self.cache.get_or_compute(
+            user_id, ("list_with_streaks", today, category_id, limit, after),
+            lambda: self._list_with_streaks(user_id, today, category_id, limit, after),
+        )
+
+    def _list_with_streaks(self, user_id: int, today: date, category_id: int | None,
+                           limit: int | None, after: int | None):
         out = []
         if category_id:
-            habits_list = self.habits.list_by_user_and_category(user_id, category_id)
+            habits_list = self.habits.list_by_user_and_category(
+                user_id, category_id, limit=limit, after=after
+            )
         else:
-            habits_list = self.habits.list_by_user(user_id)
+            habits_list = self.habits.list_by_user(user_id, limit=limit, after=after)
         
+        ids = [h.id for h in habits_list]
+        states = self.entries.streaks(ids)
+        streaks: dict[int, tuple[int, int]] = {}
+        for habit_id in ids:
+            pair = _streaks_from_state(states.get(habit_id), today)
+            if pair is not None:
+                streaks[habit_id] = pair
+        missing = [habit_id for habit_id in ids if habit_id not in streaks]
+        if missing:
+            # Habits without usable state: let the database compute full-history streaks
+            streaks.update(self.entries.computed_streaks(missing, today))
+
         for h in habits_list:
-            # Fetch last 365 days to calculate current streak
-            start = today - timedelta(days=365)
-            dates = set(self.entries.dates_between(h.id, start, today))
+            current, best = streaks[h.id]
             categories = [{"id": c.id, "name": c.name, "color": c.color} for c in h.categories]
             out.append({"id": h.id, "name": h.name, "goal_type": h.goal_type,
-                        "streak": current_streak(dates, today),
-                        "best_streak": best_streak(dates),
+                        "streak": current,
+                        "best_streak": best,
                         "reminder_time": h.reminder_time,
                         "categories": categories})
         return out
 
-    def update(self, habit_id: int, user_id: int, name: Optional[str], goal_type: Optional[str], reminder_time: Union[Optional[time], object] = _REMINDER_TIME_SENTINEL):
-        h = self.habits.get(habit_id)
-        if not h:
-            raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
+    def page_with_streaks(self, user_id: int, today: date, category_id: int | None = None,
+                          limit: int | None = None, after: int | None = None):
+        """One page of list_with_streaks in id order, plus the cursor of the next page."""
+        habits_list = self.list_with_streaks(
+            user_id, today, category_id, limit=None if limit is None else limit + 1, after=after
+        )
+        return _split_page(habits_list, limit, lambda h: str(h["id"]))
+
+    def update(
+        self,
+        habit_id: int,
+        user_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_SENTINEL,
+        category_ids: list[int] | None = None,
+    ):
+        # Ownership is part of the lookup; the repository then reuses the loaded habit
+        habit = self.habits.get_for_user(habit_id, user_id)
+        if not habit:
             raise LookupError("not_found")
+        categories = self._owned_categories(user_id, category_ids)
         # Pass reminder_time to repository only if it was explicitly provided
         # The repository uses a sentinel to detect if it should update reminder_time
         if reminder_time is not _REMINDER_TIME_SENTINEL:
-            return self.habits.update(habit_id, name, goal_type, reminder_time)
+            updated = self.habits.update(habit_id, name, goal_type, reminder_time, categories)
         else:
             # reminder_time was not provided, pass sentinel to repository
             from app.repositories.base import _REMINDER_TIME_NOT_PROVIDED
-            return self.habits.update(habit_id, name, goal_type, _REMINDER_TIME_NOT_PROVIDED)
+
+            updated = self.habits.update(
+                habit_id, name, goal_type, _REMINDER_TIME_NOT_PROVIDED, categories
+            )
+        self._invalidate(user_id)
+        # A new goal type changes which days count as completed
+        if self.calendar_cache is not None:
+            self.calendar_cache.invalidate_user(user_id)
+        return updated
 
     def delete(self, habit_id: int, user_id: int):
-        h = self.habits.get(habit_id)
-        if not h:
+        # Ownership check and delete are one statement; entries, streak state and
+        # category links go with it through ON DELETE CASCADE
+        if not self.habits.delete_for_user(habit_id, user_id):
             raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
-            raise LookupError("not_found")
-        return self.habits.delete(habit_id)
+        self._invalidate(user_id)
+        if self.calendar_cache is not None:
+            self.calendar_cache.invalidate_user(user_id)
+        return True
 
     def stats(self, habit_id: int, user_id: int, days: int, today: date):
-        h = self.habits.get(habit_id)
+        # The habit comes with its streak state, so stats takes two queries in all
+        h = self.habits.get_for_user(habit_id, user_id)
         if not h:
             raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
-            raise LookupError("not_found")
         pol = _policy(h.goal_type)
         start, end = pol.window(days, today)
         ds = set(self.entries.dates_between(h.id, start, end))
+        pair = _streaks_from_state(h.streak, today)
+        current, best = (
+            pair if pair is not None else self.entries.computed_streaks([h.id], today)[h.id]
+        )
         return {
             "habit_id": h.id,
-            "current_streak": current_streak(ds, today),
-            "best_streak": best_streak(ds),
+            "current_streak": current,
+            "best_streak": best,
             "days": [{"date": d.isoformat(), "done": pol.is_hit(ds, d)}
                      for d in (start + timedelta(n) for n in range((end-start).days+1))]
         }
 
     def calendar(self, habit_id: int, user_id: int, year: int, month: int):
-        h = self.habits.get(habit_id)
-        if not h:
-            raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
-            raise LookupError("not_found")
-        
+        """Completion of each day of a month; cached until an entry in the month is written."""
+        if self.calendar_cache is None:
+            return self._calendar(habit_id, user_id, year, month)
+        return self.calendar_cache.get_or_compute(
+            user_id, habit_id, year, month, lambda: self._calendar(habit_id, user_id, year, month)
+        )
+
+    def _calendar(self, habit_id: int, user_id: int, year: int, month: int):
         # Get first and last day of the month
         first_day = date(year, month, 1)
         last_day_num = monthrange(year, month)[1]
         last_day = date(year, month, last_day_num)
         
-        # Get all entry dates for this habit in the month
-        entry_dates = set(self.entries.dates_between(h.id, first_day, last_day))
+        # Get the habit (if the user owns it) and its entry dates in the month in one query
+        found = self.entries.dates_between_for_user(habit_id, user_id, first_day, last_day)
+        if found is None:
+            raise LookupError("not_found")
+        h, entry_dates = found
         
         # Get policy for checking completion
         pol = _policy(h.goal_type)
@@ -138,28 +289,142 @@ class HabitService:
         }
 
     def get_entry(self, habit_id: int, user_id: int, entry_date: date):
-        h = self.habits.get(habit_id)
-        if not h:
+        found = self.entries.get_by_date_for_user(habit_id, user_id, entry_date)
+        if found is None:
             raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
-            raise LookupError("not_found")
-        return self.entries.get_by_date(habit_id, entry_date)
+        return found[1]
 
-    def update_entry_journal(self, habit_id: int, user_id: int, entry_date: date, journal: Optional[str]):
-        h = self.habits.get(habit_id)
-        if not h:
-            raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
+    def update_entry_journal(
+        self, habit_id: int, user_id: int, entry_date: date, journal: str | None
+    ):
+        found = self.entries.get_by_date_for_user(habit_id, user_id, entry_date)
+        if found is None:
             raise LookupError("not_found")
-        return self.entries.update_journal(habit_id, entry_date, journal)
+        entry = found[1]
+        if entry is None:
+            return None
+        # Journals are not part of list_with_streaks, but every write invalidates alike.
+        # Calendar months only show whether a day is logged, so they stay cached
+        entry = self.entries.set_journal(entry, journal)
+        self._invalidate(user_id)
+        return entry
 
-    def list_entries(self, habit_id: int, user_id: int):
-        h = self.habits.get(habit_id)
-        if not h:
-            raise LookupError("not_found")
-        # Validate that the habit belongs to the user
-        if h.user_id != user_id:
+    def list_entries(
+        self, habit_id: int, user_id: int, limit: int | None = None, before: date | None = None
+    ):
+        """Entries newest first, paged by date: returns (entries, next_cursor)."""
+        entries = self.entries.list_by_habit_for_user(
+            habit_id, user_id, limit=None if limit is None else limit + 1, before=before
+        )
+        if entries is None:
             raise LookupError("not_found")
-        return self.entries.list_by_habit(habit_id)
\ No newline at end of file
+        return _split_page(entries, limit, lambda e: e.date.isoformat())
+
+
+class AsyncHabitService:
+    """
+    HabitService for async endpoints. Each call runs the HabitService rules over
+    the async repositories' sync twins in a single hop onto their session, so a
+    call costs one await however many queries it makes.
+    """
+
+    def __init__(
+        self,
+        habits: AsyncSqlAlchemyRepository[HabitRepository],
+        entries: AsyncSqlAlchemyRepository[EntryRepository],
+        cache: UserCache | None = None,
+        calendar_cache: CalendarCache | None = None,
+    ):
+        self.habits, self.entries, self.cache = habits, entries, cache
+        self.calendar_cache = calendar_cache
+
+    async def _run(self, call: Callable[[HabitService], T]) -> T:
+        def work(session: Session) -> T:
+            service = HabitService(
+                self.habits.sync(session),
+                self.entries.sync(session),
+                self.cache,
+                self.calendar_cache,
+            )
+            return call(service)
+
+        return await run_on(self.habits.session, work)
+
+    async def create(
+        self,
+        user_id: int,
+        name: str,
+        goal: Goal = "daily",
+        reminder_time: time | None = None,
+        category_ids: list[int] | None = None,
+    ):
+        return await self._run(
+            lambda service: service.create(user_id, name, goal, reminder_time, category_ids)
+        )
+
+    async def log_today(
+        self, habit_id: int, user_id: int, today: date, journal: str | None = None
+    ):
+        return await self._run(lambda service: service.log_today(habit_id, user_id, today, journal))
+
+    async def log_many(self, user_id: int, items: list[tuple[int, date, str | None]]) -> int:
+        return await self._run(lambda service: service.log_many(user_id, items))
+
+    async def user_version(self, user_id: int) -> int | None:
+        return await self._run(lambda service: service.user_version(user_id))
+
+    async def habit_version(self, habit_id: int, user_id: int) -> int:
+        return await self._run(lambda service: service.habit_version(habit_id, user_id))
+
+    async def list_with_streaks(self, user_id: int, today: date, category_id: int | None = None,
+                                limit: int | None = None, after: int | None = None):
+        return await self._run(
+            lambda service: service.list_with_streaks(user_id, today, category_id, limit, after)
+        )
+
+    async def page_with_streaks(self, user_id: int, today: date, category_id: int | None = None,
+                                limit: int | None = None, after: int | None = None):
+        return await self._run(
+            lambda service: service.page_with_streaks(user_id, today, category_id, limit, after)
+        )
+
+    async def update(
+        self,
+        habit_id: int,
+        user_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_SENTINEL,
+        category_ids: list[int] | None = None,
+    ):
+        return await self._run(
+            lambda service: service.update(
+                habit_id, user_id, name, goal_type, reminder_time, category_ids
+            )
+        )
+
+    async def delete(self, habit_id: int, user_id: int):
+        return await self._run(lambda service: service.delete(habit_id, user_id))
+
+    async def stats(self, habit_id: int, user_id: int, days: int, today: date):
+        return await self._run(lambda service: service.stats(habit_id, user_id, days, today))
+
+    async def calendar(self, habit_id: int, user_id: int, year: int, month: int):
+        return await self._run(lambda service: service.calendar(habit_id, user_id, year, month))
+
+    async def get_entry(self, habit_id: int, user_id: int, entry_date: date):
+        return await self._run(lambda service: service.get_entry(habit_id, user_id, entry_date))
+
+    async def update_entry_journal(
+        self, habit_id: int, user_id: int, entry_date: date, journal: str | None
+    ):
+        return await self._run(
+            lambda service: service.update_entry_journal(habit_id, user_id, entry_date, journal)
+        )
+
+    async def list_entries(
+        self, habit_id: int, user_id: int, limit: int | None = None, before: date | None = None
+    ):
+        return await self._run(
+            lambda service: service.list_entries(habit_id, user_id, limit, before)
+        )
@@ -0,0 +1,148 @@
+import csv
+import json
+from collections.abc import Iterator
+from datetime import date
+from typing import Any, BinaryIO, Literal
+
+from app.cache import CalendarCache, UserCache
+from app.repositories.base import EntryRepository, HabitRepository
+
+ImportFormat = Literal["ndjson", "csv"]
+
+# Rows per transaction
+CHUNK_SIZE = 1000
+# Per-row errors listed in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def _decode(raw: bytes, line: int) -> str:
+    """One line of the file as text; a line that is not UTF-8 raises ValueError."""
+    try:
+        return raw.decode("utf-8-sig" if line == 1 else "utf-8")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"invalid UTF-8 at byte {e.start}") from None
+
+
+def _rows(file: BinaryIO, fmt: ImportFormat) -> Iterator[tuple[int, Any]]:
+    """Yield (line number, record) pairs; a record that cannot be parsed is yielded as an exception.
+
+    Lines are decoded one at a time, so a bad byte is reported on its line.
+    A bad NDJSON line is skipped. CSV cannot pick up again after a line it
+    fails to read (a quoted field may span lines), so the error is yielded
+    and the rest of the file is left unread.
+    """
+    if fmt == "csv":
+        # The header is line 1
+        line = 1
+        try:
+            for line, record in enumerate(
+                csv.DictReader(_decode(raw, n) for n, raw in enumerate(file, start=1)), start=2
+            ):
+                yield line, record
+        except (csv.Error, ValueError) as e:
+            yield line + 1, ValueError(f"{e}; the rest of the file was not imported")
+        return
+    for line, raw in enumerate(file, start=1):
+        try:
+            text = _decode(raw, line)
+        except ValueError as e:
+            yield line, e
+            continue
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, ValueError(f"invalid JSON: {e}")
+            continue
+        yield line, record if isinstance(record, dict) else ValueError("expected a JSON object")
+
+
+class ImportService:
+    """Bulk-loads entries for a user's existing habits from NDJSON or CSV."""
+
+    def __init__(
+        self,
+        habits: HabitRepository,
+        entries: EntryRepository,
+        cache: UserCache | None = None,
+        calendar_cache: CalendarCache | None = None,
+    ):
+        self.habits, self.entries, self.cache = habits, entries, cache
+        self.calendar_cache = calendar_cache
+
+    def import_entries(self, user_id: int, file: BinaryIO, fmt: ImportFormat) -> dict[str, Any]:
+        """
+        Import (habit_id or habit_name, date, journal) rows in chunked transactions.
+        Days that are already logged are skipped, and rows that cannot be
+        imported are reported by line number instead of failing the upload.
+        Records of other types in an export ("habit", "category") are ignored.
+        """
+        owned = self.habits.list_by_user(user_id)
+        ids = {h.id for h in owned}
+        by_name = {h.name: h.id for h in owned}
+
+        report: dict[str, Any] = {"imported": 0, "duplicates": 0, "error_count": 0, "errors": []}
+        chunk: list[tuple[int, date, str | None]] = []
+        for line, record in _rows(file, fmt):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if record.get("type", "entry") not in ("entry", ""):
+                    continue
+                chunk.append(self._parse(record, ids, by_name))
+            except ValueError as e:
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": line, "error": str(e)})
+                continue
+            if len(chunk) >= CHUNK_SIZE:
+                self._flush(chunk, report)
+                chunk = []
+        self._flush(chunk, report)
+        if report["imported"] and self.cache is not None:
+            self.cache.invalidate(user_id)
+        return report
+
+    @staticmethod
+    def _parse(
+        record: dict[str, Any], ids: set[int], by_name: dict[str, int]
+    ) -> tuple[int, date, str | None]:
+        habit_id, habit_name = record.get("habit_id"), record.get("habit_name")
+        if habit_id not in (None, ""):
+            # An integer, or its digits in CSV; int() would truncate 1.5 and take True as 1
+            try:
+                if isinstance(habit_id, bool) or not isinstance(habit_id, (int, str)):
+                    raise ValueError
+                habit_id = int(habit_id)
+            except ValueError:
+                raise ValueError(f"invalid habit_id: {habit_id!r}") from None
+            if habit_id not in ids:
+                raise ValueError(f"habit not found: {habit_id}")
+        elif habit_name:
+            if habit_name not in by_name:
+                raise ValueError(f"habit not found: {habit_name!r}")
+            habit_id = by_name[habit_name]
+        else:
+            raise ValueError("habit_id or habit_name is required")
+        try:
+            d = date.fromisoformat(str(record.get("date")))
+        except ValueError:
+            raise ValueError(f"invalid date: {record.get('date')!r}") from None
+        journal = record.get("journal") or None
+        if journal is not None and not isinstance(journal, str):
+            raise ValueError(f"invalid journal: {journal!r}")
+        return habit_id, d, journal
+
+    def _flush(self, chunk: list[tuple[int, date, str | None]], report: dict[str, Any]) -> None:
+        if not chunk:
+            return
+        inserted = self.entries.insert_many(chunk)
+        report["imported"] += inserted
+        report["duplicates"] += len(chunk) - inserted
+        if inserted and self.calendar_cache is not None:
+            # The chunk's months; the skipped duplicates' as well, which costs no more than a miss
+            for habit_id in {habit_id for habit_id, _, _ in chunk}:
+                self.calendar_cache.invalidate_days(
+                    habit_id, (d for h, d, _ in chunk if h == habit_id)
+                )
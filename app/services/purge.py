@@ -0,0 +1,145 @@
+import logging
+from datetime import date, timedelta
+
+from app.cache import CalendarCache, TokenCache, UserCache
+from app.models import PurgeJob
+from app.repositories.base import PurgeRepository
+
+logger = logging.getLogger(__name__)
+
+# Stages run in order; each one works in id order until nothing is left.
+# Entries, hot then archived, go first so that no single statement cascades
+# to a habit's whole history. An archive job moves entries instead of deleting them.
+STAGES = {
+    "account": ("entries", "archive", "habits", "categories", "user"),
+    "retention": ("entries", "archive"),
+    "archive": ("move",),
+}
+
+
+class PurgeService:
+    """Account deletion, data-retention purges and entry archival, run as resumable batch jobs."""
+
+    def __init__(
+        self,
+        purges: PurgeRepository,
+        cache: UserCache | None = None,
+        calendar_cache: CalendarCache | None = None,
+        token_cache: TokenCache | None = None,
+    ):
+        # Every batch drops the cached results of what it removed, as it commits;
+        # queueing and finishing an account deletion also revoke the user's tokens
+        self.purges = purges
+        self.cache, self.calendar_cache, self.token_cache = cache, calendar_cache, token_cache
+
+    def _invalidate_entries(self, removed: list[tuple[int, int, date]]) -> None:
+        """Drop the cached habit lists and months of removed (user_id, habit_id, date) entries."""
+        days_by_habit: dict[int, set[date]] = {}
+        for _, habit_id, d in removed:
+            days_by_habit.setdefault(habit_id, set()).add(d)
+        if self.calendar_cache is not None:
+            for habit_id, days in days_by_habit.items():
+                self.calendar_cache.invalidate_days(habit_id, days)
+        if self.cache is not None:
+            for user_id in {user_id for user_id, _, _ in removed}:
+                self.cache.invalidate(user_id)
+
+    def _invalidate_user(self, user_id: int) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(user_id)
+        if self.calendar_cache is not None:
+            self.calendar_cache.invalidate_user(user_id)
+
+    def start_account_deletion(self, user_id: int) -> PurgeJob:
+        """Queue the deletion of a user and everything they own.
+
+        A repeated request returns the queued job.
+        """
+        job = self.purges.pending_job("account", user_id)
+        if job is not None:
+            return job
+        if not self.purges.user_exists(user_id):
+            raise LookupError("not_found")
+        job = self.purges.create_job("account", STAGES["account"][0], user_id=user_id)
+        if self.token_cache is not None:
+            # Decodes from now on see the pending job and reject the user's tokens
+            self.token_cache.revoke(user_id)
+        return job
+
+    def start_retention(self, retention_days: int, today: date | None = None) -> PurgeJob:
+        """Queue the removal of entries older than retention_days, or return the unfinished one."""
+        job = self.purges.pending_job("retention")
+        if job is not None:
+            return job
+        cutoff = (today or date.today()) - timedelta(days=retention_days)
+        return self.purges.create_job("retention", STAGES["retention"][0], cutoff=cutoff)
+
+    def start_archive(self, archive_days: int, today: date | None = None) -> PurgeJob:
+        """Queue archiving of entries older than archive_days, or return the unfinished job."""
+        job = self.purges.pending_job("archive")
+        if job is not None:
+            return job
+        cutoff = (today or date.today()) - timedelta(days=archive_days)
+        return self.purges.create_job("archive", STAGES["archive"][0], cutoff=cutoff)
+
+    def step(self, job: PurgeJob, batch_size: int) -> bool:
+        """Run one batch of the job. Returns False once the job is finished."""
+        if job.stage == "done":
+            return False
+        if job.stage == "entries":
+            removed = self.purges.purge_entries(job, batch_size)
+            self._invalidate_entries(removed)
+            deleted = len(removed)
+        elif job.stage == "archive":
+            removed = self.purges.purge_archive(job, batch_size)
+            self._invalidate_entries(removed)
+            deleted = len(removed)
+        elif job.stage == "move":
+            # The calendar and streaks read archived entries too, so nothing cached changes
+            deleted = self.purges.archive_entries(job, batch_size)
+        elif job.stage == "habits":
+            deleted = self.purges.purge_habits(job, batch_size)
+        elif job.stage == "categories":
+            deleted = self.purges.purge_categories(job, batch_size)
+        else:
+            if not self.purges.purge_user(job):
+                # Rows written while the purge ran; sweep them up again
+                self.purges.set_stage(job, "entries")
+            elif job.user_id is not None and self.token_cache is not None:
+                # The user is gone; their tokens must not keep passing as someone
+                self.token_cache.revoke(job.user_id)
+            return job.stage != "done"
+        if deleted and job.stage in ("habits", "categories") and job.user_id is not None:
+            self._invalidate_user(job.user_id)
+        if deleted:
+            logger.info(
+                "Purge job %s: %s %s, %s rows deleted so far",
+                job.id,
+                job.stage,
+                job.last_id,
+                job.deleted_rows,
+            )
+            return True
+        stages = STAGES[job.kind]
+        following = stages.index(job.stage) + 1
+        if following < len(stages):
+            self.purges.set_stage(job, stages[following])
+        else:
+            self.purges.finish(job)
+        return job.stage != "done"
+
+    def run(self, job: PurgeJob, batch_size: int) -> PurgeJob:
+        """Run the job to completion, from wherever it last stopped."""
+        while self.step(job, batch_size):
+            pass
+        logger.info(
+            "Purge job %s (%s) finished: %s rows deleted", job.id, job.kind, job.deleted_rows
+        )
+        return job
+
+    def resume_pending(self, batch_size: int) -> int:
+        """Finish every interrupted job. Returns the number of jobs run."""
+        jobs = self.purges.pending_jobs()
+        for job in jobs:
+            self.run(job, batch_size)
+        return len(jobs)
@@ -0,0 +1,43 @@
+import logging
+from datetime import date, timedelta
+
+from app.repositories.base import RollupRepository
+
+logger = logging.getLogger(__name__)
+
+# Days per transaction when refreshing a long range
+CHUNK_DAYS = 31
+# Today and yesterday still change, so every catch-up refreshes them again
+RECENT_DAYS = 2
+
+
+class RollupService:
+    """Keeps the daily rollups behind /business-metrics current."""
+
+    def __init__(self, rollups: RollupRepository):
+        self.rollups = rollups
+
+    def refresh(self, start: date, end: date) -> int:
+        """Refresh start..end, CHUNK_DAYS per transaction. Returns the number of days written."""
+        days = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=CHUNK_DAYS - 1), end)
+            days += self.rollups.refresh(chunk_start, chunk_end)
+            logger.info("Rolled up %s .. %s", chunk_start.isoformat(), chunk_end.isoformat())
+            chunk_start = chunk_end + timedelta(days=1)
+        return days
+
+    def catch_up(self, today: date) -> int:
+        """Refresh every day from the last rolled-up one, and at least the last RECENT_DAYS.
+
+        With no rollups yet (a fresh deployment) it starts from the first day
+        anything was logged or created. Days that backfills, imports or purges
+        changed further back need an explicit refresh of their range.
+        """
+        latest = self.rollups.latest_day()
+        if latest is None:
+            start = self.rollups.first_activity_day() or today
+        else:
+            start = min(latest, today - timedelta(days=RECENT_DAYS - 1))
+        return self.refresh(start, today)
@@ -0,0 +1,76 @@
+"""Completions of one habit in one year as a 366-bit bitmap.
+
+Bit i is day i of the year, counting Jan 1 as 0.
+"""
+from collections.abc import Iterable, Mapping
+from datetime import date, timedelta
+
+# 366 bits, rounded up to whole bytes
+YEAR_BYTES = 46
+
+
+def _bits(data: bytes | None) -> int:
+    return int.from_bytes(data, "little") if data else 0
+
+
+def with_days(data: bytes | None, days: Iterable[date]) -> bytes:
+    """data with the bits of the given days (all in the same year) set."""
+    bits = _bits(data)
+    for d in days:
+        bits |= 1 << (d.timetuple().tm_yday - 1)
+    return bits.to_bytes(YEAR_BYTES, "little")
+
+
+def days_of(
+    year: int, data: bytes | None, start: date = date.min, end: date = date.max
+) -> list[date]:
+    """The logged days of a year bitmap within start..end, in order."""
+    first = date(year, 1, 1)
+    lo = max((start - first).days, 0)
+    hi = min((end - first).days, YEAR_BYTES * 8 - 1)
+    if hi < lo:
+        return []
+    # Only the bits in the range, shifted down to bit 0
+    bits = (_bits(data) >> lo) & ((1 << (hi - lo + 1)) - 1)
+    out = []
+    while bits:
+        low = bits & -bits
+        out.append(first + timedelta(days=lo + low.bit_length() - 1))
+        bits ^= low
+    return out
+
+
+def streaks_of(
+    years: Mapping[int, bytes], today: date | None = None
+) -> tuple[int, int, int, date | None]:
+    """(current, best, count, last entry date) over a habit's year bitmaps.
+
+    The years are laid end to end in one integer, so runs cross year
+    boundaries, and each figure is a handful of bit operations: a popcount
+    for the count, the highest bit for the last entry, and the run at today
+    from the nearest clear bit below it. current is measured at today, or
+    at the last entry when today is None, like batch_streaks_by_habit.
+    """
+    if not years:
+        return 0, 0, 0, None
+    base = date(min(years), 1, 1)
+    bits = 0
+    for year, data in years.items():
+        bits |= _bits(data) << (date(year, 1, 1) - base).days
+    if not bits:
+        return 0, 0, 0, None
+    count = bits.bit_count()
+    last = base + timedelta(days=bits.bit_length() - 1)
+
+    # Each round clears the last day of every run, so the longest run lasts the most rounds
+    best, runs = 0, bits
+    while runs:
+        runs &= runs >> 1
+        best += 1
+
+    at = (((today or last) - base).days)
+    current = 0
+    if 0 <= at and bits >> at & 1:
+        gaps = ~bits & ((1 << at) - 1)
+        current = at - gaps.bit_length() + 1
+    return current, best, count, last
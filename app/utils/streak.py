@@ -1,8 +1,11 @@
+from collections.abc import Iterable, Mapping
 from datetime import date, timedelta
-from typing import Set
+from typing import NamedTuple
 
+import numpy as np
 
-def current_streak(dates: Set[date], today: date) -> int:
+
+def current_streak(dates: set[date], today: date) -> int:
     if today not in dates:
         return 0
     streak, cur = 1, today
@@ -10,7 +13,7 @@ def current_streak(dates: Set[date], today: date) -> int:
         streak += 1
     return streak
 
-def best_streak(dates: Set[date]) -> int:
+def best_streak(dates: set[date]) -> int:
     if not dates:
         return 0
     s, seen = 0, set(dates)
@@ -21,3 +24,142 @@ def best_streak(dates: Set[date]) -> int:
                 run += 1
             s = max(s, run)
     return s
+
+def run_containing(dates: set[date], d: date) -> tuple[date, int]:
+    """Return the start and length of the run of consecutive days through d.
+
+    d itself is counted as logged even if it is not in dates.
+    """
+    start = d
+    while (prev := start - timedelta(days=1)) in dates:
+        start = prev
+    end = d
+    while (nxt := end + timedelta(days=1)) in dates:
+        end = nxt
+    return start, (end - start).days + 1
+
+
+class Segment(NamedTuple):
+    """Run summary of a stretch of history, e.g. one archived year of a habit."""
+    first: date
+    last: date
+    total: int  # entries
+    best: int
+    leading: int  # run starting at first
+    trailing: int  # run ending at last
+
+
+def segment_of(dates: Iterable[date]) -> Segment | None:
+    """Summarize a collection of entry dates, or None if it is empty."""
+    days = sorted(set(dates))
+    if not days:
+        return None
+    runs: list[int] = [1]
+    for prev, d in zip(days, days[1:], strict=False):
+        if (d - prev).days == 1:
+            runs[-1] += 1
+        else:
+            runs.append(1)
+    return Segment(days[0], days[-1], len(days), max(runs), runs[0], runs[-1])
+
+
+def fold_segments(segments: Iterable[Segment]) -> tuple[int, int, int, date | None]:
+    """Combine chronological, non-overlapping segments of one habit's history.
+
+    Runs that cross a segment boundary are joined. Returns (current, best,
+    count, last entry date), with current measured at the last entry, like
+    batch_streaks_by_habit.
+    """
+    best = count = trailing = 0
+    last: date | None = None
+    for seg in segments:
+        if last is not None and (seg.first - last).days == 1:
+            joined = trailing + seg.leading
+            best = max(best, joined)
+            # A segment that is one unbroken run extends the joined run to its end
+            trailing = joined if seg.leading == seg.total else seg.trailing
+        else:
+            trailing = seg.trailing
+        best = max(best, seg.best)
+        count += seg.total
+        last = seg.last
+    return trailing, best, count, last
+
+
+class BatchStreaks(NamedTuple):
+    """Per-habit results of batch_streaks, each an array indexed by habit position."""
+    current: np.ndarray
+    best: np.ndarray
+    total: np.ndarray  # entries
+    last: np.ndarray  # ordinal of the latest entry, 0 when there are none
+
+
+def batch_streaks(habit_index: np.ndarray, days: np.ndarray, n_habits: int,
+                  today: int | np.ndarray | None = None) -> BatchStreaks:
+    """Compute streaks for many habits in one vectorized pass.
+
+    habit_index[i] is the position (0..n_habits-1) of the habit that logged
+    ordinal day days[i]; duplicates are ignored. today is an ordinal, one
+    ordinal per habit, or None to measure each habit's current streak at its
+    own latest entry. Matches current_streak/best_streak per habit.
+    """
+    habit_index = np.asarray(habit_index, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    current = np.zeros(n_habits, dtype=np.int64)
+    best = np.zeros(n_habits, dtype=np.int64)
+    last = np.zeros(n_habits, dtype=np.int64)
+    if days.size == 0:
+        return BatchStreaks(current, best, np.zeros(n_habits, dtype=np.int64), last)
+
+    # Sort and dedupe (habit, day) pairs packed into one int64 key
+    keys = np.sort((habit_index << 32) | days)
+    keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    habit_index, days = keys >> 32, keys & 0xFFFFFFFF
+    new_habit = np.ones(days.size, dtype=bool)
+    new_habit[1:] = habit_index[1:] != habit_index[:-1]
+
+    # A run starts wherever the habit changes or the previous day is missing
+    run_starts = new_habit.copy()
+    run_starts[1:] |= np.diff(days) != 1
+    start_pos = np.flatnonzero(run_starts)
+    end_pos = np.append(start_pos[1:], days.size) - 1
+    run_habit = habit_index[start_pos]
+    run_first, run_last = days[start_pos], days[end_pos]
+
+    # Runs are grouped by habit, so per-habit maxima are segment reductions
+    count = np.bincount(habit_index, minlength=n_habits)
+    habit_pos = np.flatnonzero(new_habit[start_pos])
+    habits = run_habit[habit_pos]
+    best[habits] = np.maximum.reduceat(run_last - run_first + 1, habit_pos)
+    last[habits] = run_last[np.append(habit_pos[1:], run_habit.size) - 1]
+
+    at = last if today is None else np.broadcast_to(np.asarray(today, dtype=np.int64), (n_habits,))
+    at_run = at[run_habit]
+    hit = (run_first <= at_run) & (at_run <= run_last)
+    current[run_habit[hit]] = at_run[hit] - run_first[hit] + 1
+    return BatchStreaks(current, best, count, last)
+
+
+def batch_streaks_by_habit(dates_by_habit: Mapping[int, Iterable[date]], today: date | None = None
+                           ) -> dict[int, tuple[int, int, int, date | None]]:
+    """Run batch_streaks over date collections keyed by habit id.
+
+    Returns (current, best, count, last entry date) per habit id.
+    """
+    habit_ids = list(dates_by_habit)
+    index, days = [], []
+    for i, habit_id in enumerate(habit_ids):
+        ordinals = [d.toordinal() for d in dates_by_habit[habit_id]]
+        index.extend([i] * len(ordinals))
+        days.extend(ordinals)
+    res = batch_streaks(
+        np.array(index, dtype=np.int64),
+        np.array(days, dtype=np.int64),
+        len(habit_ids),
+        None if today is None else today.toordinal(),
+    )
+    return {
+        habit_id: (int(res.current[i]), int(res.best[i]), int(res.total[i]),
+                   date.fromordinal(int(res.last[i])) if res.total[i] else None)
+        for i, habit_id in enumerate(habit_ids)
+    }
@@ -12,6 +12,10 @@ const MONTH_NAMES = [
 
 const DAY_NAMES = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
 
+// The browser reuses past months for a few minutes (Cache-Control), so after
+// a save every month is requested under a new URL to skip the stored copies
+let lastSaved = 0
+
 function Calendar({ habit, onClose }) {
   const [calendarData, setCalendarData] = useState(null)
   const [loading, setLoading] = useState(true)
@@ -32,7 +36,8 @@ function Calendar({ habit, onClose }) {
       setLoading(true)
       setError(null)
       const response = await axios.get(
-        `${API_URL}/habits/${habit.id}/calendar?year=${currentDate.year}&month=${currentDate.month}`
+        `${API_URL}/habits/${habit.id}/calendar?year=${currentDate.year}&month=${currentDate.month}` +
+          (lastSaved ? `&saved=${lastSaved}` : '')
       )
       setCalendarData(response.data)
     } catch (err) {
@@ -74,6 +79,7 @@ function Calendar({ habit, onClose }) {
   }
 
   const handleJournalSave = () => {
+    lastSaved = Date.now()
     fetchCalendarData() // Refresh calendar after saving journal
   }
 
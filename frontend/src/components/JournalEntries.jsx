@@ -4,12 +4,15 @@ import JournalDialog from './JournalDialog'
 import './JournalEntries.css'
 
 const API_URL = import.meta.env.VITE_API_URL || (import.meta.env.DEV ? '/api' : 'http://localhost:8002')
+const PAGE_SIZE = 50
 
 function JournalEntries({ habit, onClose }) {
   const [entries, setEntries] = useState([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [selectedEntry, setSelectedEntry] = useState(null)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     fetchEntries()
@@ -19,8 +22,11 @@ function JournalEntries({ habit, onClose }) {
     try {
       setLoading(true)
       setError(null)
-      const response = await axios.get(`${API_URL}/habits/${habit.id}/entries`)
+      const response = await axios.get(`${API_URL}/habits/${habit.id}/entries`, {
+        params: { limit: PAGE_SIZE }
+      })
       setEntries(response.data)
+      setNextCursor(response.headers['x-next-cursor'] || null)
     } catch (err) {
       setError('Failed to load journal entries')
       console.error('Journal entries fetch error:', err)
@@ -29,6 +35,22 @@ function JournalEntries({ habit, onClose }) {
     }
   }
 
+  const fetchMoreEntries = async () => {
+    try {
+      setLoadingMore(true)
+      const response = await axios.get(`${API_URL}/habits/${habit.id}/entries`, {
+        params: { limit: PAGE_SIZE, before: nextCursor }
+      })
+      setEntries((previous) => [...previous, ...response.data])
+      setNextCursor(response.headers['x-next-cursor'] || null)
+    } catch (err) {
+      setError('Failed to load journal entries')
+      console.error('Journal entries fetch error:', err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const handleEntryClick = (entry) => {
     setSelectedEntry({ habit, date: entry.date })
   }
@@ -76,7 +98,7 @@ function JournalEntries({ habit, onClose }) {
           <div>
             <h3>{habit.name} - Journal Entries</h3>
             <p className="journal-entries-subtitle">
-              {entries.length} {entries.length === 1 ? 'entry' : 'entries'}
+              {entries.length}{nextCursor ? '+' : ''} {entries.length === 1 && !nextCursor ? 'entry' : 'entries'}
             </p>
           </div>
           <button className="journal-entries-close-btn" onClick={onClose}>✕</button>
@@ -120,6 +142,15 @@ function JournalEntries({ habit, onClose }) {
                     <div className="journal-entry-arrow">→</div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <button
+                    className="journal-entries-load-more"
+                    onClick={fetchMoreEntries}
+                    disabled={loadingMore}
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
             )}
           </div>
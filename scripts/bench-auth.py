@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the get_current_user dependency: a full JWT decode on every call
+against the decoded-token cache, for one polling client (the same token
+over and over) and for many clients (a distinct token each). A decode also
+looks the user up, here in an in-memory SQLite database:
+
+    python scripts/bench-auth.py [--calls 20000] [--tokens 1000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import token_cache
+from app.db import Base
+from app.dependencies import get_current_user
+from app.models import User
+from app.routers.auth import create_access_token
+
+REPEATS = 5
+
+
+def timed(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(db, tokens, calls, cached):
+    def once():
+        token_cache.clear()
+        for i in range(calls):
+            get_current_user(tokens[i % len(tokens)], db)
+            if not cached:
+                token_cache.clear()
+    return timed(once)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([User(id=n, username=f"user{n}", hashed_password="x") for n in range(1, args.tokens + 1)])
+    db.commit()
+
+    one = [create_access_token({"user_id": 1})]
+    many = [create_access_token({"user_id": n}) for n in range(1, args.tokens + 1)]
+    assert all(get_current_user(t, db) == n for n, t in enumerate(many, start=1))
+    print(f"📊 {args.calls} calls, token cache of {token_cache.max_entries} (best of {REPEATS})")
+
+    for label, tokens in (("1 token", one), (f"{len(many)} tokens", many)):
+        decode_time = run(db, tokens, args.calls, cached=False)
+        cached_time = run(db, tokens, args.calls, cached=True)
+        print(f"{label:>12}: decode {decode_time / args.calls * 1e6:7.2f} us/call, "
+              f"cached {cached_time / args.calls * 1e6:7.2f} us/call ({decode_time / cached_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite under concurrent reads and writes, default settings vs the
+tuned profile from app/db.py (WAL, synchronous=NORMAL, mmap, cache, busy
+timeout, plus a separate read-only pool for readers).
+
+Readers run GET /habits (HabitService.list_with_streaks) while writers log
+entries, each against a fresh temporary database:
+
+    python scripts/bench-sqlite-concurrency.py [--readers 8] [--writers 2] [--seconds 5]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, use_sqlite_profile
+from app.models import Entry, User
+from app.repositories.entries import SqlAlchemyEntryRepository
+from app.repositories.habits import SqlAlchemyHabitRepository
+from app.services.habits import HabitService
+
+USERS = 20
+HABITS_PER_USER = 10
+HISTORY_DAYS = 365
+
+
+def make_engines(path: Path, tuned: bool):
+    connect_args = {"check_same_thread": False}
+    engine = create_engine(f"sqlite:///{path}", connect_args=connect_args)
+    if not tuned:
+        return engine, engine
+    use_sqlite_profile(engine)
+    with engine.connect():
+        pass  # Switch the file to WAL before readers open it
+    read_engine = create_engine(f"sqlite:///file:{path}?mode=ro&uri=true", connect_args=connect_args)
+    use_sqlite_profile(read_engine, read_only=True)
+    return engine, read_engine
+
+
+def seed(engine, today: date):
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    for user_id in range(1, USERS + 1):
+        db.add(User(id=user_id, username=f"user{user_id}", hashed_password="x"))
+    db.commit()
+    habits = SqlAlchemyHabitRepository(db)
+    habit_ids = [habits.create(user_id, f"habit{n}", "daily").id
+                 for user_id in range(1, USERS + 1) for n in range(HABITS_PER_USER)]
+    db.add_all(Entry(habit_id=habit_id, date=today - timedelta(days=offset))
+               for habit_id in habit_ids for offset in range(HISTORY_DAYS, 0, -2))
+    db.commit()
+    SqlAlchemyEntryRepository(db).rebuild_streaks(habit_ids)
+    db.close()
+
+
+def run(tuned: bool, readers: int, writers: int, seconds: float):
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, read_engine = make_engines(Path(tmp) / "bench.db", tuned)
+        seed(engine, today)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        ReadSession = sessionmaker(bind=read_engine, autoflush=False)
+        stop = time.perf_counter() + seconds
+        read_latencies, write_latencies, errors = [], [], []
+        lock = threading.Lock()
+
+        def reader(worker: int):
+            while time.perf_counter() < stop:
+                db = ReadSession()
+                service = HabitService(SqlAlchemyHabitRepository(db), SqlAlchemyEntryRepository(db))
+                start = time.perf_counter()
+                try:
+                    service.list_with_streaks(worker % USERS + 1, today)
+                    with lock:
+                        read_latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    with lock:
+                        errors.append(type(e).__name__)
+                finally:
+                    db.close()
+
+        def writer(worker: int):
+            n = 0
+            while time.perf_counter() < stop:
+                db = Session()
+                service = HabitService(SqlAlchemyHabitRepository(db), SqlAlchemyEntryRepository(db))
+                habit_id = (worker * 7 + n) % (USERS * HABITS_PER_USER) + 1
+                user_id = (habit_id - 1) // HABITS_PER_USER + 1
+                start = time.perf_counter()
+                try:
+                    service.log_today(habit_id, user_id, today - timedelta(days=n % HISTORY_DAYS), "bench")
+                    with lock:
+                        write_latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(type(e).__name__)
+                finally:
+                    db.close()
+                n += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        engine.dispose()
+        read_engine.dispose()
+
+    def p95(values):
+        return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) >= 20 else float("nan")
+
+    label = "tuned  " if tuned else "default"
+    print(f"{label}: reads {len(read_latencies) / seconds:8.1f}/s (p95 {p95(read_latencies):7.2f} ms)  "
+          f"writes {len(write_latencies) / seconds:7.1f}/s (p95 {p95(write_latencies):7.2f} ms)  "
+          f"errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    print(f"📊 {args.readers} readers, {args.writers} writers, {args.seconds:g}s, "
+          f"{USERS} users x {HABITS_PER_USER} habits")
+    run(False, args.readers, args.writers, args.seconds)
+    run(True, args.readers, args.writers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
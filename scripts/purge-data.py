@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Run purge jobs in bounded batches: finish interrupted account deletions and,
+when ENTRY_RETENTION_DAYS is set, remove entries older than the retention
+period; when ENTRY_ARCHIVE_DAYS is set, move entries older than that to the
+archive table so the hot entries table stays small.
+
+Every batch commits with the job's progress, so the script can be stopped at
+any point and simply run again. Each batch also invalidates the app's cached
+habit lists and calendar months of what it removed, and a finished account
+deletion revokes the user's cached tokens; with the memory cache backend,
+these reach the app's processes only when CACHE_REDIS_URL is set. Schedule it (e.g. nightly) to enforce retention:
+
+    python scripts/purge-data.py
+    python scripts/purge-data.py --retention-days 3650 --archive-days 730
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.cache import calendar_cache, habit_list_cache, token_cache
+from app.config import settings
+from app.db import SessionLocal
+from app.repositories.purge import SqlAlchemyPurgeRepository
+from app.services.purge import PurgeService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=settings.ENTRY_RETENTION_DAYS,
+                        help="Delete entries older than this many days (default: ENTRY_RETENTION_DAYS)")
+    parser.add_argument("--archive-days", type=int, default=settings.ENTRY_ARCHIVE_DAYS,
+                        help="Archive entries older than this many days (default: ENTRY_ARCHIVE_DAYS)")
+    parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE,
+                        help="Rows deleted per transaction (default: PURGE_BATCH_SIZE)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    db = SessionLocal()
+    try:
+        service = PurgeService(SqlAlchemyPurgeRepository(db), habit_list_cache, calendar_cache, token_cache)
+        resumed = service.resume_pending(args.batch_size)
+        print(f"🔁 Finished {resumed} pending purge job(s)")
+        if args.retention_days is not None:
+            job = service.run(service.start_retention(args.retention_days), args.batch_size)
+            print(f"🧹 Removed {job.deleted_rows} entries before {job.cutoff.isoformat()}")
+        if args.archive_days is not None:
+            job = service.run(service.start_archive(args.archive_days), args.batch_size)
+            print(f"🗄️  Archived {job.deleted_rows} entries before {job.cutoff.isoformat()}")
+        print("✅ Purge complete")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
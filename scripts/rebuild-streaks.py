@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Rebuild materialized habit streak state (habit_streaks) and year bitmaps
+(habit_year_bitmaps) from entries.
+
+Run once after upgrading an existing database, or any time the table is
+suspected to be out of sync:
+
+    python scripts/rebuild-streaks.py
+"""
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db import SessionLocal
+from app.models import Habit
+from app.repositories.entries import SqlAlchemyEntryRepository
+
+BATCH_SIZE = 500
+
+
+def main():
+    db = SessionLocal()
+    try:
+        repo = SqlAlchemyEntryRepository(db)
+        habit_ids = [row.id for row in db.query(Habit.id).order_by(Habit.id)]
+        for i in range(0, len(habit_ids), BATCH_SIZE):
+            repo.rebuild_bitmaps(habit_ids[i:i + BATCH_SIZE])
+            repo.rebuild_streaks(habit_ids[i:i + BATCH_SIZE])
+            print(f"🔁 Rebuilt {min(i + BATCH_SIZE, len(habit_ids))}/{len(habit_ids)} habits")
+        print("✅ Streak state and bitmaps are up to date")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Refresh the daily rollups behind /business-metrics from entries and habits.
+
+The app does this itself every ROLLUP_REFRESH_SECONDS, catching up from the
+last rolled-up day (from the first activity on a fresh database) and always
+refreshing today and yesterday. Run it from cron instead with
+ROLLUP_REFRESH_SECONDS=0, and with --since after an import, backfill or purge
+rewrote older days:
+
+    python scripts/rollup-metrics.py
+    python scripts/rollup-metrics.py --days 7
+    python scripts/rollup-metrics.py --since 2024-01-01
+"""
+import argparse
+import logging
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db import SessionLocal
+from app.repositories.rollups import SqlAlchemyRollupRepository
+from app.services.rollups import RollupService
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--days", type=int, help="Refresh this many days up to today")
+    parser.add_argument(
+        "--since", type=date.fromisoformat, help="Refresh every day from this date (YYYY-MM-DD)"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    today = date.today()
+    db = SessionLocal()
+    try:
+        service = RollupService(SqlAlchemyRollupRepository(db))
+        if args.since or args.days:
+            days = service.refresh(args.since or today - timedelta(days=args.days - 1), today)
+        else:
+            days = service.catch_up(today)
+        print(f"✅ Rolled up {days} day(s); daily rollups are up to date")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
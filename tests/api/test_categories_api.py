@@ -242,6 +242,90 @@ class TestCategoriesAPI:
         habit_names = [h["name"] for h in data]
         assert habit1_name in habit_names
 
+    def test_create_and_update_habit_with_category_ids(self):
+        category_ids = [
+            client.post(
+                "/categories",
+                json={"name": unique_name("Assign"), "color": "#22c55e"},
+                headers=self.headers
+            ).json()["id"]
+            for _ in range(3)
+        ]
+
+        # Assign two categories while creating the habit
+        response = client.post(
+            "/habits",
+            json={
+                "name": unique_name("AssignHabit"),
+                "goal_type": "daily",
+                "category_ids": category_ids[:2],
+            },
+            headers=self.headers,
+        )
+        assert response.status_code == 200
+        habit_id = response.json()["id"]
+        assert sorted(c["id"] for c in response.json()["categories"]) == category_ids[:2]
+
+        # Replace the set on update
+        response = client.put(
+            f"/habits/{habit_id}",
+            json={"category_ids": category_ids[1:]},
+            headers=self.headers
+        )
+        assert response.status_code == 200
+        assert sorted(c["id"] for c in response.json()["categories"]) == category_ids[1:]
+
+        # Leaving category_ids out keeps the set
+        response = client.put(
+            f"/habits/{habit_id}", json={"name": unique_name("Renamed")}, headers=self.headers
+        )
+        assert sorted(c["id"] for c in response.json()["categories"]) == category_ids[1:]
+
+        filtered = client.get(f"/habits?category_id={category_ids[0]}", headers=self.headers).json()
+        assert habit_id not in [h["id"] for h in filtered]
+
+    def test_create_habit_with_foreign_category_ids(self):
+        other_headers = get_auth_headers()
+        foreign_id = client.post(
+            "/categories",
+            json={"name": unique_name("Foreign"), "color": "#22c55e"},
+            headers=other_headers
+        ).json()["id"]
+        habit_name = unique_name("ForeignHabit")
+
+        response = client.post(
+            "/habits",
+            json={"name": habit_name, "goal_type": "daily", "category_ids": [foreign_id]},
+            headers=self.headers
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Category not found"
+        # Nothing was created
+        habits = client.get("/habits", headers=self.headers).json()
+        assert habit_name not in [h["name"] for h in habits]
+
+    def test_delete_category_unlinks_habits(self):
+        category_id = client.post(
+            "/categories",
+            json={"name": unique_name("Doomed"), "color": "#22c55e"},
+            headers=self.headers
+        ).json()["id"]
+        habit_id = client.post(
+            "/habits",
+            json={
+                "name": unique_name("Survivor"),
+                "goal_type": "daily",
+                "category_ids": [category_id],
+            },
+            headers=self.headers,
+        ).json()["id"]
+
+        response = client.delete(f"/categories/{category_id}", headers=self.headers)
+        assert response.status_code == 200
+
+        habits = {h["id"]: h for h in client.get("/habits", headers=self.headers).json()}
+        assert habits[habit_id]["categories"] == []
+
     def test_unauthorized_access(self):
         response = client.get("/categories")
         assert response.status_code == 401
@@ -1,20 +1,45 @@
 """API tests for habit endpoints using TestClient."""
+import csv
+import io
+import json
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from app import dependencies
 from app.main import app
-from app.db import Base
-from app.routers import habits as habits_router
+from app.cache import backend as cache_backend, calendar_cache, habit_list_cache, token_cache
+from app.db import Base, use_sqlite_profile
 from app.routers import auth as auth_router
 from app.routers import monitoring as monitoring_router
-from datetime import date
+from app.routers import export as export_router
+from app.routers import imports as imports_router
+from datetime import date, timedelta
 
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+use_sqlite_profile(engine)
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
+# The same database through aiosqlite, for the async endpoints on an async pool
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+use_sqlite_profile(async_engine.sync_engine)
+AsyncTestingSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+def reset_caches():
+    cache_backend.clear()
+    token_cache.clear()
+    habit_list_cache.hits = habit_list_cache.misses = 0
+    calendar_cache.hits = calendar_cache.misses = 0
 
 
 def override_get_db():
@@ -30,14 +55,24 @@ def override_get_db():
 def test_client():
     """Create test client with clean database for each test."""
     Base.metadata.create_all(bind=engine)
+    # User ids repeat across tests' fresh databases
+    reset_caches()
     # Override get_db in all routers that define it
-    app.dependency_overrides[habits_router.get_db] = override_get_db
     app.dependency_overrides[auth_router.get_db] = override_get_db
+    # The async endpoints run on the same sync sessions, in the threadpool, the
+    # way they do on SQL Server (TestAsyncSessions covers the async pools)
+    app.dependency_overrides[dependencies.get_async_db] = override_get_db
+    app.dependency_overrides[dependencies.get_async_read_db] = override_get_db
+    app.dependency_overrides[auth_router.get_session_factory] = lambda: TestingSessionLocal
     app.dependency_overrides[monitoring_router.get_db] = override_get_db
+    app.dependency_overrides[monitoring_router.get_replica_db] = override_get_db
+    app.dependency_overrides[export_router.get_read_session_factory] = lambda: TestingSessionLocal
+    app.dependency_overrides[imports_router.get_db] = override_get_db
     client = TestClient(app)
     yield client
     Base.metadata.drop_all(bind=engine)
     app.dependency_overrides.clear()
+    reset_caches()
 
 
 @pytest.fixture
@@ -87,6 +122,144 @@ class TestRootEndpoint:
         assert "endpoints" in data
 
 
+class TestBusinessMetrics:
+    """Tests for the rollup-backed business metrics endpoints."""
+
+    def _refresh(self, start, end):
+        from app.repositories.rollups import SqlAlchemyRollupRepository
+        db = TestingSessionLocal()
+        try:
+            SqlAlchemyRollupRepository(db).refresh(start, end)
+        finally:
+            db.close()
+
+    def test_business_metrics_from_rollups(self, test_client, auth_headers):
+        """Should report the rolled-up totals without reading entries."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        items = [
+            {"habit_id": habit_id, "date": (today - timedelta(days=offset)).isoformat()}
+            for offset in range(3)
+        ]
+        items[0]["journal"] = "20 pages"
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        self._refresh(today - timedelta(days=2), today)
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = test_client.get("/business-metrics")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code == 200
+        data = response.json()["database"]
+        assert data["total_entries"] == 3
+        assert data["total_habits"] == 1
+        assert data["entries_today"] == 1
+        assert data["journals_today"] == 1
+        assert data["active_users_today"] == 1
+        assert not any("FROM entries" in s or "JOIN entries" in s for s in statements)
+
+    def test_total_entries_stays_exact(self, test_client, auth_headers):
+        """Should count backfills and deletions without a refresh, and habits without state."""
+        from app.models import HabitStreak
+        ids = [
+            test_client.post(
+                "/habits", json={"name": name, "goal_type": "daily"}, headers=auth_headers
+            ).json()["id"]
+            for name in ("Read", "Run")
+        ]
+        today = date.today()
+        items = [
+            {"habit_id": habit_id, "date": (today - timedelta(days=offset)).isoformat()}
+            for habit_id in ids
+            for offset in (0, 100, 400)
+        ]
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        self._refresh(today, today)
+
+        def total_entries():
+            return test_client.get("/business-metrics").json()["database"]["total_entries"]
+
+        assert total_entries() == 6
+        test_client.delete(f"/habits/{ids[1]}", headers=auth_headers)
+        assert total_entries() == 3
+        db = TestingSessionLocal()
+        try:
+            db.query(HabitStreak).delete()
+            db.commit()
+        finally:
+            db.close()
+        assert total_entries() == 3
+
+    def test_catch_up_starts_from_first_activity(self, test_client, auth_headers):
+        """A first catch-up should roll up every day since the oldest entry."""
+        from app.repositories.rollups import SqlAlchemyRollupRepository
+        from app.services.rollups import RollupService
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        old = today - timedelta(days=40)
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": old.isoformat()}, headers=auth_headers
+        )
+        db = TestingSessionLocal()
+        try:
+            assert RollupService(SqlAlchemyRollupRepository(db)).catch_up(today) == 41
+            # Later rounds refresh from the last rolled-up day
+            assert RollupService(SqlAlchemyRollupRepository(db)).catch_up(today) == 2
+        finally:
+            db.close()
+
+        days = test_client.get("/business-metrics/daily?days=41").json()["days"]
+        assert days[0]["date"] == old.isoformat() and days[0]["entries_logged"] == 1
+
+    def test_total_habits_counts_live_habits(self, test_client, auth_headers):
+        """Should count habits without a creation time, and stop counting deleted ones."""
+        from app.models import Habit
+
+        ids = [
+            test_client.post(
+                "/habits", json={"name": name, "goal_type": "daily"}, headers=auth_headers
+            ).json()["id"]
+            for name in ("Read", "Run")
+        ]
+        db = TestingSessionLocal()
+        try:
+            db.query(Habit).filter(Habit.id == ids[0]).update({Habit.created_at: None})
+            db.commit()
+        finally:
+            db.close()
+        self._refresh(date.today(), date.today())
+        assert test_client.get("/business-metrics").json()["database"]["total_habits"] == 2
+
+        test_client.delete(f"/habits/{ids[1]}", headers=auth_headers)
+        assert test_client.get("/business-metrics").json()["database"]["total_habits"] == 1
+
+    def test_daily_series_fills_missing_days(self, test_client, auth_headers):
+        """Should return one point per day, oldest first, with zeros for days not rolled up."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": today.isoformat()}, headers=auth_headers
+        )
+        self._refresh(today, today)
+
+        days = test_client.get("/business-metrics/daily?days=7").json()["days"]
+        assert [d["date"] for d in days] == [
+            (today - timedelta(days=6 - i)).isoformat() for i in range(7)
+        ]
+        assert days[-1]["entries_logged"] == 1
+        assert days[-1]["habits_created"] == 1
+        assert all(d["entries_logged"] == 0 for d in days[:-1])
+
+
 class TestCreateHabit:
     """Tests for POST /habits endpoint."""
 
@@ -181,12 +354,411 @@ class TestListHabits:
         assert habits[0]["name"] == "Exercise"
         assert habits[0]["streak"] == 1
 
+    def test_list_habits_query_count_independent_of_habit_count(self, test_client, auth_headers):
+        """Should build the list from a fixed number of queries."""
+        def count_list_queries():
+            statements = []
+
+            def record(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                response = test_client.get("/habits", headers=auth_headers)
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+            assert response.status_code == 200
+            return len(statements)
+
+        test_client.post(
+            "/habits", json={"name": "Habit 0", "goal_type": "daily"}, headers=auth_headers
+        )
+        baseline = count_list_queries()
+
+        for i in range(1, 6):
+            test_client.post(
+                "/habits", json={"name": f"Habit {i}", "goal_type": "daily"}, headers=auth_headers
+            )
+        assert count_list_queries() == baseline
+
+    def test_list_habits_best_streak_covers_full_history(self, test_client, auth_headers):
+        """Should count runs older than a year, with or without materialized state."""
+        from app.models import HabitStreak
+
+        create_response = test_client.post(
+            "/habits",
+            json={"name": "Exercise", "goal_type": "daily"},
+            headers=auth_headers
+        )
+        habit_id = create_response.json()["id"]
+        old = date.today() - timedelta(days=500)
+        for i in range(5):
+            test_client.post(
+                f"/habits/{habit_id}/entries",
+                json={"date": (old + timedelta(days=i)).isoformat()},
+                headers=auth_headers
+            )
+
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["best_streak"] == 5
+
+        # Without state rows the database computes streaks from entries
+        db = TestingSessionLocal()
+        db.query(HabitStreak).delete()
+        db.commit()
+        db.close()
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["streak"] == 0
+        assert habits[0]["best_streak"] == 5
+
+    def test_list_habits_paginated(self, test_client, auth_headers):
+        """Should page habits in creation order with a next cursor header."""
+        ids = [
+            test_client.post("/habits", json={"name": f"Habit {n}", "goal_type": "daily"},
+                             headers=auth_headers).json()["id"]
+            for n in range(5)
+        ]
+
+        first = test_client.get("/habits?limit=2", headers=auth_headers)
+        assert [h["id"] for h in first.json()] == ids[:2]
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = test_client.get(f"/habits?limit=2&after={cursor}", headers=auth_headers)
+        assert [h["id"] for h in second.json()] == ids[2:4]
+
+        last = test_client.get(
+            f"/habits?limit=2&after={second.headers['X-Next-Cursor']}", headers=auth_headers
+        )
+        assert [h["id"] for h in last.json()] == ids[4:]
+        assert "X-Next-Cursor" not in last.headers
+
     def test_list_habits_requires_auth(self, test_client):
         """Should require authentication."""
         response = test_client.get("/habits")
         assert response.status_code == 401
 
 
+class TestHabitListCache:
+    """Tests for the per-user GET /habits cache."""
+
+    def _statements(self, call):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = call()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code == 200, response.text
+        return response.json(), statements
+
+    def test_repeat_list_is_served_from_cache(self, test_client, auth_headers):
+        """Should answer a repeated GET /habits with only the version lookup."""
+        test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        )
+        first, statements = self._statements(
+            lambda: test_client.get("/habits", headers=auth_headers)
+        )
+        assert len(statements) > 1
+        again, statements = self._statements(
+            lambda: test_client.get("/habits", headers=auth_headers)
+        )
+        assert again == first
+        assert len(statements) == 1 and "FROM users" in statements[0]
+        assert habit_list_cache.hits == 1
+
+    def test_writes_invalidate(self, test_client, auth_headers):
+        """Should reflect habit, entry and category writes in the next GET /habits."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["streak"] == 0
+
+        test_client.post(f"/habits/{habit_id}/entries", json={"date": date.today().isoformat()},
+                         headers=auth_headers)
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["streak"] == 1
+
+        test_client.put(f"/habits/{habit_id}", json={"name": "Reading"}, headers=auth_headers)
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["name"] == "Reading"
+
+        category_id = test_client.post(
+            "/categories", json={"name": "Mind"}, headers=auth_headers
+        ).json()["id"]
+        test_client.post(f"/categories/{category_id}/habits/{habit_id}", headers=auth_headers)
+        assert [
+            c["id"]
+            for c in test_client.get("/habits", headers=auth_headers).json()[0]["categories"]
+        ] == [category_id]
+
+        test_client.delete(f"/habits/{habit_id}", headers=auth_headers)
+        assert test_client.get("/habits", headers=auth_headers).json() == []
+        assert habit_list_cache.hits == 0
+
+
+class TestCalendarCache:
+    """Tests for the calendar month cache and its Cache-Control headers."""
+
+    def _calendar(self, test_client, auth_headers, habit_id, d):
+        response = test_client.get(
+            f"/habits/{habit_id}/calendar?year={d.year}&month={d.month}", headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        return response
+
+    def _completed(self, response):
+        return [day["date"] for day in response.json()["days"] if day["completed"]]
+
+    def test_only_writes_in_the_month_recompute_it(self, test_client, auth_headers):
+        """Should keep a past month cached through today's logs, and recompute it on a backfill."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        past = today.replace(day=1) - timedelta(days=40)
+        self._calendar(test_client, auth_headers, habit_id, past)
+        self._calendar(test_client, auth_headers, habit_id, past)
+        assert (calendar_cache.hits, calendar_cache.misses) == (1, 1)
+
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": today.isoformat()}, headers=auth_headers
+        )
+        test_client.put(
+            f"/habits/{habit_id}/entries/{today.isoformat()}/journal",
+            json={"journal": "20 pages"},
+            headers=auth_headers,
+        )
+        assert self._completed(self._calendar(test_client, auth_headers, habit_id, past)) == []
+        assert self._completed(self._calendar(test_client, auth_headers, habit_id, today)) == [
+            today.isoformat()
+        ]
+        assert (calendar_cache.hits, calendar_cache.misses) == (2, 2)
+
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": past.isoformat()}, headers=auth_headers
+        )
+        assert self._completed(self._calendar(test_client, auth_headers, habit_id, past)) == [
+            past.isoformat()
+        ]
+        assert calendar_cache.misses == 3
+
+    def test_habit_changes_recompute(self, test_client, auth_headers):
+        """Should recompute months after a goal change, and not serve a deleted habit's."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        monday = date(2024, 1, 1)
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": monday.isoformat()}, headers=auth_headers
+        )
+        assert self._completed(self._calendar(test_client, auth_headers, habit_id, monday)) == [
+            "2024-01-01"
+        ]
+
+        test_client.put(f"/habits/{habit_id}", json={"goal_type": "weekly"}, headers=auth_headers)
+        assert self._completed(self._calendar(test_client, auth_headers, habit_id, monday)) == [
+            "2024-01-01"
+        ]
+        assert calendar_cache.misses == 2
+
+        test_client.delete(f"/habits/{habit_id}", headers=auth_headers)
+        response = test_client.get(
+            f"/habits/{habit_id}/calendar?year=2024&month=1", headers=auth_headers
+        )
+        assert response.status_code == 404
+        assert calendar_cache.hits == 0
+
+    def test_cache_control(self, test_client, auth_headers):
+        """Should let browsers reuse past months and revalidate the current one, 304s included."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        past = self._calendar(
+            test_client, auth_headers, habit_id, today.replace(day=1) - timedelta(days=40)
+        )
+        current = self._calendar(test_client, auth_headers, habit_id, today)
+        assert past.headers["Cache-Control"] == "private, max-age=300"
+        assert current.headers["Cache-Control"] == "private, no-cache"
+
+        response = test_client.get(
+            f"/habits/{habit_id}/calendar?year={today.year}&month={today.month}",
+            headers={**auth_headers, "If-None-Match": current.headers["ETag"]},
+        )
+        assert response.status_code == 304
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+class TestConditionalGets:
+    """Tests for ETag / If-None-Match on the read endpoints."""
+
+    def _get(self, test_client, url, headers, etag=None):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        if etag is not None:
+            headers = {**headers, "If-None-Match": etag}
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = test_client.get(url, headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return response, statements
+
+    def test_not_modified_until_a_write(self, test_client, auth_headers):
+        """Should answer 304 after one version lookup, and 200 with a new ETag after each write."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        urls = [
+            "/habits",
+            "/categories",
+            f"/habits/{habit_id}/stats?range=7d",
+            f"/habits/{habit_id}/calendar?year={today.year}&month={today.month}",
+            f"/habits/{habit_id}/entries",
+        ]
+        etags = {}
+        for url in urls:
+            response, _ = self._get(test_client, url, auth_headers)
+            assert response.status_code == 200, url
+            etags[url] = response.headers["ETag"]
+            response, statements = self._get(test_client, url, auth_headers, etags[url])
+            assert response.status_code == 304, url
+            assert response.content == b""
+            assert response.headers["ETag"] == etags[url]
+            assert len(statements) == 1, url
+        assert len(set(etags.values())) == len(urls)
+
+        writes = [
+            lambda: test_client.post(
+                f"/habits/{habit_id}/entries",
+                json={"date": today.isoformat()},
+                headers=auth_headers,
+            ),
+            lambda: test_client.put(
+                f"/habits/{habit_id}/entries/{today.isoformat()}/journal",
+                json={"journal": "20 pages"},
+                headers=auth_headers,
+            ),
+            lambda: test_client.put(
+                f"/habits/{habit_id}", json={"name": "Reading"}, headers=auth_headers
+            ),
+        ]
+        for write in writes:
+            assert write().status_code == 200
+            for url in (u for u in urls if u != "/categories"):
+                response, _ = self._get(test_client, url, auth_headers, etags[url])
+                assert response.status_code == 200, url
+                assert response.headers["ETag"] != etags[url]
+                etags[url] = response.headers["ETag"]
+
+        category_id = test_client.post(
+            "/categories", json={"name": "Mind"}, headers=auth_headers
+        ).json()["id"]
+        response, _ = self._get(test_client, "/categories", auth_headers, etags["/categories"])
+        assert response.status_code == 200
+        assert [c["id"] for c in response.json()] == [category_id]
+
+    def test_other_users_habit_not_found(self, test_client, auth_headers):
+        """Should not answer 304 for a habit the user does not own."""
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        url = f"/habits/{habit_id}/stats?range=7d"
+        etag = test_client.get(url, headers=auth_headers).headers["ETag"]
+
+        test_client.post("/auth/register", json={"username": "other", "password": "otherpass123"})
+        token = test_client.post(
+            "/token", data={"username": "other", "password": "otherpass123"}
+        ).json()["access_token"]
+        response, _ = self._get(test_client, url, {"Authorization": f"Bearer {token}"}, etag)
+        assert response.status_code == 404
+
+
+class TestWriteRoundTrips:
+    """Writes should not read anything back after they write."""
+
+    def _statements(self, call):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement.split()[0].upper())
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = call()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code in (200, 201), response.text
+        return response, statements
+
+    def test_no_select_after_write(self, test_client, auth_headers):
+        """Should build write responses without a SELECT after the write."""
+        response, statements = self._statements(lambda: test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers))
+        habit_id = response.json()["id"]
+        calls = [
+            lambda: test_client.post(
+                f"/habits/{habit_id}/entries", json={"date": "2024-01-01"}, headers=auth_headers
+            ),
+            lambda: test_client.put(
+                f"/habits/{habit_id}", json={"name": "Reading"}, headers=auth_headers
+            ),
+            lambda: test_client.put(
+                f"/habits/{habit_id}/entries/2024-01-01/journal",
+                json={"journal": "x"},
+                headers=auth_headers,
+            ),
+        ]
+        all_statements = [statements] + [self._statements(call)[1] for call in calls]
+        for statements in all_statements:
+            # Ownership/duplicate checks (and an entry's state lock and year bitmap) up front,
+            # then only writes
+            first_write = next(i for i, statement in enumerate(statements) if statement != "SELECT")
+            assert 1 <= first_write <= 3, statements
+            assert "SELECT" not in statements[first_write:], statements
+
+
+class TestDeleteHabit:
+    """Tests for DELETE /habits/{id} endpoint."""
+
+    def test_delete_habit_is_one_statement(self, test_client, auth_headers):
+        """Should delete the habit in one statement and let the database cascade."""
+        from app.models import Entry, HabitStreak
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        today = date.today()
+        for offset in range(30):
+            test_client.post(
+                f"/habits/{habit_id}/entries",
+                json={"date": (today - timedelta(days=offset)).isoformat()},
+                headers=auth_headers,
+            )
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement.split()[0].upper())
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = test_client.delete(f"/habits/{habit_id}", headers=auth_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert response.status_code == 200
+        # The cascade does the rest; the UPDATE bumps the owner's list version
+        assert statements == ["DELETE", "UPDATE"]
+
+        db = TestingSessionLocal()
+        try:
+            assert db.query(Entry).filter(Entry.habit_id == habit_id).count() == 0
+            assert db.get(HabitStreak, habit_id) is None
+        finally:
+            db.close()
+        assert test_client.delete(f"/habits/{habit_id}", headers=auth_headers).status_code == 404
+
+
 class TestLogEntry:
     """Tests for POST /habits/{id}/entries endpoint."""
 
@@ -235,6 +807,30 @@ class TestLogEntry:
         assert response1.status_code == 200
         assert response2.status_code == 200
 
+    def test_log_entry_again_updates_journal(self, test_client, auth_headers):
+        """Should keep one entry per day and only overwrite the journal when given."""
+        create_response = test_client.post(
+            "/habits",
+            json={"name": "Exercise", "goal_type": "daily"},
+            headers=auth_headers
+        )
+        habit_id = create_response.json()["id"]
+        today = date.today().isoformat()
+
+        for payload in (
+            {"date": today, "journal": "first"},
+            {"date": today, "journal": "second"},
+            {"date": today},
+        ):
+            response = test_client.post(
+                f"/habits/{habit_id}/entries", json=payload, headers=auth_headers
+            )
+            assert response.status_code == 200
+
+        entries = test_client.get(f"/habits/{habit_id}/entries", headers=auth_headers).json()
+        assert len(entries) == 1
+        assert entries[0]["journal"] == "second"
+
     def test_log_entry_nonexistent_habit(self, test_client, auth_headers):
         """Should return 404 when habit does not exist."""
         response = test_client.post(
@@ -336,7 +932,825 @@ class TestGetStats:
         assert len(today_entry) == 1
         assert today_entry[0]["done"] is True
 
+    def test_get_stats_after_backfill(self, test_client, auth_headers):
+        """Should keep streaks correct when a past gap is filled in."""
+        create_response = test_client.post(
+            "/habits",
+            json={"name": "Exercise", "goal_type": "daily"},
+            headers=auth_headers
+        )
+        habit_id = create_response.json()["id"]
+        today = date.today()
+
+        # Log today and two days ago, then backfill yesterday
+        for offset in (0, 2, 1):
+            test_client.post(
+                f"/habits/{habit_id}/entries",
+                json={"date": (today - timedelta(days=offset)).isoformat()},
+                headers=auth_headers
+            )
+
+        data = test_client.get(f"/habits/{habit_id}/stats?range=7d", headers=auth_headers).json()
+        assert data["current_streak"] == 3
+        assert data["best_streak"] == 3
+
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["streak"] == 3
+        assert habits[0]["best_streak"] == 3
+
     def test_get_stats_requires_auth(self, test_client):
         """Should require authentication."""
         response = test_client.get("/habits/1/stats?range=7d")
         assert response.status_code == 401
+
+
+class TestListEntries:
+    """Tests for GET /habits/{id}/entries endpoint."""
+
+    def test_list_entries_paginated_by_date(self, test_client, auth_headers):
+        """Should page entries newest first, using the last date as the cursor."""
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        today = date.today()
+        days = [(today - timedelta(days=offset)).isoformat() for offset in range(5)]
+        for day in days:
+            test_client.post(
+                f"/habits/{habit_id}/entries", json={"date": day}, headers=auth_headers
+            )
+
+        everything = test_client.get(f"/habits/{habit_id}/entries", headers=auth_headers)
+        assert [e["date"] for e in everything.json()] == days
+        assert "X-Next-Cursor" not in everything.headers
+
+        seen = []
+        url = f"/habits/{habit_id}/entries?limit=2"
+        while True:
+            page = test_client.get(url, headers=auth_headers)
+            assert page.status_code == 200
+            seen += [e["date"] for e in page.json()]
+            cursor = page.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            url = f"/habits/{habit_id}/entries?limit=2&before={cursor}"
+        assert seen == days
+
+    def test_per_habit_reads_are_single_queries(self, test_client, auth_headers):
+        """Should check ownership in the query that reads the data, besides the version lookup."""
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        today = date.today()
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": today.isoformat()}, headers=auth_headers
+        )
+
+        for url in (f"/habits/{habit_id}/entries",
+                    f"/habits/{habit_id}/entries/{today.isoformat()}",
+                    f"/habits/{habit_id}/calendar?year={today.year}&month={today.month}"):
+            statements = []
+
+            def record(conn, cursor, statement, *args, statements=statements):
+                statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                response = test_client.get(url, headers=auth_headers)
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+            assert response.status_code == 200, url
+            versioned = "/entries/" not in url
+            assert len(statements) == 1 + versioned, url
+
+    def test_calendar_reads_bitmaps(self, test_client, auth_headers):
+        """Should answer the calendar from the year bitmap without reading entry rows."""
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        days = ["2024-02-28", "2024-02-29", "2024-03-01"]
+        test_client.post(
+            "/entries/batch",
+            json={"items": [{"habit_id": habit_id, "date": d} for d in days]},
+            headers=auth_headers,
+        )
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = test_client.get(
+                f"/habits/{habit_id}/calendar?year=2024&month=2", headers=auth_headers
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        completed = [day["date"] for day in response.json()["days"] if day["completed"]]
+        assert completed == days[:2]
+        assert not any("FROM entries" in s or "JOIN entries" in s for s in statements), statements
+
+    def test_other_users_habit_not_found(self, test_client, auth_headers):
+        """Should 404 on another user's habit, and tell a missing entry from a missing habit."""
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        today = date.today().isoformat()
+        missing = test_client.get(f"/habits/{habit_id}/entries/{today}", headers=auth_headers)
+        assert missing.status_code == 404
+        assert missing.json()["detail"] == "Entry not found"
+
+        test_client.post("/auth/register", json={"username": "other", "password": "otherpass123"})
+        token = test_client.post(
+            "/token", data={"username": "other", "password": "otherpass123"}
+        ).json()["access_token"]
+        other = {"Authorization": f"Bearer {token}"}
+        for url in (f"/habits/{habit_id}/entries", f"/habits/{habit_id}/entries/{today}",
+                    f"/habits/{habit_id}/stats?range=7d"):
+            response = test_client.get(url, headers=other)
+            assert response.status_code == 404, url
+            assert response.json()["detail"] == "Habit not found"
+        assert test_client.delete(f"/habits/{habit_id}", headers=other).status_code == 404
+
+    def test_list_entries_rejects_bad_limit(self, test_client, auth_headers):
+        """Should validate the page size."""
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        response = test_client.get(f"/habits/{habit_id}/entries?limit=0", headers=auth_headers)
+        assert response.status_code == 422
+
+
+class TestExport:
+    """Tests for GET /export endpoint."""
+
+    def _seed(self, test_client, auth_headers):
+        habit_id = test_client.post(
+            "/habits", json={"name": "Read", "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+        today = date.today()
+        for offset, journal in ((1, "chapter 1"), (0, None)):
+            test_client.post(
+                f"/habits/{habit_id}/entries",
+                json={"date": (today - timedelta(days=offset)).isoformat(), "journal": journal},
+                headers=auth_headers
+            )
+        return habit_id, today
+
+    def test_export_ndjson(self, test_client, auth_headers):
+        """Should stream habits and entries, one JSON record per line."""
+        habit_id, today = self._seed(test_client, auth_headers)
+
+        response = test_client.get("/export", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records[0] == {"type": "habit", "id": habit_id, "name": "Read", "goal_type": "daily",
+                              "reminder_time": None, "category_ids": []}
+        assert records[1:] == [
+            {"type": "entry", "habit_id": habit_id,
+             "date": (today - timedelta(days=1)).isoformat(), "journal": "chapter 1"},
+            {"type": "entry", "habit_id": habit_id, "date": today.isoformat(), "journal": None},
+        ]
+
+    def test_export_csv(self, test_client, auth_headers):
+        """Should stream the same records as CSV rows."""
+        habit_id, today = self._seed(test_client, auth_headers)
+
+        response = test_client.get("/export?format=csv", headers=auth_headers)
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["type"] for row in rows] == ["habit", "entry", "entry"]
+        assert rows[1]["habit_id"] == str(habit_id)
+        assert rows[1]["journal"] == "chapter 1"
+        assert rows[2]["date"] == today.isoformat()
+
+    def test_export_only_own_data(self, test_client, auth_headers):
+        """Should not include other users' habits."""
+        self._seed(test_client, auth_headers)
+        test_client.post("/auth/register", json={"username": "other", "password": "otherpass123"})
+        token = test_client.post(
+            "/token", data={"username": "other", "password": "otherpass123"}
+        ).json()["access_token"]
+
+        response = test_client.get("/export", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.text == ""
+
+    def test_export_requires_auth(self, test_client):
+        """Should require authentication."""
+        response = test_client.get("/export")
+        assert response.status_code == 401
+
+
+class TestImport:
+    """Tests for POST /import endpoint."""
+
+    def _habit(self, test_client, auth_headers, name="Read"):
+        return test_client.post(
+            "/habits", json={"name": name, "goal_type": "daily"}, headers=auth_headers
+        ).json()["id"]
+
+    def test_import_ndjson(self, test_client, auth_headers):
+        """Should import rows by habit id or name, skip logged days and report bad rows."""
+        habit_id = self._habit(test_client, auth_headers)
+        today = date.today()
+        days = [(today - timedelta(days=offset)).isoformat() for offset in range(3)]
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": days[0]}, headers=auth_headers
+        )
+        lines = [
+            {"habit_id": habit_id, "date": days[0]},
+            {"habit_name": "Read", "date": days[1], "journal": "imported"},
+            {"habit_id": habit_id, "date": days[2]},
+            {"habit_name": "Unknown", "date": days[2]},
+            {"habit_id": habit_id, "date": "not-a-date"},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+
+        response = test_client.post(
+            "/import", files={"file": ("entries.ndjson", body)}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["imported"] == 2
+        assert report["duplicates"] == 1
+        assert report["error_count"] == 3
+        assert [e["line"] for e in report["errors"]] == [4, 5, 6]
+
+        entries = test_client.get(f"/habits/{habit_id}/entries", headers=auth_headers).json()
+        assert [e["date"] for e in entries] == days
+        assert entries[1]["journal"] == "imported"
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["streak"] == 3
+        assert habits[0]["best_streak"] == 3
+
+    def test_import_chunks_fold_into_state(self, test_client, auth_headers, monkeypatch):
+        """Each chunk should update streak state from the bitmaps, without rebuilding it."""
+        from app.repositories.entries import SqlAlchemyEntryRepository
+        from app.services import imports
+        monkeypatch.setattr(imports, "CHUNK_SIZE", 50)
+        rebuilt = []
+        rebuild_states = SqlAlchemyEntryRepository._rebuild_states
+        monkeypatch.setattr(
+            SqlAlchemyEntryRepository, "_rebuild_states",
+            lambda self, habit_ids: rebuilt.append(habit_ids) or rebuild_states(self, habit_ids),
+        )
+        habit_id = self._habit(test_client, auth_headers)
+        today = date.today()
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": today.isoformat()}, headers=auth_headers
+        )
+        # Two years of history, oldest first, with a gap every 100 days
+        start = today - timedelta(days=730)
+        days = [start + timedelta(days=i) for i in range(720) if i % 100 != 99]
+        body = "".join(json.dumps({"habit_id": habit_id, "date": d.isoformat()}) + "\n"
+                       for d in days)
+
+        report = test_client.post(
+            "/import", files={"file": ("entries.ndjson", body)}, headers=auth_headers
+        ).json()
+        assert report["imported"] == len(days)
+        assert rebuilt == []
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert (habits[0]["streak"], habits[0]["best_streak"]) == (1, 99)
+
+    def test_import_csv_is_idempotent(self, test_client, auth_headers):
+        """Should read CSV and count a second upload as duplicates."""
+        self._habit(test_client, auth_headers)
+        body = "habit_name,date,journal\nRead,2024-01-01,first\nRead,2024-01-02,\n"
+
+        first = test_client.post(
+            "/import", files={"file": ("entries.csv", body)}, headers=auth_headers
+        ).json()
+        assert (first["imported"], first["duplicates"], first["error_count"]) == (2, 0, 0)
+        second = test_client.post(
+            "/import", files={"file": ("entries.csv", body)}, headers=auth_headers
+        ).json()
+        assert (second["imported"], second["duplicates"]) == (0, 2)
+
+    def test_import_export_round_trip(self, test_client, auth_headers):
+        """Should accept an export file, skipping the non-entry records."""
+        habit_id = self._habit(test_client, auth_headers)
+        test_client.post(f"/habits/{habit_id}/entries", json={"date": "2024-03-01", "journal": "x"},
+                         headers=auth_headers)
+        exported = test_client.get("/export", headers=auth_headers).text
+
+        report = test_client.post(
+            "/import", files={"file": ("streaky-export.ndjson", exported)}, headers=auth_headers
+        ).json()
+        assert (report["imported"], report["duplicates"], report["error_count"]) == (0, 1, 0)
+
+    def test_import_other_users_habit(self, test_client, auth_headers):
+        """Should refuse rows for habits the user does not own."""
+        habit_id = self._habit(test_client, auth_headers)
+        test_client.post("/auth/register", json={"username": "other", "password": "otherpass123"})
+        token = test_client.post(
+            "/token", data={"username": "other", "password": "otherpass123"}
+        ).json()["access_token"]
+
+        body = json.dumps({"habit_id": habit_id, "date": "2024-01-01"})
+        report = test_client.post(
+            "/import",
+            files={"file": ("entries.ndjson", body)},
+            headers={"Authorization": f"Bearer {token}"},
+        ).json()
+        assert report["imported"] == 0
+        assert report["errors"] == [{"line": 1, "error": f"habit not found: {habit_id}"}]
+
+    def test_import_reports_malformed_rows(self, test_client, auth_headers):
+        """Should report undecodable and mistyped rows by line and import the rest."""
+        habit_id = self._habit(test_client, auth_headers)
+        body = b"\n".join([
+            b'{"habit_id": %d, "date": "2024-01-01"}' % habit_id,
+            b'{"habit_id": %d, "date": "2024-01-02", "journal": "caf\xe9"}' % habit_id,
+            b'{"habit_id": 1.5, "date": "2024-01-03"}',
+            b'{"habit_id": %d, "date": "2024-01-04", "journal": 5}' % habit_id,
+            b'{"habit_id": %d, "date": "2024-01-05"}' % habit_id,
+        ])
+
+        response = test_client.post(
+            "/import", files={"file": ("entries.ndjson", body)}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["imported"] == 2
+        assert [e["line"] for e in report["errors"]] == [2, 3, 4]
+
+    def test_import_csv_oversized_field(self, test_client, auth_headers):
+        """Should stop at a field over the CSV limit and keep the rows before it."""
+        self._habit(test_client, auth_headers)
+        body = f"habit_name,date,journal\nRead,2024-01-01,\nRead,2024-01-02,{'x' * 200_000}\n"
+
+        response = test_client.post(
+            "/import", files={"file": ("entries.csv", body)}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        report = response.json()
+        assert report["imported"] == 1
+        assert [e["line"] for e in report["errors"]] == [3]
+
+
+class TestBatchLog:
+    """Tests for POST /entries/batch endpoint."""
+
+    def test_batch_log(self, test_client, auth_headers):
+        """Should log several habits and days in one request."""
+        ids = [
+            test_client.post(
+                "/habits", json={"name": name, "goal_type": "daily"}, headers=auth_headers
+            ).json()["id"]
+            for name in ("Exercise", "Read")
+        ]
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        items = [
+            {"habit_id": ids[0], "date": today.isoformat()},
+            {"habit_id": ids[1], "date": today.isoformat(), "journal": "50 pages"},
+            {"habit_id": ids[0], "date": yesterday.isoformat()},
+        ]
+
+        response = test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == {"ok": True, "logged": 3}
+
+        habits = {h["id"]: h for h in test_client.get("/habits", headers=auth_headers).json()}
+        assert habits[ids[0]]["streak"] == 2
+        assert habits[ids[1]]["streak"] == 1
+        entry = test_client.get(
+            f"/habits/{ids[1]}/entries/{today.isoformat()}", headers=auth_headers
+        ).json()
+        assert entry["journal"] == "50 pages"
+
+    def test_batch_log_with_foreign_habit_logs_nothing(self, test_client, auth_headers):
+        """Should return 404 and roll back everything if any habit is not the user's."""
+        mine = test_client.post("/habits", json={"name": "Exercise", "goal_type": "daily"},
+                                headers=auth_headers).json()["id"]
+        items = [{"habit_id": mine, "date": date.today().isoformat()},
+                 {"habit_id": 9999, "date": date.today().isoformat()}]
+
+        response = test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        assert response.status_code == 404
+        assert test_client.get(f"/habits/{mine}/entries", headers=auth_headers).json() == []
+
+    def test_batch_log_rejects_empty(self, test_client, auth_headers):
+        """Should require at least one item."""
+        response = test_client.post("/entries/batch", json={"items": []}, headers=auth_headers)
+        assert response.status_code == 422
+
+
+class TestDeleteAccount:
+    """Tests for DELETE /auth/me and the purge jobs behind it."""
+
+    def _seed(self, test_client, auth_headers, days=10):
+        habit_ids = [
+            test_client.post(
+                "/habits", json={"name": name, "goal_type": "daily"}, headers=auth_headers
+            ).json()["id"]
+            for name in ("Exercise", "Read")
+        ]
+        today = date.today()
+        items = [{"habit_id": habit_id, "date": (today - timedelta(days=offset)).isoformat()}
+                 for habit_id in habit_ids for offset in range(days)]
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        return habit_ids
+
+    def test_delete_account_removes_everything(self, test_client, auth_headers):
+        """Should delete the user's entries, habits, categories and the user."""
+        from app.models import Category, Entry, Habit, PurgeJob, User
+        self._seed(test_client, auth_headers)
+        db = TestingSessionLocal()
+        db.add(Category(user_id=1, name="Health", color="#22c55e"))
+        db.commit()
+        db.close()
+
+        response = test_client.delete("/auth/me", headers=auth_headers)
+        assert response.status_code == 202
+        assert response.json()["stage"] == "entries"
+
+        db = TestingSessionLocal()
+        try:
+            for model in (Entry, Habit, Category, User):
+                assert db.query(model).count() == 0
+            job = db.query(PurgeJob).one()
+            assert job.stage == "done" and job.finished_at is not None
+            # 20 entries, 2 habits, 1 category, the user
+            assert job.deleted_rows == 24
+        finally:
+            db.close()
+        login = test_client.post("/token", data={"username": "testuser", "password": "testpass"})
+        assert login.status_code == 401
+
+    def test_deleted_users_token_rejected(self, test_client, auth_headers):
+        """A deleted account's token should not pass as the next user to register."""
+        assert test_client.get("/habits", headers=auth_headers).status_code == 200
+        assert test_client.delete("/auth/me", headers=auth_headers).status_code == 202
+
+        test_client.post("/auth/register", json={"username": "other", "password": "otherpass123"})
+        token = test_client.post(
+            "/token", data={"username": "other", "password": "otherpass123"}
+        ).json()["access_token"]
+        other_headers = {"Authorization": f"Bearer {token}"}
+        test_client.post(
+            "/habits", json={"name": "Theirs", "goal_type": "daily"}, headers=other_headers
+        )
+
+        response = test_client.get("/habits", headers=auth_headers)
+        assert response.status_code == 401
+        assert [h["name"] for h in test_client.get("/habits", headers=other_headers).json()] == [
+            "Theirs"
+        ]
+
+    def test_token_rejected_once_deletion_queued(self, test_client, auth_headers):
+        """Should reject the account's tokens, cached or not, while its purge is pending."""
+        from app.repositories.purge import SqlAlchemyPurgeRepository
+        from app.services.purge import PurgeService
+        assert test_client.get("/habits", headers=auth_headers).status_code == 200
+        db = TestingSessionLocal()
+        try:
+            service = PurgeService(SqlAlchemyPurgeRepository(db), token_cache=token_cache)
+            service.start_account_deletion(1)
+        finally:
+            db.close()
+
+        assert test_client.get("/habits", headers=auth_headers).status_code == 401
+        token_cache.clear()
+        assert test_client.get("/habits", headers=auth_headers).status_code == 401
+
+    def test_interrupted_purge_resumes(self, test_client, auth_headers):
+        """Should pick an interrupted job up at its last committed batch."""
+        from app.models import Entry
+        from app.repositories.purge import SqlAlchemyPurgeRepository
+        from app.services.purge import PurgeService
+        self._seed(test_client, auth_headers)
+
+        db = TestingSessionLocal()
+        service = PurgeService(SqlAlchemyPurgeRepository(db))
+        job = service.start_account_deletion(1)
+        for _ in range(3):
+            service.step(job, batch_size=4)
+        db.close()
+
+        db = TestingSessionLocal()
+        try:
+            assert db.query(Entry).count() == 8
+            service = PurgeService(SqlAlchemyPurgeRepository(db))
+            assert service.resume_pending(batch_size=4) == 1
+            assert db.query(Entry).count() == 0
+            assert service.resume_pending(batch_size=4) == 0
+        finally:
+            db.close()
+
+    def test_retention_purge_rebuilds_streaks(self, test_client, auth_headers):
+        """Should delete only entries before the cutoff and keep streak state in step."""
+        from app.repositories.purge import SqlAlchemyPurgeRepository
+        from app.services.purge import PurgeService
+        habit_ids = self._seed(test_client, auth_headers)
+
+        db = TestingSessionLocal()
+        try:
+            service = PurgeService(SqlAlchemyPurgeRepository(db))
+            job = service.run(service.start_retention(retention_days=3), batch_size=3)
+            assert job.deleted_rows == 12
+        finally:
+            db.close()
+
+        habits = {h["id"]: h for h in test_client.get("/habits", headers=auth_headers).json()}
+        assert habits[habit_ids[0]]["streak"] == 4
+        assert habits[habit_ids[0]]["best_streak"] == 4
+        assert (
+            len(test_client.get(f"/habits/{habit_ids[1]}/entries", headers=auth_headers).json())
+            == 4
+        )
+
+    def test_retention_purge_invalidates_caches(self, test_client, auth_headers):
+        """Should drop the cached habit list and calendar months a retention purge changed."""
+        from app.repositories.purge import SqlAlchemyPurgeRepository
+        from app.services.purge import PurgeService
+        habit_ids = self._seed(test_client, auth_headers)
+        oldest = date.today() - timedelta(days=9)
+        calendar = f"/habits/{habit_ids[0]}/calendar?year={oldest.year}&month={oldest.month}"
+        assert oldest.isoformat() in {
+            d["date"]
+            for d in test_client.get(calendar, headers=auth_headers).json()["days"]
+            if d["completed"]
+        }
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["best_streak"] == 10
+
+        db = TestingSessionLocal()
+        try:
+            service = PurgeService(SqlAlchemyPurgeRepository(db), habit_list_cache, calendar_cache)
+            service.run(service.start_retention(retention_days=3), batch_size=3)
+        finally:
+            db.close()
+
+        cutoff = (date.today() - timedelta(days=3)).isoformat()
+        days = test_client.get(calendar, headers=auth_headers).json()["days"]
+        assert all(d["date"] >= cutoff for d in days if d["completed"])
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["best_streak"] == 4
+
+    def test_forget_days_patches_state_like_a_rebuild(self, test_client, auth_headers):
+        """Deleting days should leave the same state as a rebuild, with or without the best run."""
+        from app.models import Entry, HabitStreak
+        from app.repositories.entries import SqlAlchemyEntryRepository
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        # A best run of 10 a month ago, then a current run of 5
+        offsets = list(range(30, 40)) + list(range(5))
+        items = [{"habit_id": habit_id, "date": (today - timedelta(days=offset)).isoformat()}
+                 for offset in offsets]
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+
+        def state(s):
+            return (s.current_run_start, s.current_run_length, s.best_run_length,
+                    s.last_entry_date, s.total_count)
+
+        for deleted in ([today, today - timedelta(days=2)], [today - timedelta(days=35)]):
+            db = TestingSessionLocal()
+            try:
+                db.query(Entry).filter(Entry.date.in_(deleted)).delete()
+                repo = SqlAlchemyEntryRepository(db)
+                repo.forget_days((habit_id, d) for d in deleted)
+                patched = state(db.get(HabitStreak, habit_id))
+                repo.rebuild_streaks([habit_id])
+                assert patched == state(db.get(HabitStreak, habit_id))
+            finally:
+                db.close()
+        assert patched == (today - timedelta(days=1), 1, 5, today - timedelta(days=1), 12)
+
+
+class TestArchive:
+    """Tests for moving old entries to the archive table."""
+
+    def _archive(self, archive_days, batch_size=7):
+        from app.repositories.purge import SqlAlchemyPurgeRepository
+        from app.services.purge import PurgeService
+        db = TestingSessionLocal()
+        try:
+            service = PurgeService(SqlAlchemyPurgeRepository(db))
+            return service.run(service.start_archive(archive_days), batch_size)
+        finally:
+            db.close()
+
+    def _seed(self, test_client, auth_headers, days=60):
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        today = date.today()
+        items = [{"habit_id": habit_id, "date": (today - timedelta(days=offset)).isoformat()}
+                 for offset in range(days) if offset != 45]
+        items[-1]["journal"] = "the first day"
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        return habit_id
+
+    def test_archived_history_still_answers(self, test_client, auth_headers):
+        """Streaks, calendar, entries and export should look the same after archiving."""
+        from app.models import Entry, EntryArchive, EntryYearSummary
+        habit_id = self._seed(test_client, auth_headers)
+        before = test_client.get("/habits", headers=auth_headers).json()
+        oldest = date.today() - timedelta(days=59)
+        calendar = f"/habits/{habit_id}/calendar?year={oldest.year}&month={oldest.month}"
+        calendar_before = test_client.get(calendar, headers=auth_headers).json()
+
+        job = self._archive(archive_days=20)
+        assert job.deleted_rows == 38
+        db = TestingSessionLocal()
+        try:
+            assert db.query(Entry).count() == 21
+            assert db.query(EntryArchive).count() == 38
+            assert sum(s.entry_count for s in db.query(EntryYearSummary)) == 38
+        finally:
+            db.close()
+
+        assert test_client.get("/habits", headers=auth_headers).json() == before
+        assert test_client.get(calendar, headers=auth_headers).json() == calendar_before
+        entries = test_client.get(f"/habits/{habit_id}/entries", headers=auth_headers).json()
+        assert len(entries) == 59
+        assert entries[-1]["journal"] == "the first day"
+        page = test_client.get(f"/habits/{habit_id}/entries?limit=25", headers=auth_headers)
+        assert len(page.json()) == 25 and page.headers["X-Next-Cursor"]
+        exported = test_client.get("/export", headers=auth_headers).text.splitlines()
+        assert sum('"type": "entry"' in line for line in exported) == 59
+
+    def test_streaks_without_state_span_the_archive(self, test_client, auth_headers):
+        """The islands query should find runs across hot and archived entries."""
+        from app.models import HabitStreak
+        self._seed(test_client, auth_headers)
+        before = test_client.get("/habits", headers=auth_headers).json()
+        self._archive(archive_days=20)
+
+        db = TestingSessionLocal()
+        db.query(HabitStreak).delete()
+        db.commit()
+        db.close()
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert (habits[0]["streak"], habits[0]["best_streak"]) == (45, 45)
+        assert habits == before
+
+    def test_writes_to_archived_days(self, test_client, auth_headers):
+        """Backfills and journal edits before the horizon should land in the archive."""
+        from app.models import Entry, EntryArchive
+        habit_id = self._seed(test_client, auth_headers)
+        self._archive(archive_days=20)
+        gap = date.today() - timedelta(days=45)
+        first = date.today() - timedelta(days=59)
+
+        test_client.post(
+            "/entries/batch",
+            json={"items": [{"habit_id": habit_id, "date": gap.isoformat()}]},
+            headers=auth_headers,
+        )
+        response = test_client.put(
+            f"/habits/{habit_id}/entries/{first.isoformat()}/journal",
+            json={"journal": "edited"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert test_client.get(f"/habits/{habit_id}/entries/{first.isoformat()}",
+                               headers=auth_headers).json()["journal"] == "edited"
+
+        db = TestingSessionLocal()
+        try:
+            assert db.query(Entry).count() == 21
+            assert db.query(EntryArchive).count() == 39
+        finally:
+            db.close()
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["streak"] == 60
+        assert habits[0]["best_streak"] == 60
+
+
+class TestUndrawnBitmaps:
+    """Tests for databases whose year bitmaps were never backfilled."""
+
+    def test_years_without_bitmaps_read_entries(self, test_client, auth_headers):
+        """Calendars, stats and streaks should see entries whose year has no bitmap yet."""
+        from app.models import HabitYearBitmap
+        from app.utils.daybits import days_of
+        habit_id = test_client.post("/habits", json={"name": "Read", "goal_type": "daily"},
+                                    headers=auth_headers).json()["id"]
+        first = date(date.today().year - 1, 3, 1)
+        yesterday = date.today() - timedelta(days=1)
+        items = [{"habit_id": habit_id, "date": (first + timedelta(days=i)).isoformat()}
+                 for i in range(10)]
+        items.append({"habit_id": habit_id, "date": yesterday.isoformat()})
+        test_client.post("/entries/batch", json={"items": items}, headers=auth_headers)
+        # As after upgrading past the bitmaps migration, before rebuild-streaks.py
+        db = TestingSessionLocal()
+        db.query(HabitYearBitmap).delete()
+        db.commit()
+        db.close()
+        reset_caches()
+
+        calendar = f"/habits/{habit_id}/calendar?year={first.year}&month=3"
+        days = test_client.get(calendar, headers=auth_headers).json()["days"]
+        assert sum(d["completed"] for d in days) == 10
+        stats = test_client.get(f"/habits/{habit_id}/stats?range=7d", headers=auth_headers).json()
+        assert [d["date"] for d in stats["days"] if d["done"]] == [yesterday.isoformat()]
+
+        # The first write to the year draws its bitmap from the entries
+        backfill = first - timedelta(days=1)
+        test_client.post(
+            f"/habits/{habit_id}/entries", json={"date": backfill.isoformat()}, headers=auth_headers
+        )
+        days = test_client.get(calendar, headers=auth_headers).json()["days"]
+        assert sum(d["completed"] for d in days) == 10
+        db = TestingSessionLocal()
+        try:
+            bitmap = db.get(HabitYearBitmap, (habit_id, first.year))
+            assert len(days_of(first.year, bitmap.days)) == 11
+        finally:
+            db.close()
+        assert test_client.get("/habits", headers=auth_headers).json()[0]["best_streak"] == 11
+
+
+class TestAsyncSessions:
+    """The habit and category endpoints on an AsyncSession, as with aiosqlite or asyncpg."""
+
+    @pytest.fixture(autouse=True)
+    def async_sessions(self, test_client, monkeypatch):
+        async def override_get_async_db():
+            async with AsyncTestingSessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[dependencies.get_async_db] = override_get_async_db
+        app.dependency_overrides[dependencies.get_async_read_db] = override_get_async_db
+
+        def threadpool_hop(*args):
+            raise AssertionError("database call sent to the threadpool")
+
+        # Every database call must be awaited on the event loop, none sent to a thread
+        monkeypatch.setattr("app.db.to_thread", SimpleNamespace(run_sync=threadpool_hop))
+
+    def test_habit_endpoints(self, test_client, auth_headers):
+        """Should serve habits, entries and categories without a threadpool hop."""
+        category = test_client.post(
+            "/categories", json={"name": "Health"}, headers=auth_headers
+        ).json()
+        created = test_client.post(
+            "/habits",
+            json={"name": "Run", "goal_type": "daily", "category_ids": [category["id"]]},
+            headers=auth_headers,
+        )
+        assert created.status_code == 200
+        assert created.json()["categories"][0]["name"] == "Health"
+        habit_id = created.json()["id"]
+
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        test_client.post(
+            f"/habits/{habit_id}/entries",
+            json={"date": today.isoformat(), "journal": "5k"},
+            headers=auth_headers,
+        )
+        test_client.post(
+            "/entries/batch",
+            json={"items": [{"habit_id": habit_id, "date": yesterday.isoformat()}]},
+            headers=auth_headers,
+        )
+
+        habits = test_client.get("/habits", headers=auth_headers).json()
+        assert habits[0]["streak"] == 2
+        assert habits[0]["categories"] == [
+            {"id": category["id"], "name": "Health", "color": category["color"]}
+        ]
+        stats = test_client.get(f"/habits/{habit_id}/stats?range=7d", headers=auth_headers)
+        assert stats.json()["current_streak"] == 2
+        calendar = test_client.get(
+            f"/habits/{habit_id}/calendar?year={today.year}&month={today.month}",
+            headers=auth_headers,
+        )
+        assert calendar.status_code == 200
+        entry = test_client.get(
+            f"/habits/{habit_id}/entries/{today.isoformat()}", headers=auth_headers
+        )
+        assert entry.json()["journal"] == "5k"
+        updated = test_client.put(
+            f"/habits/{habit_id}/entries/{today.isoformat()}/journal",
+            json={"journal": "10k"},
+            headers=auth_headers,
+        )
+        assert updated.json()["journal"] == "10k"
+        entries = test_client.get(f"/habits/{habit_id}/entries", headers=auth_headers).json()
+        assert [e["date"] for e in entries] == [today.isoformat(), yesterday.isoformat()]
+
+        renamed = test_client.put(
+            f"/habits/{habit_id}", json={"name": "Long run"}, headers=auth_headers
+        )
+        assert renamed.json()["name"] == "Long run"
+        assert renamed.json()["categories"][0]["id"] == category["id"]
+        removed = test_client.delete(
+            f"/categories/{category['id']}/habits/{habit_id}", headers=auth_headers
+        )
+        assert removed.status_code == 200
+        assert test_client.delete(f"/habits/{habit_id}", headers=auth_headers).status_code == 200
+        assert test_client.get("/habits", headers=auth_headers).json() == []
+        assert [c["name"] for c in test_client.get("/categories", headers=auth_headers).json()] == [
+            "Health"
+        ]
+
+    def test_unknown_token_rejected(self, test_client):
+        """Should look up an uncached token's user on the AsyncSession."""
+        from app.routers.auth import create_access_token
+        headers = {"Authorization": f"Bearer {create_access_token({'user_id': 999})}"}
+        assert test_client.get("/habits", headers=headers).status_code == 401
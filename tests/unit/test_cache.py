@@ -0,0 +1,267 @@
+"""Unit tests for the cache backends, the per-user result cache and the decoded-token cache."""
+import time
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import dependencies
+from app.cache import CalendarCache, MemoryBackend, RedisBackend, UserCache, token_cache
+from app.config import settings
+from app.db import Base
+from app.models import User
+
+
+def _memory_cache(ttl_seconds=60, max_entries=10):
+    return UserCache("test", MemoryBackend(max_entries), ttl_seconds)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestUserCache:
+    """Tests for UserCache on the in-process backend."""
+
+    def test_hit_after_miss(self):
+        """Should compute once and then serve the stored result."""
+        cache = _memory_cache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return "value"
+
+        assert cache.get_or_compute(1, ("k",), compute) == "value"
+        assert cache.get_or_compute(1, ("k",), compute) == "value"
+        assert len(calls) == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_invalidate_is_per_user(self):
+        """Should recompute only the invalidated user's results."""
+        cache = _memory_cache()
+        cache.get_or_compute(1, ("k",), lambda: "a")
+        cache.get_or_compute(2, ("k",), lambda: "b")
+        cache.invalidate(1)
+        assert cache.get_or_compute(1, ("k",), lambda: "a2") == "a2"
+        assert cache.get_or_compute(2, ("k",), lambda: "b2") == "b"
+
+    def test_result_read_before_a_write_is_not_served_after_it(self):
+        """A result computed across an invalidation should not be served afterwards."""
+        cache = _memory_cache()
+
+        def compute_during_write():
+            cache.invalidate(1)
+            return "stale"
+
+        assert cache.get_or_compute(1, ("k",), compute_during_write) == "stale"
+        assert cache.get_or_compute(1, ("k",), lambda: "fresh") == "fresh"
+
+    def test_expires_after_ttl(self):
+        """Should recompute once the stored result is older than the TTL."""
+        cache = _memory_cache(ttl_seconds=30)
+        with patch("time.monotonic", return_value=100.0):
+            cache.get_or_compute(1, ("k",), lambda: "old")
+        with patch("time.monotonic", return_value=131.0):
+            assert cache.get_or_compute(1, ("k",), lambda: "new") == "new"
+
+    def test_evicts_least_recently_used(self):
+        """Should drop the least recently used result beyond max_entries."""
+        cache = _memory_cache(max_entries=2)
+        cache.get_or_compute(1, ("a",), lambda: "a")
+        cache.get_or_compute(1, ("b",), lambda: "b")
+        cache.get_or_compute(1, ("a",), lambda: "unused")
+        cache.get_or_compute(1, ("c",), lambda: "c")
+        assert cache.get_or_compute(1, ("a",), lambda: "a2") == "a"
+        assert cache.get_or_compute(1, ("b",), lambda: "b2") == "b2"
+
+    def test_versions_outlive_other_caches_bumps(self):
+        """A version should be kept for its own TTL, however many short-lived ones others bump."""
+        backend = MemoryBackend(10)
+        long_lived = UserCache("long", backend, 3600)
+        short_lived = UserCache("short", backend, 30)
+        with patch("time.monotonic", return_value=100.0):
+            long_lived.get_or_compute(1, ("k",), lambda: "old")
+            long_lived.invalidate(1)
+        with patch("time.monotonic", return_value=200.0):
+            for user_id in range(10001):
+                short_lived.invalidate(user_id)
+            assert long_lived.get_or_compute(1, ("k",), lambda: "new") == "new"
+
+    def test_disabled_with_zero_ttl(self):
+        """Should always compute when the TTL is 0."""
+        cache = _memory_cache(ttl_seconds=0)
+        cache.get_or_compute(1, ("k",), lambda: "a")
+        assert cache.get_or_compute(1, ("k",), lambda: "b") == "b"
+
+
+class TestCalendarCache:
+    """Tests for CalendarCache on the in-process backend."""
+
+    def test_invalidate_days_is_per_month(self):
+        """Should recompute only the months of the written days, of that habit."""
+        cache = CalendarCache("test", MemoryBackend(10), 60)
+        for habit_id, month in ((1, 1), (1, 2), (2, 1)):
+            cache.get_or_compute(7, habit_id, 2024, month, lambda: "old")
+        cache.invalidate_days(1, [date(2024, 1, 5), date(2024, 1, 9)])
+        assert cache.get_or_compute(7, 1, 2024, 1, lambda: "new") == "new"
+        assert cache.get_or_compute(7, 1, 2024, 2, lambda: "new") == "old"
+        assert cache.get_or_compute(7, 2, 2024, 1, lambda: "new") == "old"
+
+    def test_invalidate_user(self):
+        """Should recompute every month of the user's habits."""
+        cache = CalendarCache("test", MemoryBackend(10), 60)
+        cache.get_or_compute(7, 1, 2024, 1, lambda: "old")
+        cache.get_or_compute(8, 2, 2024, 1, lambda: "old")
+        cache.invalidate_user(7)
+        assert cache.get_or_compute(7, 1, 2024, 1, lambda: "new") == "new"
+        assert cache.get_or_compute(8, 2, 2024, 1, lambda: "new") == "old"
+
+
+class TestRedisBackend:
+    """Tests for the shared backend against an in-memory Redis stand-in."""
+
+    @pytest.fixture
+    def server(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        return fakeredis, fakeredis.FakeServer()
+
+    def test_results_and_invalidations_are_shared(self, server):
+        """A write in one process should invalidate what another process cached."""
+        fakeredis, fake_server = server
+        worker_a = UserCache("test", RedisBackend(fakeredis.FakeRedis(server=fake_server)), 60)
+        worker_b = UserCache("test", RedisBackend(fakeredis.FakeRedis(server=fake_server)), 60)
+        assert worker_a.get_or_compute(1, ("k",), lambda: {"streak": 3}) == {"streak": 3}
+        assert worker_b.get_or_compute(1, ("k",), lambda: {"streak": 0}) == {"streak": 3}
+
+        worker_a.invalidate(1)
+        assert worker_b.get_or_compute(1, ("k",), lambda: {"streak": 4}) == {"streak": 4}
+
+    def test_versions_are_never_reused(self, server):
+        """Each bump should hand out a new version, even for another key."""
+        fakeredis, fake_server = server
+        backend = RedisBackend(fakeredis.FakeRedis(server=fake_server))
+        assert backend.version("k") == 0
+        first = backend.bump("k", 60)
+        second = backend.bump("other", 60)
+        assert 0 < first < second
+        assert backend.version("k") == first
+
+    def test_errors_count_as_misses(self):
+        """Should compute instead of failing when Redis is unavailable."""
+        class Down:
+            def __getattr__(self, name):
+                def fail(*args, **kwargs):
+                    raise ConnectionError("down")
+                return fail
+
+        cache = UserCache("test", RedisBackend(Down()), 60)
+        assert cache.get_or_compute(1, ("k",), lambda: "value") == "value"
+        cache.invalidate(1)
+
+    def test_pubsub_invalidates_per_process_caches(self, server):
+        """In-process caches sharing a Redis bus should drop results another process invalidated."""
+        fakeredis, fake_server = server
+        worker_a = UserCache(
+            "test", MemoryBackend(10, RedisBackend(fakeredis.FakeRedis(server=fake_server))), 60
+        )
+        worker_b = UserCache(
+            "test", MemoryBackend(10, RedisBackend(fakeredis.FakeRedis(server=fake_server))), 60
+        )
+        worker_b.get_or_compute(1, ("k",), lambda: "old")
+        # Let the listener threads subscribe before publishing
+        time.sleep(0.2)
+
+        worker_a.invalidate(1)
+        assert _wait_for(lambda: worker_b.get_or_compute(1, ("k",), lambda: "new") == "new")
+
+
+def _token(user_id, expires_in):
+    exp = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    return jwt.encode(
+        {"user_id": user_id, "exp": exp}, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+
+
+class TestTokenCache:
+    """Tests for the decoded-token cache in get_current_user."""
+
+    @pytest.fixture(autouse=True)
+    def clear(self):
+        token_cache.clear()
+        yield
+        token_cache.clear()
+
+    @pytest.fixture
+    def db(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        session.add_all(
+            [User(id=user_id, username=f"user{user_id}", hashed_password="x") for user_id in (7, 8)]
+        )
+        session.commit()
+        yield session
+        session.close()
+
+    def test_decodes_once_per_token(self, db):
+        """Should decode a token once and then serve its user from the cache."""
+        token = _token(7, 600)
+        with patch.object(dependencies, "decode_token", wraps=dependencies.decode_token) as decode:
+            assert dependencies.get_current_user(token, db) == 7
+            assert dependencies.get_current_user(token, db) == 7
+            assert dependencies.get_current_user(_token(8, 600), db) == 8
+        assert decode.call_count == 2
+
+    def test_expired_token_rejected(self, db):
+        """Should reject an expired token and decode again once a cached one reaches its exp."""
+        with pytest.raises(HTTPException) as exc:
+            dependencies.get_current_user(_token(7, -10), db)
+        assert exc.value.status_code == 401
+
+        token = _token(7, 600)
+        assert dependencies.get_current_user(token, db) == 7
+        with (
+            patch.object(
+                dependencies, "decode_token", side_effect=jwt.ExpiredSignatureError
+            ) as decode,
+            patch("app.cache.tokens.time.time", return_value=time.time() + 601),
+        ):
+            with pytest.raises(HTTPException):
+                dependencies.get_current_user(token, db)
+        assert decode.call_count == 1
+
+    def test_invalid_tokens_not_cached(self, db):
+        """Should keep only tokens that decoded, so bad ones cannot fill the cache."""
+        forged = jwt.encode(
+            {"user_id": 7, "exp": datetime.now(timezone.utc) + timedelta(minutes=5)},
+            "wrong-key",
+            algorithm=settings.ALGORITHM,
+        )
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                dependencies.get_current_user(forged, db)
+        assert len(token_cache.backend._entries) == 0
+
+    def test_unknown_and_revoked_users_rejected(self, db):
+        """Should reject tokens of missing users, and cached ones once their user is revoked."""
+        with pytest.raises(HTTPException):
+            dependencies.get_current_user(_token(9, 600), db)
+
+        token = _token(7, 600)
+        assert dependencies.get_current_user(token, db) == 7
+        db.query(User).filter(User.id == 7).delete()
+        db.commit()
+        assert dependencies.get_current_user(token, db) == 7
+        token_cache.revoke(7)
+        with pytest.raises(HTTPException):
+            dependencies.get_current_user(token, db)
@@ -36,20 +36,19 @@ class TestCategoryService:
         mock_category = MagicMock()
         mock_category.id = 1
         mock_category.user_id = 1
-        self.mock_categories_repo.get.return_value = mock_category
+        self.mock_categories_repo.get_for_user.return_value = mock_category
 
         result = self.service.get(category_id=1, user_id=1)
 
         assert result == mock_category
 
     def test_get_category_wrong_user_returns_none(self):
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.user_id = 2  # Different user
-        self.mock_categories_repo.get.return_value = mock_category
+        # The repository scopes the lookup by user, so another user's category is not found
+        self.mock_categories_repo.get_for_user.return_value = None
 
         result = self.service.get(category_id=1, user_id=1)
 
+        self.mock_categories_repo.get_for_user.assert_called_once_with(1, 1)
         assert result is None
 
     def test_list_by_user(self):
@@ -66,7 +65,7 @@ class TestCategoryService:
         mock_category.id = 1
         mock_category.user_id = 1
         mock_category.name = "Health"
-        self.mock_categories_repo.get.return_value = mock_category
+        self.mock_categories_repo.get_for_user.return_value = mock_category
         self.mock_categories_repo.exists_name.return_value = False
         self.mock_categories_repo.update.return_value = mock_category
 
@@ -75,7 +74,7 @@ class TestCategoryService:
         self.mock_categories_repo.update.assert_called_once_with(1, "Fitness", "#ef4444")
 
     def test_update_category_not_found_raises(self):
-        self.mock_categories_repo.get.return_value = None
+        self.mock_categories_repo.get_for_user.return_value = None
 
         with pytest.raises(LookupError) as exc_info:
             self.service.update(category_id=1, user_id=1, name="Fitness", color=None)
@@ -83,30 +82,25 @@ class TestCategoryService:
         assert str(exc_info.value) == "not_found"
 
     def test_update_category_wrong_user_raises(self):
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.user_id = 2  # Different user
-        self.mock_categories_repo.get.return_value = mock_category
+        # The repository scopes the lookup by user, so another user's category is not found
+        self.mock_categories_repo.get_for_user.return_value = None
 
         with pytest.raises(LookupError) as exc_info:
             self.service.update(category_id=1, user_id=1, name="Fitness", color=None)
 
+        self.mock_categories_repo.get_for_user.assert_called_once_with(1, 1)
         assert str(exc_info.value) == "not_found"
 
     def test_delete_category_success(self):
-        mock_category = MagicMock()
-        mock_category.id = 1
-        mock_category.user_id = 1
-        self.mock_categories_repo.get.return_value = mock_category
-        self.mock_categories_repo.delete.return_value = True
+        self.mock_categories_repo.delete_for_user.return_value = True
 
         result = self.service.delete(category_id=1, user_id=1)
 
-        self.mock_categories_repo.delete.assert_called_once_with(1)
+        self.mock_categories_repo.delete_for_user.assert_called_once_with(1, 1)
         assert result is True
 
     def test_delete_category_not_found_raises(self):
-        self.mock_categories_repo.get.return_value = None
+        self.mock_categories_repo.delete_for_user.return_value = False
 
         with pytest.raises(LookupError) as exc_info:
             self.service.delete(category_id=1, user_id=1)
@@ -117,12 +111,12 @@ class TestCategoryService:
         mock_category = MagicMock()
         mock_category.id = 1
         mock_category.user_id = 1
-        self.mock_categories_repo.get.return_value = mock_category
+        self.mock_categories_repo.get_for_user.return_value = mock_category
 
         mock_habit = MagicMock()
         mock_habit.id = 1
         mock_habit.user_id = 1
-        self.mock_habits_repo.get.return_value = mock_habit
+        self.mock_habits_repo.get_for_user.return_value = mock_habit
         self.mock_habits_repo.add_category.return_value = mock_habit
 
         result = self.service.add_habit_to_category(habit_id=1, category_id=1, user_id=1)
@@ -130,7 +124,7 @@ class TestCategoryService:
         self.mock_habits_repo.add_category.assert_called_once_with(1, mock_category)
 
     def test_add_habit_to_category_category_not_found(self):
-        self.mock_categories_repo.get.return_value = None
+        self.mock_categories_repo.get_for_user.return_value = None
 
         with pytest.raises(LookupError) as exc_info:
             self.service.add_habit_to_category(habit_id=1, category_id=1, user_id=1)
@@ -141,8 +135,8 @@ class TestCategoryService:
         mock_category = MagicMock()
         mock_category.id = 1
         mock_category.user_id = 1
-        self.mock_categories_repo.get.return_value = mock_category
-        self.mock_habits_repo.get.return_value = None
+        self.mock_categories_repo.get_for_user.return_value = mock_category
+        self.mock_habits_repo.get_for_user.return_value = None
 
         with pytest.raises(LookupError) as exc_info:
             self.service.add_habit_to_category(habit_id=1, category_id=1, user_id=1)
@@ -153,12 +147,12 @@ class TestCategoryService:
         mock_category = MagicMock()
         mock_category.id = 1
         mock_category.user_id = 1
-        self.mock_categories_repo.get.return_value = mock_category
+        self.mock_categories_repo.get_for_user.return_value = mock_category
 
         mock_habit = MagicMock()
         mock_habit.id = 1
         mock_habit.user_id = 1
-        self.mock_habits_repo.get.return_value = mock_habit
+        self.mock_habits_repo.get_for_user.return_value = mock_habit
         self.mock_habits_repo.remove_category.return_value = mock_habit
 
         result = self.service.remove_habit_from_category(habit_id=1, category_id=1, user_id=1)
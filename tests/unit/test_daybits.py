@@ -0,0 +1,64 @@
+"""Unit tests for year bitmap helpers."""
+import random
+from datetime import date, timedelta
+
+from app.utils.daybits import YEAR_BYTES, days_of, streaks_of, with_days
+from app.utils.streak import batch_streaks_by_habit
+
+
+def _bitmaps(dates):
+    by_year = {}
+    for d in dates:
+        by_year.setdefault(d.year, []).append(d)
+    return {year: with_days(None, ds) for year, ds in by_year.items()}
+
+
+class TestYearBitmap:
+    """Tests for with_days and days_of."""
+
+    def test_round_trip_leap_year(self):
+        """Should read back every set day, including Feb 29 and Dec 31 of a leap year."""
+        days = [date(2024, 1, 1), date(2024, 2, 29), date(2024, 12, 31)]
+        data = with_days(None, days)
+        assert len(data) == YEAR_BYTES
+        assert days_of(2024, data) == days
+
+    def test_adding_days_keeps_existing(self):
+        """Should OR new days into an existing bitmap."""
+        data = with_days(with_days(None, [date(2023, 3, 1)]), [date(2023, 3, 5)])
+        assert days_of(2023, data) == [date(2023, 3, 1), date(2023, 3, 5)]
+
+    def test_range_is_inclusive(self):
+        """Should return only the days within start..end."""
+        data = with_days(None, [date(2023, 1, d) for d in range(1, 32)])
+        assert days_of(2023, data, date(2023, 1, 10), date(2023, 1, 12)) == [
+            date(2023, 1, 10), date(2023, 1, 11), date(2023, 1, 12)]
+        assert days_of(2023, data, date(2023, 2, 1), date(2023, 2, 28)) == []
+
+
+class TestStreaksOf:
+    """Tests for streaks_of."""
+
+    def test_empty(self):
+        """Should return zeros without any bitmaps."""
+        assert streaks_of({}) == (0, 0, 0, None)
+
+    def test_run_across_year_boundary(self):
+        """A run crossing New Year should count as one run."""
+        dates = [date(2023, 12, 30), date(2023, 12, 31), date(2024, 1, 1)]
+        assert streaks_of(_bitmaps(dates), date(2024, 1, 1)) == (3, 3, 3, date(2024, 1, 1))
+
+    def test_current_is_zero_when_today_not_logged(self):
+        """Should report no current streak when today is not logged."""
+        dates = [date(2024, 1, 1), date(2024, 1, 2)]
+        assert streaks_of(_bitmaps(dates), date(2024, 1, 5)) == (0, 2, 2, date(2024, 1, 2))
+
+    def test_matches_batch_engine(self):
+        """Should match batch_streaks_by_habit over a random multi-year history with gap years."""
+        rng = random.Random(11)
+        start = date(2019, 6, 1)
+        dates = {start + timedelta(days=n) for n in range(1600)
+                 if rng.random() < 0.85 and (start + timedelta(days=n)).year != 2021}
+        today = max(dates)
+        assert streaks_of(_bitmaps(dates), today) == batch_streaks_by_habit({1: dates}, today)[1]
+        assert streaks_of(_bitmaps(dates)) == batch_streaks_by_habit({1: dates})[1]
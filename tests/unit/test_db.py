@@ -0,0 +1,122 @@
+"""Unit tests for read routing helpers and the async pools in app.db."""
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import Base, ReadYourWrites, _async_twin, run_on
+from app.models import User
+from app.repositories.categories import AsyncSqlAlchemyCategoryRepository
+from app.repositories.entries import AsyncSqlAlchemyEntryRepository
+from app.repositories.habits import AsyncSqlAlchemyHabitRepository
+from app.services.categories import AsyncCategoryService
+from app.services.habits import AsyncHabitService
+
+
+class TestReadYourWrites:
+    """Tests for the per-user read-your-writes window."""
+
+    def test_no_write_reads_from_replica(self):
+        """A user who never wrote is not pinned to the primary."""
+        window = ReadYourWrites(5)
+        assert not window.wrote_recently(1)
+
+    def test_recent_write_pins_user(self):
+        """A write pins only that user to the primary."""
+        window = ReadYourWrites(5)
+        window.record_write(1)
+        assert window.wrote_recently(1)
+        assert not window.wrote_recently(2)
+
+    def test_window_expires(self):
+        """Once the window passes, the user reads from the replica again."""
+        window = ReadYourWrites(0.01)
+        window.record_write(1)
+        time.sleep(0.02)
+        assert not window.wrote_recently(1)
+
+    def test_zero_window_disables(self):
+        """A zero window never pins anyone."""
+        window = ReadYourWrites(0)
+        window.record_write(1)
+        assert not window.wrote_recently(1)
+
+
+class TestAsyncTwin:
+    """Tests for picking the asyncio driver of the configured database."""
+
+    def test_sqlite_file_uses_aiosqlite(self, tmp_path):
+        twin = _async_twin(create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+        assert twin is not None
+        assert twin.url.drivername == "sqlite+aiosqlite"
+
+    def test_postgres_uses_asyncpg(self):
+        twin = _async_twin(SimpleNamespace(url=make_url("postgresql://app:secret@db/streaky")))
+        assert twin is not None
+        assert twin.url.drivername == "postgresql+asyncpg"
+        assert twin.url.password == "secret"
+
+    def test_no_driver_keeps_sync_sessions(self):
+        """SQL Server through pymssql has no asyncio driver, and in-memory SQLite no twin."""
+        sql_server = SimpleNamespace(url=make_url("mssql+pymssql://app:secret@db/streaky"))
+        assert _async_twin(sql_server) is None
+        assert _async_twin(create_engine("sqlite://")) is None
+
+
+class TestAsyncRepositories:
+    """The async repositories and services on an AsyncSession and on a sync Session."""
+
+    @pytest.fixture
+    def anyio_backend(self):
+        # SQLAlchemy's async sessions run on asyncio only
+        return "asyncio"
+
+    @pytest.fixture
+    def session(self, request, tmp_path):
+        sync_engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+        Base.metadata.create_all(sync_engine)
+        if request.param == "sync":
+            return Session(sync_engine, expire_on_commit=False)
+        async_engine = _async_twin(sync_engine)
+        assert async_engine is not None
+        return AsyncSession(async_engine, expire_on_commit=False)
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize("session", ["async", "sync"], indirect=True)
+    async def test_habit_entries_and_categories(self, session):
+        habits = AsyncSqlAlchemyHabitRepository(session)
+        entries = AsyncSqlAlchemyEntryRepository(session)
+        categories = AsyncSqlAlchemyCategoryRepository(session)
+
+        def add_user(db: Session) -> int:
+            user = User(username="runner", hashed_password="x")
+            db.add(user)
+            db.commit()
+            return user.id
+
+        user_id = await run_on(session, add_user)
+        habit = await habits.create(user_id, "Run", "daily")
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        await entries.upsert_many([(habit.id, yesterday, None), (habit.id, today, "5k")])
+        assert await entries.dates_between(habit.id, yesterday, today) == [yesterday, today]
+        assert (await entries.streaks([habit.id]))[habit.id].current_run_length == 2
+
+        category = await categories.create(user_id, "Health")
+        await AsyncCategoryService(categories, habits).add_habit_to_category(
+            habit.id, category.id, user_id
+        )
+        listed = await AsyncHabitService(habits, entries).list_with_streaks(user_id, today)
+        assert [(h["name"], h["streak"], len(h["categories"])) for h in listed] == [("Run", 2, 1)]
+        assert await categories.delete_for_user(category.id, user_id)
+        assert await habits.delete_for_user(habit.id, user_id)
+        assert await habits.list_by_user(user_id) == []
+        if isinstance(session, AsyncSession):
+            await session.close()
+        else:
+            session.close()
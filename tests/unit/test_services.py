@@ -1,10 +1,11 @@
 """Unit tests for HabitService with fake repositories."""
 from datetime import date, timedelta, time
-from typing import Iterable, Optional, List, Union
+from collections.abc import Iterable, Sequence
 import pytest
 from app.services.habits import HabitService
-from app.models import Habit, Entry
+from app.models import Category, Habit, Entry, HabitStreak
 from app.repositories.base import _REMINDER_TIME_NOT_PROVIDED
+from app.utils.streak import best_streak, current_streak
 
 
 class FakeHabitRepository:
@@ -14,22 +15,51 @@ class FakeHabitRepository:
         self.habits = {}
         self.next_id = 1
 
-    def create(self, user_id: int, name: str, goal_type: str, reminder_time: Optional[time] = None) -> Habit:
-        habit = Habit(id=self.next_id, user_id=user_id, name=name, goal_type=goal_type, reminder_time=reminder_time)
+    def create(self, user_id: int, name: str, goal_type: str, reminder_time: time | None = None,
+               categories: Sequence[Category] | None = None) -> Habit:
+        habit = Habit(
+            id=self.next_id,
+            user_id=user_id,
+            name=name,
+            goal_type=goal_type,
+            reminder_time=reminder_time,
+            categories=list(categories or []),
+        )
         self.habits[self.next_id] = habit
         self.next_id += 1
         return habit
 
-    def get(self, habit_id: int) -> Optional[Habit]:
+    def get(self, habit_id: int) -> Habit | None:
         return self.habits.get(habit_id)
 
-    def list_by_user(self, user_id: int) -> List[Habit]:
-        return [h for h in self.habits.values() if h.user_id == user_id]
+    def get_for_user(self, habit_id: int, user_id: int) -> Habit | None:
+        habit = self.habits.get(habit_id)
+        return habit if habit is not None and habit.user_id == user_id else None
+
+    def list_by_user(
+        self, user_id: int, limit: int | None = None, after: int | None = None
+    ) -> list[Habit]:
+        habits = [
+            h
+            for h in sorted(self.habits.values(), key=lambda h: h.id)
+            if h.user_id == user_id and (after is None or h.id > after)
+        ]
+        return habits if limit is None else habits[:limit]
+
+    def owned_ids(self, user_id: int, habit_ids: Sequence[int]) -> set[int]:
+        return {i for i in habit_ids if i in self.habits and self.habits[i].user_id == user_id}
 
     def exists_name(self, user_id: int, name: str) -> bool:
         return any(h.name == name and h.user_id == user_id for h in self.habits.values())
 
-    def update(self, habit_id: int, name: Optional[str], goal_type: Optional[str], reminder_time: Union[Optional[time], object] = _REMINDER_TIME_NOT_PROVIDED) -> Optional[Habit]:
+    def update(
+        self,
+        habit_id: int,
+        name: str | None,
+        goal_type: str | None,
+        reminder_time: time | None | object = _REMINDER_TIME_NOT_PROVIDED,
+        categories: Sequence[Category] | None = None,
+    ) -> Habit | None:
         habit = self.habits.get(habit_id)
         if not habit:
             return None
@@ -39,6 +69,8 @@ class FakeHabitRepository:
             habit.goal_type = goal_type
         if reminder_time is not _REMINDER_TIME_NOT_PROVIDED:
             habit.reminder_time = reminder_time  # type: ignore
+        if categories is not None:
+            habit.categories = list(categories)
         return habit
 
     def delete(self, habit_id: int) -> bool:
@@ -47,6 +79,9 @@ class FakeHabitRepository:
             return True
         return False
 
+    def delete_for_user(self, habit_id: int, user_id: int) -> bool:
+        return self.get_for_user(habit_id, user_id) is not None and self.delete(habit_id)
+
 
 class FakeEntryRepository:
     """In-memory fake repository for testing."""
@@ -58,12 +93,23 @@ class FakeEntryRepository:
     def exists_on(self, habit_id: int, d: date) -> bool:
         return any(e.habit_id == habit_id and e.date == d for e in self.entries)
 
-    def create(self, habit_id: int, d: date, journal: Optional[str] = None) -> Entry:
+    def create(self, habit_id: int, d: date, journal: str | None = None) -> Entry:
         entry = Entry(id=self.next_id, habit_id=habit_id, date=d, journal=journal)
         self.entries.append(entry)
         self.next_id += 1
         return entry
 
+    def upsert(self, habit_id: int, d: date, journal: str | None = None) -> None:
+        existing = next((e for e in self.entries if e.habit_id == habit_id and e.date == d), None)
+        if existing is None:
+            self.create(habit_id, d, journal)
+        elif journal is not None:
+            existing.journal = journal
+
+    def upsert_many(self, items: Sequence[tuple[int, date, str | None]]) -> None:
+        for habit_id, d, journal in items:
+            self.upsert(habit_id, d, journal)
+
     def dates_between(self, habit_id: int, start: date, end: date) -> Iterable[date]:
         return [
             e.date
@@ -71,6 +117,22 @@ class FakeEntryRepository:
             if e.habit_id == habit_id and start <= e.date <= end
         ]
 
+    def dates_between_many(
+        self, habit_ids: Sequence[int], start: date, end: date
+    ) -> dict[int, set[date]]:
+        return {habit_id: set(self.dates_between(habit_id, start, end)) for habit_id in habit_ids}
+
+    def computed_streaks(self, habit_ids: Sequence[int], today: date) -> dict[int, tuple[int, int]]:
+        out = {}
+        for habit_id in habit_ids:
+            dates = set(self.dates_between(habit_id, date.min, date.max))
+            out[habit_id] = (current_streak(dates, today), best_streak(dates))
+        return out
+
+    def streaks(self, habit_ids: Sequence[int]) -> dict[int, HabitStreak]:
+        # No materialized state, so the service computes streaks from entries
+        return {}
+
 
 @pytest.fixture
 def habit_service():
@@ -144,6 +206,34 @@ class TestHabitServiceLogToday:
             habit_service.log_today(habit_id=999, user_id=1, today=date.today())
 
 
+class TestHabitServiceLogMany:
+    """Tests for logging several habits at once."""
+
+    def test_log_many_success(self, habit_service):
+        """Should log every item."""
+        exercise = habit_service.create(user_id=1, name="Exercise", goal="daily")
+        read = habit_service.create(user_id=1, name="Read", goal="daily")
+        today = date.today()
+
+        logged = habit_service.log_many(
+            1, [(exercise.id, today, None), (read.id, today, "50 pages")]
+        )
+
+        assert logged == 2
+        assert today in habit_service.entries.dates_between(exercise.id, today, today)
+        assert today in habit_service.entries.dates_between(read.id, today, today)
+
+    def test_log_many_other_users_habit_logs_nothing(self, habit_service):
+        """Should raise LookupError and log nothing if any habit is not the user's."""
+        mine = habit_service.create(user_id=1, name="Exercise", goal="daily")
+        theirs = habit_service.create(user_id=2, name="Exercise", goal="daily")
+        today = date.today()
+
+        with pytest.raises(LookupError, match="not_found"):
+            habit_service.log_many(1, [(mine.id, today, None), (theirs.id, today, None)])
+        assert habit_service.entries.entries == []
+
+
 class TestHabitServiceListWithStreaks:
     """Tests for listing habits with streaks."""
 
@@ -179,6 +269,20 @@ class TestHabitServiceListWithStreaks:
         assert len(habits) == 1
         assert habits[0]["streak"] == 3
 
+    def test_list_streaks_for_many_habits(self, habit_service):
+        """Should compute each habit's streak from the batched entry fetch."""
+        today = date.today()
+        first = habit_service.create(user_id=1, name="Exercise", goal="daily")
+        second = habit_service.create(user_id=1, name="Reading", goal="daily")
+        habit_service.log_today(first.id, 1, today)
+        for i in range(2):
+            habit_service.log_today(second.id, 1, today - timedelta(days=i))
+
+        habits = {h["id"]: h for h in habit_service.list_with_streaks(user_id=1, today=today)}
+
+        assert habits[first.id]["streak"] == 1
+        assert habits[second.id]["streak"] == 2
+
     def test_list_only_users_habits(self, habit_service):
         """Should only list habits belonging to the user."""
         habit_service.create(user_id=1, name="Exercise", goal="daily")
@@ -1,6 +1,16 @@
 """Unit tests for streak utility functions."""
 from datetime import date, timedelta
-from app.utils.streak import current_streak, best_streak
+import random
+
+from app.utils.streak import (
+    batch_streaks,
+    batch_streaks_by_habit,
+    best_streak,
+    current_streak,
+    fold_segments,
+    run_containing,
+    segment_of,
+)
 
 
 class TestCurrentStreak:
@@ -103,3 +113,95 @@ class TestBestStreak:
         """Should handle a single long streak."""
         dates = {date(2024, 1, 1) + timedelta(days=i) for i in range(30)}
         assert best_streak(dates) == 30
+
+
+class TestRunContaining:
+    """Tests for run_containing function."""
+
+    def test_isolated_date(self):
+        """Should return a run of one for a date with no neighbours."""
+        d = date(2024, 1, 5)
+        assert run_containing({date(2024, 1, 1)}, d) == (d, 1)
+
+    def test_joins_runs_on_both_sides(self):
+        """Should bridge the runs before and after the date."""
+        dates = {date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 4), date(2024, 1, 5)}
+        assert run_containing(dates, date(2024, 1, 3)) == (date(2024, 1, 1), 5)
+
+    def test_date_already_in_run(self):
+        """Should return the whole run when the date is already logged."""
+        dates = {date(2024, 1, 1) + timedelta(days=i) for i in range(4)}
+        assert run_containing(dates, date(2024, 1, 2)) == (date(2024, 1, 1), 4)
+
+
+class TestBatchStreaks:
+    """Tests for the vectorized batch streak engine."""
+
+    def test_matches_scalar_functions(self):
+        """Should give the same results as current_streak/best_streak per habit."""
+        today = date(2024, 1, 20)
+        dates_by_habit = {
+            1: {date(2024, 1, d) for d in (1, 2, 3, 10, 11, 12, 13, 14, 19, 20)},
+            2: {date(2024, 1, d) for d in (1, 3, 5)},
+            3: set(),
+            4: {today - timedelta(days=i) for i in range(30)},
+        }
+        result = batch_streaks_by_habit(dates_by_habit, today)
+        for habit_id, dates in dates_by_habit.items():
+            current, best, count, last = result[habit_id]
+            assert current == current_streak(dates, today)
+            assert best == best_streak(dates)
+            assert count == len(dates)
+            assert last == (max(dates) if dates else None)
+
+    def test_current_streak_stops_at_today(self):
+        """Should only count the run up to today when later days are logged."""
+        dates = {date(2024, 1, d) for d in range(1, 11)}
+        current, best, _, _ = batch_streaks_by_habit({1: dates}, date(2024, 1, 5))[1]
+        assert current == current_streak(dates, date(2024, 1, 5)) == 5
+        assert best == 10
+
+    def test_without_today_uses_latest_entry(self):
+        """Should measure the current run at each habit's own latest entry."""
+        dates = {date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 6)}
+        current, _, _, last = batch_streaks_by_habit({7: dates})[7]
+        assert (current, last) == (2, date(2024, 1, 6))
+
+    def test_ignores_duplicate_days(self):
+        """Should count each (habit, day) pair once."""
+        day = date(2024, 1, 1).toordinal()
+        result = batch_streaks([0, 0, 0], [day, day, day + 1], 1, day + 1)
+        assert (result.current[0], result.best[0], result.total[0]) == (2, 2, 2)
+
+
+class TestSegments:
+    """Tests for segment_of and fold_segments."""
+
+    def test_segment_of_empty(self):
+        """Should return None for no dates."""
+        assert segment_of([]) is None
+
+    def test_segment_of_runs(self):
+        """Should report the first, best and last runs."""
+        start = date(2024, 1, 1)
+        dates = [start + timedelta(days=n) for n in (0, 1, 5, 6, 7, 9)]
+        seg = segment_of(dates)
+        assert (seg.first, seg.last, seg.total) == (start, start + timedelta(days=9), 6)
+        assert (seg.best, seg.leading, seg.trailing) == (3, 2, 1)
+
+    def test_fold_joins_runs_across_segments(self):
+        """A run crossing segment boundaries should count as one run."""
+        dec = [date(2023, 12, 30), date(2023, 12, 31)]
+        jan = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+        assert fold_segments([segment_of(dec), segment_of(jan)]) == (5, 5, 5, date(2024, 1, 3))
+
+    def test_fold_matches_batch_engine(self):
+        """Folding per-year segments should match streaks over the whole history."""
+        rng = random.Random(7)
+        start = date(2021, 11, 1)
+        dates = {start + timedelta(days=n) for n in range(900) if rng.random() < 0.8}
+        by_year = {}
+        for d in sorted(dates):
+            by_year.setdefault(d.year, []).append(d)
+        folded = fold_segments(segment_of(ds) for _, ds in sorted(by_year.items()))
+        assert folded == batch_streaks_by_habit({1: dates})[1]